@@ -1,21 +1,139 @@
-from utils.llm_client import LLMClient
-from utils.code_parser import parse_java_file_to_ast_str
-from prompts.analysis_prompts import create_analysis_and_refactor_prompt
+from concurrent.futures import ThreadPoolExecutor
+
+from config import CHUNKING_THRESHOLD_LINES, CHUNK_MAX_LINES, CHUNK_MAX_WORKERS, CROSS_FILE_CONTEXT_TOKEN_BUDGET
+from utils.batch_protocol import split_batched_response
+from utils.llm_client import LLMClient, get_llm_client
+from utils.code_parser import estimate_tokens, parse_java_file_to_ast_str
+from utils.java_chunker import class_outline, split_java_file
+from utils.parse_stage import ParsedJavaFile
+from utils.patching import generate_patched
+from utils.python_merge import is_valid_python, merge_python_modules
+from utils.tracing import get_tracer
+from prompts.analysis_prompts import (create_analysis_and_refactor_prompt, create_batch_refactor_prompt,
+                                     create_chunk_refactor_prompt, create_module_update_prompt)
+
+# Order in which chunk results are merged: standalone types and mixins must be defined
+# before the main class that uses/inherits from them.
+_MERGE_ORDER = {"type": 0, "methods": 1, "main": 2}
 
 class CodeModernizationAgent:
-    def __init__(self):
-        self.llm_client = LLMClient()
+    def __init__(self, llm_client: LLMClient = None, chunking_threshold_lines: int = CHUNKING_THRESHOLD_LINES):
+        self.llm_client = llm_client or get_llm_client()
+        self.chunking_threshold_lines = chunking_threshold_lines
 
-    def analyze_and_refactor_file(self, file_path: str) -> str:
+    def analyze_and_refactor_file(self, file_path: str, parsed: ParsedJavaFile = None, related_context: str = "",
+                                  stream_to: str = None) -> str:
         """
         Analyzes a single legacy file and returns the modernized code.
+        Pass the file's ParsedJavaFile from the parse stage to avoid reading and parsing it again,
+        and related_context (signatures of the project types it uses) to give it cross-file context.
+        In streaming mode the response is written to stream_to while it is being generated.
         """
         print(f"  [AGENT] Analyzing and refactoring: {file_path}...")
-        
-        code_structure = parse_java_file_to_ast_str(file_path)
-        
-        prompt = create_analysis_and_refactor_prompt(code_structure, file_path)
-        
-        modernized_code = self.llm_client.generate(prompt)
+
+        # Oversized files time out or come back truncated as a single prompt, so they are split up
+        if parsed is not None and parsed.line_count > self.chunking_threshold_lines and parsed.tree is not None:
+            chunks = split_java_file(parsed.tree, parsed.source, CHUNK_MAX_LINES)
+            if len(chunks) > 1:
+                modernized_code = self._refactor_in_chunks(file_path, parsed, chunks, related_context)
+                print(f"  [AGENT] Refactoring complete for: {file_path}")
+                return modernized_code
+
+        if parsed is not None and parsed.source is not None:
+            code_structure = parsed.code_structure
+        else:
+            code_structure = parse_java_file_to_ast_str(file_path)
+
+        prompt = create_analysis_and_refactor_prompt(code_structure, file_path, related_context)
+
+        modernized_code = self._generate_valid_code(prompt, file_path, stream_to)
         print(f"  [AGENT] Refactoring complete for: {file_path}")
-        return modernized_code
\ No newline at end of file
+        return modernized_code
+
+    def update_file(self, file_path: str, java_diff: str, previous_code: str, related_context: str = "") -> str:
+        """
+        Updates the module previously modernized from file_path after a change to it (java_diff), by asking
+        for edits to previous_code instead of a new module. Returns the patched module, or an "Error: ..."
+        string when the edits do not apply or the result does not compile; the caller then regenerates it.
+        """
+        print(f"  [AGENT] Updating the previous module of: {file_path}...")
+        prompt = create_module_update_prompt(java_diff, previous_code, file_path, related_context)
+        modernized_code = generate_patched(self.llm_client, prompt, previous_code, file_path)
+        print(f"  [AGENT] Update complete for: {file_path}")
+        return modernized_code
+
+    def analyze_and_refactor_batch(self, parsed_files: list, related_contexts: dict = None) -> dict:
+        """
+        Modernizes several small files with a single request. Returns {file path: modernized code} for
+        every file the response held valid Python for; files that are missing or malformed are left
+        out, for the caller to retry one by one.
+        """
+        print(f"  [AGENT] Analyzing and refactoring a batch of {len(parsed_files)} file(s)...")
+        related_context = _merge_related_contexts((related_contexts or {}).values(), CROSS_FILE_CONTEXT_TOKEN_BUDGET)
+        prompt = create_batch_refactor_prompt([(parsed.file_path, parsed.code_structure) for parsed in parsed_files],
+                                              related_context)
+
+        response = self.llm_client.generate(prompt)
+        if response.startswith("Error:"):
+            return {}
+        sections = split_batched_response(response, [parsed.file_path for parsed in parsed_files])
+        modernized = {path: code for path, code in sections.items() if is_valid_python(code)}
+        if len(modernized) < len(parsed_files):
+            # Don't keep an incomplete answer around; the missing files are retried individually
+            self.llm_client.forget(prompt)
+        print(f"  [AGENT] Batch refactoring complete: {len(modernized)} of {len(parsed_files)} file(s) usable.")
+        return modernized
+
+    def _refactor_in_chunks(self, file_path: str, parsed: ParsedJavaFile, chunks: list, related_context: str) -> str:
+        """Modernizes the chunks of an oversized file concurrently and merges them into one module."""
+        outline = class_outline(parsed.tree)
+        part_names = [chunk.name for chunk in chunks if chunk.role == "methods"]
+        print(f"  [AGENT] {file_path} is too large for one prompt. Split into {len(chunks)} chunk(s).")
+
+        def refactor_chunk(chunk):
+            with tracer.span("chunk", role=chunk.role, chunk=chunk.name, lines=chunk.line_count):
+                prompt = create_chunk_refactor_prompt(chunk, outline, file_path, part_names, related_context)
+                return self._generate_valid_code(prompt, f"{file_path} [{chunk.role} {chunk.name}]")
+
+        tracer = get_tracer()
+        with ThreadPoolExecutor(max_workers=max(1, CHUNK_MAX_WORKERS)) as executor:
+            # Chunk spans nest under the modernize stage that is running on this thread
+            results = list(executor.map(tracer.wrap(refactor_chunk), chunks))
+
+        for chunk, code in zip(chunks, results):
+            if code.startswith("Error:"):
+                return f"Error: Could not modernize chunk '{chunk.name}' ({chunk.role}) of {file_path}. {code}"
+
+        ordered = [code for _, code in sorted(zip(chunks, results), key=lambda item: _MERGE_ORDER[item[0].role])]
+        merged = merge_python_modules(ordered)
+        if not is_valid_python(merged):
+            return f"Error: The merged module for {file_path} is not valid Python."
+        return merged
+
+    def _generate_valid_code(self, prompt: str, label: str, stream_to: str = None) -> str:
+        """
+        Generates code and checks that it compiles. Output that does not compile (typically a response
+        cut off mid-way) is dropped from the cache and regenerated once before giving up.
+        """
+        code = self.llm_client.generate(prompt, stream_to=stream_to)
+        if code.startswith("Error:") or is_valid_python(code):
+            return code
+        print(f"  [AGENT_WARNING] Output for {label} is not valid Python (possibly truncated). Retrying once.")
+        self.llm_client.forget(prompt)
+        code = self.llm_client.generate(prompt, stream_to=stream_to)
+        if code.startswith("Error:") or is_valid_python(code):
+            return code
+        return f"Error: The model returned invalid or truncated Python for {label}."
+
+def _merge_related_contexts(contexts, token_budget: int) -> str:
+    """Joins the related-type blocks of several files, dropping duplicates, up to token_budget."""
+    blocks, seen, used = [], set(), 0
+    for context in contexts:
+        for block in context.split('\n\n') if context else ():
+            cost = estimate_tokens(block)
+            if block in seen or used + cost > token_budget:
+                continue
+            seen.add(block)
+            blocks.append(block)
+            used += cost
+    return '\n\n'.join(blocks)
@@ -1,18 +1,33 @@
-from utils.llm_client import LLMClient
-from prompts.agent_prompts import create_documentation_prompt
+from utils.llm_client import LLMClient, get_llm_client
+from prompts.agent_prompts import create_documentation_prompt, create_documentation_update_prompt
+from utils.patching import generate_patched
 
 class DocumentationAgent:
-    def __init__(self):
-        self.llm_client = LLMClient()
+    def __init__(self, llm_client: LLMClient = None):
+        self.llm_client = llm_client or get_llm_client()
 
-    def generate_docs(self, modernized_code: str, file_path: str) -> str:
+    def generate_docs(self, modernized_code: str, file_path: str, stream_to: str = None) -> str:
         """
         Generates a README.md file for the provided modernized code.
+        In streaming mode the response is written to stream_to while it is being generated.
         """
         print(f"  [AGENT_DOCS] Generating documentation for: {file_path}...")
         
         prompt = create_documentation_prompt(modernized_code, file_path)
         
-        documentation = self.llm_client.generate(prompt, temperature=0.6)
+        documentation = self.llm_client.generate(prompt, temperature=0.6, stream_to=stream_to)
         print(f"  [AGENT_DOCS] Documentation generation complete for: {file_path}")
+        return documentation
+
+    def update_docs(self, module_diff: str, previous_docs: str, file_path: str) -> str:
+        """
+        Updates a previously generated README.md after its module changed (module_diff), by asking for
+        edits instead of a new README. Returns the patched README, or an "Error: ..." string when the
+        edits do not apply.
+        """
+        print(f"  [AGENT_DOCS] Updating the previous documentation for: {file_path}...")
+        prompt = create_documentation_update_prompt(module_diff, previous_docs, file_path)
+        documentation = generate_patched(self.llm_client, prompt, previous_docs, f"the documentation of {file_path}",
+                                         temperature=0.6, must_compile=False)
+        print(f"  [AGENT_DOCS] Documentation update complete for: {file_path}")
         return documentation
\ No newline at end of file
@@ -1,18 +1,32 @@
-from utils.llm_client import LLMClient
-from prompts.agent_prompts import create_test_generation_prompt
+from utils.llm_client import LLMClient, get_llm_client
+from prompts.agent_prompts import create_test_generation_prompt, create_test_update_prompt
+from utils.patching import generate_patched
 
 class TestingAgent:
-    def __init__(self):
-        self.llm_client = LLMClient()
+    def __init__(self, llm_client: LLMClient = None):
+        self.llm_client = llm_client or get_llm_client()
 
-    def generate_tests(self, code_analysis: str, modernized_code: str, file_path: str) -> str:
+    def generate_tests(self, code_analysis: str, modernized_code: str, file_path: str, stream_to: str = None) -> str:
         """
         Generates pytest unit tests for the provided modernized code.
+        In streaming mode the response is written to stream_to while it is being generated.
         """
         print(f"  [AGENT_TEST] Generating tests for: {file_path}...")
         
         prompt = create_test_generation_prompt(code_analysis, modernized_code, file_path)
         
-        test_script = self.llm_client.generate(prompt, temperature=0.5)
+        test_script = self.llm_client.generate(prompt, temperature=0.5, stream_to=stream_to)
         print(f"  [AGENT_TEST] Test generation complete for: {file_path}")
+        return test_script
+
+    def update_tests(self, java_diff: str, module_diff: str, previous_tests: str, file_path: str) -> str:
+        """
+        Updates a previously generated test suite after its module changed (module_diff), by asking for
+        edits instead of a new suite. Returns the patched suite, or an "Error: ..." string when the edits
+        do not apply or the result does not compile.
+        """
+        print(f"  [AGENT_TEST] Updating the previous tests for: {file_path}...")
+        prompt = create_test_update_prompt(java_diff, module_diff, previous_tests, file_path)
+        test_script = generate_patched(self.llm_client, prompt, previous_tests, f"the tests of {file_path}", temperature=0.5)
+        print(f"  [AGENT_TEST] Test update complete for: {file_path}")
         return test_script
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+Benchmarks the full modernization pipeline offline: generates a synthetic Java corpus, runs
+Orchestrator.execute_modernization_pipeline against the mock (or a recorded) LLM backend and
+reports per-phase and per-stage latency, throughput and peak memory.
+
+Usage: python -m benchmarks.pipeline_benchmark [--scale 10|1k|10k | --files N] [--latency SECONDS]
+                                                [--backend mock|replay] [--runs N] [--work-dir DIR]
+"""
+import argparse
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks.synthetic_corpus import SCALES, generate_corpus
+
+def peak_memory_mb() -> dict:
+    """Peak resident set size of this process and of its largest finished child process (the parse workers), in MB."""
+    if resource is None:
+        return {}
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / (1024 * 1024),
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / (1024 * 1024)}
+
+def percentile(values: list, percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+def run_once(legacy_dir: str, output_dir: str, backend, workers: int, quiet: bool, batch: bool = False) -> dict:
+    from core.orchestrator import Orchestrator
+    from utils.rate_limiter import RateLimiter
+
+    # The benchmark measures the pipeline itself: no LLM response cache, no client-side rate limit and
+    # no validation of the (mock) outputs
+    orchestrator = Orchestrator(max_workers=workers, use_llm_cache=False, legacy_code_path=legacy_dir,
+                                output_path=output_dir, llm_backend=backend, batch_small_files=batch, validate=False,
+                                rate_limiter=RateLimiter(requests_per_minute=0, tokens_per_minute=0))
+    calls_before = getattr(backend, "calls", 0)
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+        orchestrator.execute_modernization_pipeline()
+    elapsed = time.perf_counter() - started
+    return {
+        "elapsed": elapsed,
+        "phases": dict(orchestrator.phase_durations),
+        "stages": orchestrator.stage_runner.durations(),
+        "statuses": {status: orchestrator.report.count(status) for status in ("modernized", "fast_path", "reused", "skipped", "failed")},
+        "llm_calls": getattr(backend, "calls", 0) - calls_before,
+    }
+
+def print_result(run: int, result: dict, file_count: int):
+    modernized = sum(result["statuses"][status] for status in ("modernized", "fast_path", "reused"))
+    print(f"\nRun {run}: {result['elapsed']:.2f}s for {file_count} file(s) "
+          f"({file_count / result['elapsed']:.1f} files/s overall, "
+          f"{modernized / result['elapsed']:.1f} modernized files/s)")
+    print("  Outcome: " + ", ".join(f"{status} {count}" for status, count in result["statuses"].items())
+          + f", {result['llm_calls']} LLM call(s)")
+    print("  Phases:  " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in result["phases"].items()))
+    print(f"  {'Stage':10} {'Count':>7} {'p50':>8} {'p95':>8} {'Max':>8}")
+    for stage, values in result["stages"].items():
+        if values:
+            print(f"  {stage:10} {len(values):>7} {percentile(values, 50):>7.3f}s {percentile(values, 95):>7.3f}s {max(values):>7.3f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10")
+    parser.add_argument("--files", type=int, help="Exact number of files (overrides --scale).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["mock", "replay"], default="mock")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mock time to first token per request, in seconds.")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0, help="Mock generation time per output token.")
+    parser.add_argument("--workers", type=int, default=None, help="Files in flight (defaults to MAX_CONCURRENT_FILES).")
+    parser.add_argument("--batch", action="store_true", help="Batch small files into shared modernization requests.")
+    parser.add_argument("--runs", type=int, default=1, help="Runs over the same tree; later runs measure the incremental path.")
+    parser.add_argument("--work-dir", help="Where to put the corpus, outputs and caches (default: a temporary directory).")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="codegenesis_bench_")
+    # Keep the AST cache inside the work directory, so runs are isolated from the project's cache.
+    # This has to happen before config is imported.
+    os.environ.setdefault("PARSED_AST_CACHE_PATH", os.path.join(work_dir, "parsed_ast"))
+
+    from config import MAX_CONCURRENT_FILES
+    from utils.llm_backends import MockBackend, RecordReplayBackend
+
+    file_count = args.files or SCALES[args.scale]
+    legacy_dir = os.path.join(work_dir, "legacy")
+    output_dir = os.path.join(work_dir, "output")
+    shutil.rmtree(legacy_dir, ignore_errors=True)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    started = time.perf_counter()
+    generate_corpus(legacy_dir, file_count, args.seed)
+    print(f"Generated {file_count} synthetic Java file(s) in {time.perf_counter() - started:.2f}s under {legacy_dir}")
+
+    if args.backend == "mock":
+        backend = MockBackend(latency_seconds=args.latency, seconds_per_token=args.seconds_per_token)
+    else:
+        backend = RecordReplayBackend(mode="replay")
+
+    for run in range(1, args.runs + 1):
+        result = run_once(legacy_dir, output_dir, backend, args.workers or MAX_CONCURRENT_FILES, not args.verbose,
+                          args.batch)
+        print_result(run, result, file_count)
+
+    memory = peak_memory_mb()
+    if memory:
+        print(f"\nPeak memory: {memory['self']:.0f} MB (pipeline process), {memory['children']:.0f} MB (largest parse worker process)")
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
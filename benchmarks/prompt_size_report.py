@@ -0,0 +1,56 @@
+"""
+Reports how large the modernization prompt is for every Java file under LEGACY_CODE_PATH,
+comparing the old str(javalang tree) representation with the compact AST summary.
+
+Usage: python -m benchmarks.prompt_size_report [legacy_code_path] [--budget TOKENS]
+"""
+import argparse
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+import javalang
+
+from config import LEGACY_CODE_PATH, AST_SUMMARY_TOKEN_BUDGET
+from prompts.analysis_prompts import create_analysis_and_refactor_prompt
+from utils.code_parser import get_all_java_files, estimate_tokens, summarize_java_ast
+
+def prompt_sizes(file_path: str, token_budget: int) -> dict:
+    """Returns the estimated prompt size in tokens for the raw source, the old repr and the compact summary."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        code = file.read()
+    tree = javalang.parse.parse(code)
+    return {
+        "source": estimate_tokens(code),
+        "repr_prompt": estimate_tokens(create_analysis_and_refactor_prompt(str(tree), file_path)),
+        "compact_prompt": estimate_tokens(create_analysis_and_refactor_prompt(summarize_java_ast(tree, code, token_budget), file_path)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("legacy_code_path", nargs="?", default=LEGACY_CODE_PATH)
+    parser.add_argument("--budget", type=int, default=AST_SUMMARY_TOKEN_BUDGET, help="Token budget for the compact summary.")
+    args = parser.parse_args()
+
+    totals = {"source": 0, "repr_prompt": 0, "compact_prompt": 0}
+    print(f"{'File':40} {'Source':>8} {'str(tree)':>10} {'Compact':>8} {'Saved':>7}")
+    for file_path in sorted(get_all_java_files(args.legacy_code_path)):
+        try:
+            sizes = prompt_sizes(file_path, args.budget)
+        except Exception as e:
+            print(f"{os.path.basename(file_path):40} could not be parsed: {e}")
+            continue
+        for key in totals:
+            totals[key] += sizes[key]
+        saved = 1 - sizes["compact_prompt"] / sizes["repr_prompt"]
+        print(f"{os.path.basename(file_path):40} {sizes['source']:>8} {sizes['repr_prompt']:>10} {sizes['compact_prompt']:>8} {saved:>7.0%}")
+
+    if totals["repr_prompt"]:
+        saved = 1 - totals["compact_prompt"] / totals["repr_prompt"]
+        print(f"{'TOTAL (estimated tokens)':40} {totals['source']:>8} {totals['repr_prompt']:>10} {totals['compact_prompt']:>8} {saved:>7.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Generates a synthetic legacy Java project for benchmarking: packages of POJOs, services that
+use them (so the symbol index sees real cross-file dependencies) and a few huge classes that
+go through the chunking path. The output is fully determined by the file count and seed.
+
+Usage: python -m benchmarks.synthetic_corpus OUTPUT_DIR [--scale 10|1k|10k | --files N] [--seed N]
+"""
+import argparse
+import os
+import random
+
+SCALES = {"10": 10, "1k": 1000, "10k": 10000}
+
+FILES_PER_PACKAGE = 50
+# One huge class per this many files (at least one per corpus)
+HUGE_CLASS_EVERY = 200
+SERVICE_SHARE = 0.35
+# Comfortably above the default CHUNKING_THRESHOLD_LINES (1500), so huge classes get chunked
+HUGE_CLASS_LINES = 1800
+
+_FIELD_TYPES = [("String", '""'), ("int", "0"), ("long", "0L"), ("double", "0.0"), ("boolean", "false"),
+                ("List<String>", "new ArrayList<>()")]
+_FIELD_NAMES = ["name", "code", "amount", "quantity", "status", "createdAt", "updatedAt", "owner", "region",
+                "priority", "score", "label", "notes", "active", "version", "total", "balance", "tags"]
+
+def _capitalize(name: str) -> str:
+    return name[0].upper() + name[1:]
+
+def generate_pojo(package: str, name: str, rng: random.Random) -> str:
+    fields = rng.sample(_FIELD_NAMES, rng.randint(4, 12))
+    typed = [(field, *rng.choice(_FIELD_TYPES)) for field in fields]
+    lines = [f"package {package};", "", "import java.util.ArrayList;", "import java.util.List;", "",
+             "/**", f" * {name} entity.", " */", f"public class {name} {{", ""]
+    lines.append("    private long id;")
+    lines += [f"    private {java_type} {field} = {default};" for field, java_type, default in typed]
+    lines += ["", f"    public {name}() {{", "    }", "",
+              f"    public {name}(long id) {{", "        this.id = id;", "    }", "",
+              "    public long getId() {", "        return id;", "    }", "",
+              "    public void setId(long id) {", "        this.id = id;", "    }"]
+    for field, java_type, _ in typed:
+        getter = ("is" if java_type == "boolean" else "get") + _capitalize(field)
+        lines += ["", f"    public {java_type} {getter}() {{", f"        return {field};", "    }", "",
+                  f"    public void set{_capitalize(field)}({java_type} {field}) {{", f"        this.{field} = {field};", "    }"]
+    summary = ' + ", " + '.join(field for field, _, _ in typed[:3])
+    lines += ["", "    @Override", "    public String toString() {",
+              f'        return "{name}[" + id + ", " + {summary} + "]";', "    }", "}", ""]
+    return '\n'.join(lines)
+
+def generate_service(package: str, name: str, entities: list, external: list, rng: random.Random) -> str:
+    used = rng.sample(entities, min(len(entities), rng.randint(1, 3)))
+    imports = ["java.util.ArrayList", "java.util.HashMap", "java.util.List", "java.util.Map"] + external
+    lines = [f"package {package};", ""] + [f"import {path};" for path in imports] + ["",
+             f"public class {name} {{", ""]
+    for entity in used:
+        lines.append(f"    private final Map<Long, {entity}> {entity.lower()}Store = new HashMap<>();")
+    for path in external:
+        simple = path.rsplit('.', 1)[-1]
+        lines.append(f"    private final {simple} {simple[0].lower() + simple[1:]} = new {simple}();")
+    for entity in used:
+        store = f"{entity.lower()}Store"
+        lines += ["", f"    public {entity} create{entity}(long id) {{",
+                  f"        if ({store}.containsKey(id)) {{",
+                  f'            throw new IllegalArgumentException("{entity} " + id + " already exists");', "        }",
+                  f"        {entity} entity = new {entity}(id);", f"        {store}.put(id, entity);",
+                  "        return entity;", "    }", "",
+                  f"    public {entity} find{entity}(long id) {{", f"        return {store}.get(id);", "    }", "",
+                  f"    public List<{entity}> list{entity}s() {{",
+                  f"        List<{entity}> result = new ArrayList<>();",
+                  f"        for ({entity} entity : {store}.values()) {{", "            if (entity.getId() > 0) {",
+                  "                result.add(entity);", "            }", "        }", "        return result;", "    }", "",
+                  f"    public boolean delete{entity}(long id) {{", f"        return {store}.remove(id) != null;", "    }"]
+    lines += ["", "    public int size() {", "        int total = 0;"]
+    lines += [f"        total += {entity.lower()}Store.size();" for entity in used]
+    lines += ["        return total;", "    }", "}", ""]
+    return '\n'.join(lines)
+
+def generate_huge_class(package: str, name: str, rng: random.Random, min_lines: int) -> str:
+    lines = [f"package {package};", "", "import java.util.HashMap;", "import java.util.Map;", "",
+             f"public class {name} {{", "", "    private final Map<String, Integer> counters = new HashMap<>();",
+             "    private int processed = 0;", ""]
+    index = 0
+    while len(lines) < min_lines:
+        index += 1
+        threshold = rng.randint(1, 100)
+        lines += [f"    public int process{index}(String key, int value) {{",
+                  f"        if (value > {threshold}) {{",
+                  "            counters.put(key, counters.getOrDefault(key, 0) + value);",
+                  "        } else {",
+                  f"            counters.put(key, value * {rng.randint(2, 9)});", "        }",
+                  "        processed++;", "        return counters.get(key);", "    }", ""]
+    lines += ["    public int getProcessed() {", "        return processed;", "    }", "}", ""]
+    return '\n'.join(lines)
+
+def generate_corpus(output_dir: str, file_count: int, seed: int = 0) -> list:
+    """Writes file_count Java files under output_dir and returns their paths."""
+    rng = random.Random(seed)
+    huge_count = max(1, file_count // HUGE_CLASS_EVERY) if file_count >= 10 else 0
+    remaining = file_count - huge_count
+    written = []
+    previous_services = []
+    package_index = 0
+    while remaining > 0 or huge_count > 0:
+        package = f"com.synthetic.module{package_index}"
+        directory = os.path.join(output_dir, *package.split('.'))
+        os.makedirs(directory, exist_ok=True)
+        in_package = min(FILES_PER_PACKAGE, remaining)
+        service_count = int(in_package * SERVICE_SHARE)
+        entities = [f"Entity{package_index}x{index}" for index in range(in_package - service_count)]
+        sources = {entity: generate_pojo(package, entity, rng) for entity in entities}
+        services = []
+        for index in range(service_count):
+            service = f"Service{package_index}x{index}"
+            # Some services depend on a service of an earlier package, which links the packages up
+            external = [rng.choice(previous_services)] if previous_services and rng.random() < 0.3 else []
+            sources[service] = generate_service(package, service, entities, external, rng)
+            services.append(f"{package}.{service}")
+        if huge_count > 0:
+            huge = f"LegacyManager{package_index}"
+            sources[huge] = generate_huge_class(package, huge, rng, HUGE_CLASS_LINES)
+            huge_count -= 1
+        for name, source in sources.items():
+            path = os.path.join(directory, f"{name}.java")
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(source)
+            written.append(path)
+        previous_services = services or previous_services
+        remaining -= in_package
+        package_index += 1
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output_dir")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10")
+    parser.add_argument("--files", type=int, help="Exact number of files (overrides --scale).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    paths = generate_corpus(args.output_dir, args.files or SCALES[args.scale], args.seed)
+    print(f"Generated {len(paths)} Java file(s) under {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
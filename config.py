@@ -10,4 +10,201 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 LEGACY_CODE_PATH = "legacy_code_input/sample_java_app/"
 MODERNIZED_CODE_PATH = "modernized_code_output/"
 TARGET_LANGUAGE = "Python"
-TARGET_FRAMEWORK = "FastAPI"
\ No newline at end of file
+TARGET_FRAMEWORK = "FastAPI"
+
+# Pipeline concurrency settings
+# Maximum number of Java files processed (i.e. waiting on the LLM) at the same time.
+# Set to 1 to fall back to the original one-file-at-a-time behaviour.
+MAX_CONCURRENT_FILES = int(os.getenv("MAX_CONCURRENT_FILES", "4"))
+
+# LLM response cache settings
+# Responses are stored on disk keyed by model, temperature and prompt, so reruns
+# after a crash or an unrelated config change do not pay for identical prompts again.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".codegenesis_cache/llm_responses/")
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "512"))
+
+# Prompt size settings
+# Approximate token budget (~4 characters per token) for the structural Java summary
+# sent to the modernization agent. Bodies are elided, trivial accessors first, to fit.
+AST_SUMMARY_TOKEN_BUDGET = int(os.getenv("AST_SUMMARY_TOKEN_BUDGET", "6000"))
+
+# Java parsing settings
+# javalang is pure Python, so parsing is spread across worker processes. Parsed trees
+# are cached on disk by source content hash and reused by later runs and stages.
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARSED_AST_CACHE_PATH = os.getenv("PARSED_AST_CACHE_PATH", ".codegenesis_cache/parsed_ast/")
+# Files are handed to the parse workers PARSE_CHUNK_FILES at a time, with at most two chunks
+# per worker in flight, so parsing keeps pace with discovery instead of waiting for it.
+PARSE_CHUNK_FILES = int(os.getenv("PARSE_CHUNK_FILES", "16"))
+
+# Discovery settings
+# Source files are found by a lazy directory walk that feeds the parse stage through a queue of
+# at most DISCOVERY_QUEUE_SIZE paths, so parsing starts with the first file found. Globs are
+# comma-separated and matched against both the name and the path relative to LEGACY_CODE_PATH,
+# except that a glob starting with "/" only matches the path relative to LEGACY_CODE_PATH, so it is
+# anchored there. Excluded directories are not entered at all. By default these are the build output
+# directories at the root, generated sources (build/generated at any depth) and hidden directories.
+# A DISCOVERY_BUILD_OUTPUT_DIRS directory is also skipped at any depth when it sits beside one of the
+# DISCOVERY_BUILD_FILES, as in the modules of a multi-module project; a package such as com/acme/out is not.
+DISCOVERY_INCLUDE_GLOBS = [glob.strip() for glob in os.getenv("DISCOVERY_INCLUDE_GLOBS", "*.java").split(",") if glob.strip()]
+DISCOVERY_EXCLUDE_GLOBS = [glob.strip() for glob in os.getenv(
+    "DISCOVERY_EXCLUDE_GLOBS",
+    "/target,/build,/out,/generated,build/generated,*/build/generated,generated-sources,generated-test-sources,.*"
+).split(",") if glob.strip()]
+DISCOVERY_BUILD_OUTPUT_DIRS = {name.strip() for name in os.getenv(
+    "DISCOVERY_BUILD_OUTPUT_DIRS", "target,build,out").split(",") if name.strip()}
+DISCOVERY_BUILD_FILES = {name.strip() for name in os.getenv(
+    "DISCOVERY_BUILD_FILES", "pom.xml,build.gradle,build.gradle.kts,build.xml").split(",") if name.strip()}
+DISCOVERY_QUEUE_SIZE = int(os.getenv("DISCOVERY_QUEUE_SIZE", "1000"))
+
+# Cross-file context settings
+# The symbol index maps every type, field and method under LEGACY_CODE_PATH to the files
+# defining and using it. Each prompt gets the signatures of the project types its file
+# references, capped at this many (estimated) tokens.
+CROSS_FILE_CONTEXT_TOKEN_BUDGET = int(os.getenv("CROSS_FILE_CONTEXT_TOKEN_BUDGET", "1500"))
+
+# Chunking settings for oversized classes
+# Java files longer than CHUNKING_THRESHOLD_LINES are split along class, nested-class and
+# method-group boundaries into chunks of at most CHUNK_MAX_LINES lines, which are modernized
+# concurrently (CHUNK_MAX_WORKERS at a time) and merged back into one Python module.
+CHUNKING_THRESHOLD_LINES = int(os.getenv("CHUNKING_THRESHOLD_LINES", "1500"))
+CHUNK_MAX_LINES = int(os.getenv("CHUNK_MAX_LINES", "400"))
+CHUNK_MAX_WORKERS = int(os.getenv("CHUNK_MAX_WORKERS", "4"))
+
+# LLM generation settings
+# With LLM_STREAMING=1 responses are streamed chunk by chunk: time to first token is recorded
+# and a generation is cancelled as soon as it exceeds its budget instead of after it completes.
+# LLM_MAX_OUTPUT_TOKENS=0 means no output cap; LLM_MAX_GENERATION_SECONDS=0 means no time limit.
+LLM_STREAMING = os.getenv("LLM_STREAMING", "0") == "1"
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "0"))
+LLM_MAX_GENERATION_SECONDS = float(os.getenv("LLM_MAX_GENERATION_SECONDS", "600"))
+
+# Per-file stage settings
+# Each file runs through modernize -> {tests, docs} -> write -> validate; tests and docs only depend
+# on the modernized code and run in parallel. Every stage type has its own concurrency limit, so e.g.
+# test generation can be throttled without slowing down refactoring. VALIDATE_CONCURRENCY bounds
+# how many generated test suites run at once, each in its own pytest subprocess; a file's slot is
+# freed once its outputs are written, without waiting for its validation.
+STAGE_CONCURRENCY = {
+    "modernize": int(os.getenv("MODERNIZE_CONCURRENCY", str(MAX_CONCURRENT_FILES))),
+    "tests": int(os.getenv("TESTS_CONCURRENCY", str(MAX_CONCURRENT_FILES))),
+    "docs": int(os.getenv("DOCS_CONCURRENCY", str(MAX_CONCURRENT_FILES))),
+    "write": int(os.getenv("WRITE_CONCURRENCY", "2")),
+    "validate": int(os.getenv("VALIDATE_CONCURRENCY", str(os.cpu_count() or 1))),
+}
+
+# LLM rate limiting & retry settings
+# All agents share one client-side limiter. It keeps requests and (estimated) tokens per minute
+# under these budgets (0 = unlimited), backs off from 429s by lowering its own send rate, and
+# retries transient failures (429, 5xx, timeouts) with jittered exponential backoff.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "2"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "60"))
+
+# LLM backend settings
+# LLM_BACKEND selects the model behind every agent:
+#   "gemini" - the Google Gemini API (default)
+#   "mock"   - a deterministic offline stand-in that simulates latency, for benchmarks and dry runs
+#   "record" - Gemini, with every response appended to LLM_RECORDING_PATH
+#   "replay" - serves responses from LLM_RECORDING_PATH without touching the network
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+MOCK_LLM_LATENCY_SECONDS = float(os.getenv("MOCK_LLM_LATENCY_SECONDS", "0.5"))
+MOCK_LLM_SECONDS_PER_TOKEN = float(os.getenv("MOCK_LLM_SECONDS_PER_TOKEN", "0.0"))
+LLM_RECORDING_PATH = os.getenv("LLM_RECORDING_PATH", ".codegenesis_cache/llm_recording.jsonl")
+
+# Tracing settings
+# With TRACING_ENABLED=1 (or main.py --trace) every phase, file, stage and LLM call is recorded
+# as a span, with token counts, retries and cache hits. At the end of the run a JSON trace
+# (trace.json, viewable in chrome://tracing or Perfetto) and a Prometheus text-format metrics
+# snapshot (metrics.prom) are written to TRACE_OUTPUT_PATH.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+TRACE_OUTPUT_PATH = os.getenv("TRACE_OUTPUT_PATH", "codegenesis_traces/")
+
+# Batching settings
+# With BATCH_SMALL_FILES=1, small files (a summary of at most BATCH_MAX_FILE_TOKENS tokens) that
+# are ready at the same time are modernized together: up to BATCH_MAX_FILES files and
+# BATCH_TOKEN_BUDGET tokens per request. Files missing from or malformed in the batched
+# response are retried one by one. Tests and docs are still generated per file.
+BATCH_SMALL_FILES = os.getenv("BATCH_SMALL_FILES", "0") == "1"
+BATCH_MAX_FILE_TOKENS = int(os.getenv("BATCH_MAX_FILE_TOKENS", "800"))
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "6000"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "10"))
+
+# Structural reuse settings
+# Files that are the same code up to the names they declare (e.g. dozens of near-identical DTOs)
+# share a structural fingerprint. With STRUCTURAL_REUSE_ENABLED=1 only the first of them is sent
+# to the model; the others get its module, tests and docs with the identifiers renamed, provided
+# the rename is unambiguous enough (STRUCTURAL_REUSE_MIN_CONFIDENCE, 0-1) and the result compiles.
+# main.py --force-fresh turns reuse off for one run.
+STRUCTURAL_REUSE_ENABLED = os.getenv("STRUCTURAL_REUSE_ENABLED", "1") == "1"
+STRUCTURAL_REUSE_MIN_CONFIDENCE = float(os.getenv("STRUCTURAL_REUSE_MIN_CONFIDENCE", "0.9"))
+
+# POJO fast path settings
+# Plain data classes (fields, constructors, getters, setters) are translated into Pydantic models
+# by rules on the AST instead of by the model. POJO_FAST_PATH_ROUTER adds an in-memory CRUD
+# FastAPI router and app when the class has an id field; POJO_FAST_PATH_TESTS emits a pytest
+# skeleton instead of asking the testing agent. The docs are still written by the documentation agent.
+POJO_FAST_PATH_ENABLED = os.getenv("POJO_FAST_PATH_ENABLED", "1") == "1"
+POJO_FAST_PATH_ROUTER = os.getenv("POJO_FAST_PATH_ROUTER", "1") == "1"
+POJO_FAST_PATH_TESTS = os.getenv("POJO_FAST_PATH_TESTS", "1") == "1"
+
+# Validation settings
+# With VALIDATION_ENABLED=1 every file is validated as soon as its outputs are saved: the module and
+# its tests are compile-checked, then (with VALIDATION_RUN_TESTS=1) the generated tests are run in an
+# isolated pytest subprocess using VALIDATION_PYTHON (default: the interpreter running the pipeline,
+# which then needs the generated code's dependencies, e.g. fastapi). Pass/fail and duration go
+# into the run report. VALIDATION_TIMEOUT_SECONDS=0 means no time limit.
+VALIDATION_ENABLED = os.getenv("VALIDATION_ENABLED", "1") == "1"
+VALIDATION_RUN_TESTS = os.getenv("VALIDATION_RUN_TESTS", "1") == "1"
+VALIDATION_TIMEOUT_SECONDS = float(os.getenv("VALIDATION_TIMEOUT_SECONDS", "120"))
+VALIDATION_PYTHON = os.getenv("VALIDATION_PYTHON", "")
+
+# Job store settings
+# Files to modernize are tracked in a SQLite job store (JOB_STORE_PATH, default: inside the output
+# directory) with their stage state (pending/modernized/tested/documented/done/failed), the outputs of
+# the stages they finished and the worker holding them. Several `python main.py` workers, on one host
+# or sharing the input and output directories, claim files from it. A worker renews its leases every
+# JOB_HEARTBEAT_SECONDS; the files of a worker silent for JOB_LEASE_SECONDS, three heartbeats late, or
+# whose process is gone (on the same host) are claimed by another and resumed from their finished stages.
+# A file abandoned JOB_MAX_ATTEMPTS times is marked failed. Idle workers check for newly claimable files
+# every JOB_POLL_SECONDS.
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "20"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+# LLM connection settings
+# Every agent sends its requests through one shared LLM client, so they share one connection to
+# the model. LLM_MAX_CONNECTIONS caps the requests in flight on it at once; 0 (the default) sizes it
+# to the pipeline's concurrency, i.e. the modernize, tests and docs stage limits added up. The SDK
+# of the model is only imported when the first request is actually sent.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "0"))
+
+# Hedging settings
+# With LLM_HEDGING_ENABLED=1, an LLM request whose backend call is still running after the
+# LLM_HEDGE_PERCENTILE-th percentile of the last LLM_HEDGE_HISTORY call latencies (timed from the start
+# of the call, once LLM_HEDGE_MIN_SAMPLES are known) is sent a second time, unless every connection
+# is busy. The first answer wins and the other attempt is cancelled (a stream is abandoned, a
+# blocking call is left to finish and ignored). Duplicates are capped at LLM_HEDGE_MAX_EXTRA_FRACTION
+# of all requests, which bounds the extra spend.
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_HISTORY = int(os.getenv("LLM_HEDGE_HISTORY", "200"))
+LLM_HEDGE_MAX_EXTRA_FRACTION = float(os.getenv("LLM_HEDGE_MAX_EXTRA_FRACTION", "0.05"))
+
+# Update mode settings
+# With UPDATE_MODE_ENABLED=1 a file that changed since its outputs were generated is not regenerated
+# from scratch: the agents get the unified diff of its Java source (and of the module, for the tests
+# and docs) with the previous output, and answer with search/replace edits. The edits are applied and
+# checked locally (the module and tests must still compile); an output whose edits do not apply falls
+# back to full regeneration. Files whose diff touches more than UPDATE_MAX_CHANGED_FRACTION of their
+# lines are regenerated in full, and so are files over CHUNKING_THRESHOLD_LINES (their modules are
+# generated in chunks, which a single update prompt would bypass). Off by default: an output whose
+# edits do not apply costs a second request. main.py --force-fresh turns it off for one run.
+UPDATE_MODE_ENABLED = os.getenv("UPDATE_MODE_ENABLED", "0") == "1"
+UPDATE_MAX_CHANGED_FRACTION = float(os.getenv("UPDATE_MAX_CHANGED_FRACTION", "0.3"))
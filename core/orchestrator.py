@@ -1,5 +1,9 @@
+import contextlib
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # === ROBUST IMPORT FIX START ===
 # Get the absolute path of the project's root directory
@@ -12,62 +16,712 @@ if PROJECT_ROOT not in sys.path:
 from agents.analysis_agent import CodeModernizationAgent
 from agents.testing_agent import TestingAgent
 from agents.documentation_agent import DocumentationAgent
-from config import LEGACY_CODE_PATH, MODERNIZED_CODE_PATH
-from utils.code_parser import get_all_java_files, save_modernized_code
+from config import (LEGACY_CODE_PATH, MODERNIZED_CODE_PATH, MAX_CONCURRENT_FILES, LLM_CACHE_ENABLED, STAGE_CONCURRENCY,
+                    TRACE_OUTPUT_PATH, BATCH_SMALL_FILES, BATCH_MAX_FILE_TOKENS, BATCH_TOKEN_BUDGET, BATCH_MAX_FILES,
+                    CHUNKING_THRESHOLD_LINES, STRUCTURAL_REUSE_ENABLED, STRUCTURAL_REUSE_MIN_CONFIDENCE,
+                    POJO_FAST_PATH_ENABLED, POJO_FAST_PATH_ROUTER, POJO_FAST_PATH_TESTS, VALIDATION_ENABLED,
+                    VALIDATION_RUN_TESTS, DISCOVERY_QUEUE_SIZE, JOB_STORE_PATH, JOB_POLL_SECONDS, LLM_MAX_CONNECTIONS,
+                    UPDATE_MODE_ENABLED, UPDATE_MAX_CHANGED_FRACTION)
+from core.run_report import RUN_REPORT_FILE_NAME, RunReport
+from core.stage_graph import Stage, StageRunner
+from utils.code_parser import estimate_tokens, python_module_name
+from utils.discovery import iter_java_files, prefetch
+from utils.fingerprint import FingerprintIndex, rename_confidence, rename_identifiers, rename_pairs
+from utils.job_store import JOB_STORE_FILE_NAME, JobStore, format_progress
+from utils.llm_backends import LLMBackend, create_backend
+from utils.llm_client import LLMClient, get_generation_metrics, get_response_cache
+from utils.output_writer import get_output_writer
+from utils.parse_stage import ParsedJavaFile, load_java_tree, parse_java_files
+from utils.patching import SourceSnapshots, source_diff
+from utils.pojo_translator import is_trivial_pojo, translate_pojo
+from utils.python_merge import is_valid_python
+from utils.rate_limiter import RateLimiter, get_rate_limiter
+from utils.run_manifest import RunManifest
+from utils.startup_timing import startup_step, startup_timings
+from utils.symbol_index import SymbolIndex
+from utils.tracing import get_tracer
+from utils.validation import pytest_available, validate_outputs
+
+SYMBOL_INDEX_FILE_NAME = ".codegenesis_symbol_index.json"
+# Streamed responses are written next to their final output with this suffix while they arrive
+PARTIAL_SUFFIX = ".partial"
+# Lines of pytest output printed for a file whose generated tests did not pass
+_VALIDATION_OUTPUT_LINES = 8
+# How often a worker prints the progress of the whole job store while processing
+JOB_PROGRESS_INTERVAL_SECONDS = 30
 
 class Orchestrator:
-    def __init__(self):
-        # Instantiate all our specialized agents
-        self.modernization_agent = CodeModernizationAgent()
-        self.testing_agent = TestingAgent()
-        self.documentation_agent = DocumentationAgent()
+    def __init__(self, max_workers: int = MAX_CONCURRENT_FILES, use_llm_cache: bool = LLM_CACHE_ENABLED,
+                 force_full_rebuild: bool = False, legacy_code_path: str = LEGACY_CODE_PATH,
+                 output_path: str = MODERNIZED_CODE_PATH, stage_concurrency: dict = None,
+                 llm_backend: LLMBackend = None, rate_limiter: RateLimiter = None,
+                 batch_small_files: bool = BATCH_SMALL_FILES,
+                 reuse_structural_duplicates: bool = STRUCTURAL_REUSE_ENABLED,
+                 pojo_fast_path: bool = POJO_FAST_PATH_ENABLED, validate: bool = VALIDATION_ENABLED,
+                 update_mode: bool = UPDATE_MODE_ENABLED):
+        stage_limits = dict(STAGE_CONCURRENCY, **(stage_concurrency or {}))
+        # Instantiate all our specialized agents. They share one client, and with it one backend
+        # connection (sized to the LLM stages' concurrency) and one rate limiter.
+        with startup_step("llm_client"):
+            llm_backend = llm_backend or create_backend()
+            self.rate_limiter = rate_limiter or get_rate_limiter()
+            max_connections = LLM_MAX_CONNECTIONS or sum(stage_limits[stage] for stage in ("modernize", "tests", "docs"))
+            self.llm_client = LLMClient(use_cache=use_llm_cache, backend=llm_backend, rate_limiter=self.rate_limiter,
+                                        max_connections=max_connections)
+        self.modernization_agent = CodeModernizationAgent(self.llm_client)
+        self.testing_agent = TestingAgent(self.llm_client)
+        self.documentation_agent = DocumentationAgent(self.llm_client)
+        self.use_llm_cache = use_llm_cache
+        self.max_workers = max(1, max_workers)
+        self.force_full_rebuild = force_full_rebuild
+        self.batch_small_files = batch_small_files
+        self.reuse_structural_duplicates = reuse_structural_duplicates
+        self.pojo_fast_path = pojo_fast_path
+        self.validate = validate
+        self.run_tests = VALIDATION_RUN_TESTS
+        if validate and self.run_tests and not pytest_available():
+            print("[VALIDATION] pytest is not installed for the validation interpreter; the generated tests will only "
+                  "be compile-checked. Install it (it is in requirements.txt) or set VALIDATION_PYTHON to run them.")
+            self.run_tests = False
+        self.update_mode = update_mode
+        self.legacy_code_path = legacy_code_path
+        self.output_path = output_path
+        self.report = RunReport()
+        with startup_step("manifest"):
+            self.manifest = RunManifest(legacy_code_path, output_path)
+        with startup_step("symbol_index"):
+            self.symbol_index = SymbolIndex(legacy_code_path, os.path.join(output_path, SYMBOL_INDEX_FILE_NAME))
+        with startup_step("fingerprints"):
+            self.fingerprints = FingerprintIndex(output_path)
+        self.output_writer = get_output_writer()
+        self.snapshots = SourceSnapshots(legacy_code_path, output_path)
+        # The job store shared with the other workers of this run; opened for the process phase only
+        self.job_store_path = JOB_STORE_PATH or os.path.join(output_path, JOB_STORE_FILE_NAME)
+        self.jobs = None
+        # Stages run on their own per-stage pools, so a file worker waiting on its stages never blocks them
+        self.stage_runner = StageRunner(stage_limits)
+        # Validations still running; a file is finished once written, and they are collected before the summary
+        self._validations = []
+        self._validations_lock = threading.Lock()
+        # Wall-clock seconds of the project-wide phases of the last run (discover, parse, index, process)
+        self.phase_durations = {}
 
     def execute_modernization_pipeline(self):
         """Main pipeline to run the entire multi-agent modernization process."""
         print("--- [ORCHESTRATOR] Starting CodeGenesis Multi-Agent Pipeline ---")
+        tracer = get_tracer()
+        tracer.clear()
+        try:
+            with tracer.span("run", legacy_code_path=self.legacy_code_path):
+                self._run_pipeline()
+        finally:
+            if tracer.enabled:
+                self._export_trace(tracer)
+
+    @contextlib.contextmanager
+    def _phase(self, name: str):
+        """Times (and traces) one project-wide phase of the run."""
+        started = time.perf_counter()
+        try:
+            with get_tracer().span(name) as span:
+                yield span
+        finally:
+            self.phase_durations[name] = time.perf_counter() - started
+
+    def _export_trace(self, tracer):
+        trace_path = os.path.join(TRACE_OUTPUT_PATH, "trace.json")
+        metrics_path = os.path.join(TRACE_OUTPUT_PATH, "metrics.prom")
+        try:
+            tracer.export_json(trace_path)
+            tracer.export_prometheus(metrics_path)
+        except OSError as e:
+            print(f"[ORCHESTRATOR] Could not export the trace: {e}")
+            return
+        print(f"[ORCHESTRATOR] Trace written to {trace_path}, metrics to {metrics_path}.")
+
+    def _run_pipeline(self):
+        if self.force_full_rebuild:
+            print("[ORCHESTRATOR] Full rebuild requested. Ignoring the previous run manifest.")
+
+        # === DISCOVERY, PARSE STAGE & INCREMENTAL CHECK ===
+        # The directory walk runs on a background thread and streams paths to the parse workers
+        # through a bounded queue, so parsing starts with the first file found. Every file is read
+        # and hashed exactly once, in parallel. Files whose source matches the manifest (and whose
+        # outputs still exist) are not even parsed, everything else is parsed or loaded from the
+        # AST cache and sent to the agents.
+        java_files = []
+        expected_hash = (lambda path: None) if self.force_full_rebuild else self.manifest.reusable_hash
+        with self._phase("parse") as span:
+            discovered = prefetch(self._discover(java_files, get_tracer().current_span()), DISCOVERY_QUEUE_SIZE)
+            parsed_files = parse_java_files(discovered, expected_hash)
+            span.set("files", len(parsed_files))
+            span.set("unchanged", sum(1 for parsed in parsed_files.values() if parsed.unchanged))
+
+        # Outputs of legacy files that were deleted since the last run are cleaned up
+        removed = self.manifest.remove_stale(java_files)
+        for relative_path in removed:
+            print(f"[ORCHESTRATOR] Removed outputs of deleted input: {relative_path}")
+            self.snapshots.remove(relative_path)
+            self.report.record(relative_path, "removed")
 
-        java_files = get_all_java_files(LEGACY_CODE_PATH)
         if not java_files:
             print("[ORCHESTRATOR] No Java files found. Exiting.")
+            self.manifest.save()
             return
 
         print(f"[ORCHESTRATOR] Found {len(java_files)} Java file(s) to process.")
 
-        for file_path in java_files:
-            print(f"\n--- Processing file: {os.path.basename(file_path)} ---")
+        to_process = []
+        for file_path, parsed in parsed_files.items():
+            if parsed.source_hash is None:
+                self.report.record(file_path, "failed", error=parsed.error)
+            elif parsed.unchanged:
+                print(f"[ORCHESTRATOR] Unchanged since last run, skipping: {file_path}")
+                self.report.record(file_path, "skipped")
+            else:
+                to_process.append(parsed)
+        if not self.force_full_rebuild:
+            print(f"[ORCHESTRATOR] {self.report.count('skipped')} file(s) unchanged, {len(to_process)} file(s) to modernize.")
+
+        # === SYMBOL INDEX ===
+        # Only new or changed files are (re-)indexed; unchanged ones keep their entry from the last run.
+        with self._phase("index"):
+            self._update_symbol_index(parsed_files.values(), java_files)
+
+        print(f"[ORCHESTRATOR] Processing with up to {self.max_workers} file(s) in flight.")
+        with self._phase("process") as span, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            span.set("files", len(to_process))
+            if to_process:
+                self.jobs = JobStore(self.job_store_path, self.legacy_code_path, self.output_path)
+            try:
+                if to_process:
+                    self._run_from_job_store(executor, to_process)
+                self._collect_validations()
+            finally:
+                # Persist progress even if the run is interrupted, so the next run can pick up from here
+                if self.jobs is not None:
+                    self._record_completed_jobs(to_process)
+                    self.jobs.close()
+                    self.jobs = None
+                self.manifest.save()
+                self.fingerprints.save()
+
+        self.report.finish()
+        self.report.save(os.path.join(self.output_path, RUN_REPORT_FILE_NAME), self.legacy_code_path)
+        self.report.print_summary()
+        if self.use_llm_cache:
+            stats = get_response_cache().stats()
+            print(f"[ORCHESTRATOR] LLM response cache: {stats['hits']} hit(s), {stats['misses']} miss(es), "
+                  f"{stats['entries']} entries ({stats['bytes'] / (1024 * 1024):.1f} MB).")
+        self._print_generation_metrics()
+        self._print_startup_timings()
+        self._print_stage_timings()
+        print("\n--- [ORCHESTRATOR] CodeGenesis Pipeline Finished ---")
+
+    def _print_generation_metrics(self):
+        metrics = get_generation_metrics().summary()
+        if not metrics["requests"] and not metrics["cancelled"] and not metrics["truncated"]:
+            return
+        line = f"[ORCHESTRATOR] LLM generations: {metrics['requests']} completed"
+        if metrics["ttft_p50"] is not None:
+            line += f", time to first token p50 {metrics['ttft_p50']:.1f}s / p95 {metrics['ttft_p95']:.1f}s"
+        if metrics["total_p50"] is not None:
+            line += f", total time p50 {metrics['total_p50']:.1f}s / p95 {metrics['total_p95']:.1f}s"
+        line += f", {metrics['cancelled']} cancelled over budget, {metrics['truncated']} truncated."
+        print(line)
+        hedging = self.llm_client.hedging.stats() if self.llm_client.hedging is not None else None
+        if hedging and (hedging["fired"] or hedging["capped"] or hedging["saturated"]):
+            print(f"[ORCHESTRATOR] LLM hedging: {hedging['fired']} of {hedging['requests']} request(s) hedged, "
+                  f"{hedging['won']} won by the hedge, {hedging['capped']} not hedged (extra spend cap reached), "
+                  f"{hedging['saturated']} not hedged (every connection busy).")
+        limits = self.rate_limiter.stats()
+        if limits["retries"] or limits["gave_up"]:
+            print(f"[ORCHESTRATOR] LLM retries: {limits['retries']} retried, {limits['throttled']} throttled, "
+                  f"{limits['gave_up']} gave up; send rate now at {limits['rate_factor']:.0%} of the configured budget.")
+
+    def _print_startup_timings(self):
+        timings = startup_timings()
+        # The SDK is imported at the first request, if any was sent; it is reported apart from startup proper
+        deferred = {name: timings.pop(name) for name in ("llm_sdk_import", "llm_sdk_setup") if name in timings}
+        if timings:
+            print(f"[ORCHESTRATOR] Startup timings: {', '.join(f'{name} {seconds:.2f}s' for name, seconds in timings.items())}.")
+        if deferred:
+            print(f"[ORCHESTRATOR] LLM SDK loaded at the first request: "
+                  f"{', '.join(f'{name} {seconds:.2f}s' for name, seconds in deferred.items())}.")
+
+    def _print_stage_timings(self):
+        phases = [f"{name} {seconds:.1f}s" for name, seconds in self.phase_durations.items()]
+        if phases:
+            print(f"[ORCHESTRATOR] Phase timings: {', '.join(phases)}.")
+        timings = [f"{name} {len(values)}x avg {sum(values) / len(values):.1f}s"
+                   for name, values in self.stage_runner.durations().items() if values]
+        if timings:
+            print(f"[ORCHESTRATOR] Stage timings: {', '.join(timings)}.")
+
+    def _discover(self, found: list, trace_parent=None):
+        """Yields the Java files under the legacy root as the walk finds them, also collecting them in found."""
+        started = time.perf_counter()
+        try:
+            with get_tracer().span("discover", parent=trace_parent) as span:
+                for path in iter_java_files(self.legacy_code_path):
+                    found.append(path)
+                    yield path
+                span.set("files", len(found))
+        finally:
+            # The walk overlaps the parse phase; this is how long it took to find the last file
+            self.phase_durations["discover"] = time.perf_counter() - started
+
+    def _update_symbol_index(self, parsed_files, java_files):
+        self.symbol_index.prune(java_files)
+        indexed = 0
+        for parsed in parsed_files:
+            if parsed.source_hash is None or self.symbol_index.is_indexed(parsed.file_path, parsed.source_hash):
+                continue
+            self.symbol_index.update_file(parsed.file_path, parsed.source_hash, load_java_tree(parsed))
+            # One tree at a time: the file's source is loaded again when it is processed
+            parsed.release()
+            indexed += 1
+        self.symbol_index.save()
+        print(f"[ORCHESTRATOR] Symbol index updated ({indexed} file(s) re-indexed, {len(self.symbol_index.files)} total).")
+
+    def _run_from_job_store(self, executor, to_process):
+        """
+        Adds the files to the job store, then claims and processes them until every one is finished,
+        by this worker or by the others sharing the store. The store only hands out a file once every
+        file it depends on has finished, so dependencies are modernized before the files using them,
+        and the largest ready files first: they take the longest, and starting them late stretches the
+        run. In batching mode, small files claimed at the same time are submitted together.
+        """
+        by_path = {parsed.file_path: parsed for parsed in to_process}
+        waiting_on = self.symbol_index.dependency_graph(by_path)
+        if self.reuse_structural_duplicates:
+            self._hold_structural_duplicates(by_path, waiting_on)
+        synced = self.jobs.sync(((parsed.file_path, parsed.source_hash, parsed.source_length) for parsed in to_process),
+                                waiting_on, fresh=self.force_full_rebuild)
+        print(f"[ORCHESTRATOR] {'Started a new run in' if synced['new_run'] else 'Joined the run in progress in'} "
+              f"the job store {self.job_store_path} as worker {self.jobs.worker_id}.")
+        if synced["resumed"]:
+            print(f"[ORCHESTRATOR] {len(synced['resumed'])} file(s) resume from stages finished before.")
+        for file_path in synced["completed"]:
+            self.report.record(file_path, "already_done")
+        if synced["completed"]:
+            print(f"[ORCHESTRATOR] {len(synced['completed'])} file(s) already completed by another worker or before an interruption.")
+        tracer = get_tracer()
+        process_file, process_batch = tracer.wrap(self.process_file), tracer.wrap(self.process_batch)
+        claim_size = BATCH_MAX_FILES if self.batch_small_files else 1
+
+        futures = {}
+        last_progress = time.monotonic()
+        while True:
+            # Claim only what can start now, so the other workers get their share of the ready files
+            claimed = self.jobs.claim((self.max_workers - len(futures)) * claim_size)
+            for unit in self._plan_work_units([by_path[file_path] for file_path in claimed]):
+                if len(unit) == 1:
+                    future = executor.submit(process_file, unit[0])
+                else:
+                    future = executor.submit(process_batch, unit)
+                futures[future] = [parsed.file_path for parsed in unit]
+            if not futures:
+                if not self.jobs.unfinished():
+                    break
+                # The remaining files are held by other workers, or wait on files they hold
+                time.sleep(JOB_POLL_SECONDS)
+            done, _ = wait(futures, timeout=JOB_POLL_SECONDS, return_when=FIRST_COMPLETED) if futures else ((), ())
+            for future in done:
+                file_paths = futures.pop(future)
+                # Done with these files: drop their source and tree, so memory does not grow with the run
+                for file_path in file_paths:
+                    by_path[file_path].release()
+                error = None
+                try:
+                    future.result()
+                except Exception as e:
+                    # A crash while processing one file must never take the others down with it.
+                    print(f"[ORCHESTRATOR] Unexpected error while processing {', '.join(file_paths)}: {e}. Skipping.")
+                    error = str(e)
+                    for file_path in file_paths:
+                        if len(file_paths) == 1 or self.report.status(file_path) is None:
+                            self.report.record(file_path, "failed", error=error)
+                # Files that did not end up with all their outputs are failed for this run. Dependents
+                # go ahead either way; they only lose this file's context, not their input.
+                self.jobs.release(file_paths, error)
+            if time.monotonic() - last_progress >= JOB_PROGRESS_INTERVAL_SECONDS:
+                print(f"[ORCHESTRATOR] Job store progress: {format_progress(self.jobs.progress())}.")
+                last_progress = time.monotonic()
+
+        # Files this worker did not process were finished by the others: completed, or failed there
+        failures = self.jobs.failures()
+        for file_path in by_path:
+            if self.report.status(file_path) is None:
+                if file_path in failures:
+                    self.report.record(file_path, "failed", error=failures[file_path])
+                else:
+                    self.report.record(file_path, "already_done")
+        print(f"[ORCHESTRATOR] Job store progress: {format_progress(self.jobs.progress())}.")
+
+    def _record_completed_jobs(self, to_process):
+        """Adds the files other workers completed to this worker's manifest, so no run redoes them."""
+        hashes = {parsed.file_path: parsed.source_hash for parsed in to_process}
+        for file_path, source_hash, outputs in self.jobs.completed():
+            if hashes.get(file_path) == source_hash and all(os.path.exists(output) for output in outputs):
+                self.manifest.record(file_path, source_hash, outputs)
+
+    def _hold_structural_duplicates(self, by_path: dict, waiting_on: dict):
+        """
+        Makes every file that shares its structural fingerprint with another pending file wait for the
+        first of them (the representative), so it can reuse the representative's outputs instead of
+        being generated at the same time. Nothing is held for a fingerprint that was modernized before,
+        nor when waiting would close a dependency cycle.
+        """
+        groups = {}
+        for path, parsed in by_path.items():
+            if (parsed.fingerprint is not None and not self.fingerprints.contains(parsed.fingerprint)
+                    and not self._takes_fast_path(parsed)):
+                groups.setdefault(parsed.fingerprint, []).append(path)
+
+        def depends_on(path, target):
+            seen, stack = set(), [path]
+            while stack:
+                current = stack.pop()
+                if current == target:
+                    return True
+                if current not in seen:
+                    seen.add(current)
+                    stack.extend(waiting_on[current])
+            return False
+
+        held = 0
+        for paths in groups.values():
+            representative = paths[0]
+            for path in paths[1:]:
+                if not depends_on(representative, path):
+                    waiting_on[path].add(representative)
+                    held += 1
+        if held:
+            print(f"[ORCHESTRATOR] {held} file(s) structurally identical to another pending file; they will reuse its outputs.")
+
+    def _plan_work_units(self, ready: list) -> list:
+        """
+        Groups ready files (largest first) into units of work: small files are packed into batches
+        up to the batch budgets, every other file is a unit of its own.
+        """
+        if not self.batch_small_files:
+            return [[parsed] for parsed in ready]
+        units, batch, batch_tokens = [], [], 0
+        for parsed in ready:
+            tokens = parsed.structure_tokens if parsed.structure_tokens is not None else estimate_tokens(parsed.code_structure)
+            if (tokens > BATCH_MAX_FILE_TOKENS or parsed.line_count > CHUNKING_THRESHOLD_LINES
+                    or self._takes_fast_path(parsed)
+                    or (self.reuse_structural_duplicates and parsed.fingerprint is not None
+                        and self.fingerprints.contains(parsed.fingerprint))):
+                # Large files are chunked instead; plain data classes and structural duplicates need no request
+                units.append([parsed])
+                continue
+            if batch and (batch_tokens + tokens > BATCH_TOKEN_BUDGET or len(batch) >= BATCH_MAX_FILES):
+                units.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(parsed)
+            batch_tokens += tokens
+        if batch:
+            units.append(batch)
+        return units
+
+    def process_batch(self, batch: list) -> int:
+        """
+        Modernizes several small files with one LLM request, then runs the remaining stages of each
+        file concurrently. Files the batched response did not cover are modernized on their own.
+        Returns the number of files modernized.
+        """
+        print(f"\n--- Processing batch of {len(batch)} small file(s) ---")
+        with get_tracer().span("batch", files=len(batch)) as span:
+            related_contexts = {parsed.file_path: self.symbol_index.context_for(parsed.file_path) for parsed in batch}
+            modernized = self.modernization_agent.analyze_and_refactor_batch(batch, related_contexts)
+            retried = len(batch) - len(modernized)
+            span.set("retried_individually", retried)
+            if retried:
+                print(f"[ORCHESTRATOR] {retried} file(s) missing or malformed in the batched response. Retrying them individually.")
+
+            process_file = get_tracer().wrap(self.process_file)
+            with ThreadPoolExecutor(max_workers=len(batch)) as executor:
+                results = list(executor.map(lambda parsed: process_file(parsed, modernized.get(parsed.file_path)), batch))
+        return sum(results)
+
+    def process_file(self, parsed: ParsedJavaFile, modernized_code: str = None) -> bool:
+        """
+        Runs all pipeline stages for a single parsed Java file. Returns True if the file was modernized.
+        Tests and docs both only need the modernized code, so they are generated concurrently.
+        Once saved, the outputs are handed to the validation stage's pool (compiled, and the tests run) and
+        the file is finished without waiting for them, so slow test suites never hold a file slot.
+        Pass modernized_code when the file was already modernized (in a batch) to skip that request.
+        Plain data classes are translated by rules (the POJO fast path), and a file structurally
+        identical to one modernized before gets that file's outputs, renamed. Stages a previous attempt
+        finished (as stored in the job store) are not run again. In update mode, a file changed since
+        its outputs were generated gets them patched rather than regenerated.
+        """
+        file_path = parsed.file_path
+        print(f"\n--- Processing file: {os.path.basename(file_path)} ---")
+
+        base_name = os.path.basename(file_path)
+        file_name_without_ext, _ = os.path.splitext(base_name)
+        module_name = python_module_name(file_path)
+        paths = {
+            "modernize": os.path.join(self.output_path, module_name),
+            "tests": os.path.join(self.output_path, 'tests', 'test_' + module_name),
+            "docs": os.path.join(self.output_path, 'docs', 'README_' + file_name_without_ext + '.md'),
+        }
+
+        with get_tracer().span("file", file=file_path, source_bytes=parsed.source_length,
+                               batched=modernized_code is not None) as file_span:
+            stored = self.jobs.stage_outputs(file_path) if self.jobs is not None else {}
+            if stored:
+                print(f"[ORCHESTRATOR] Resuming {base_name}: {', '.join(sorted(stored))} already done.")
+                modernized_code = modernized_code or stored.get("modernize")
+            elif modernized_code is not None:
+                self._record_stage(parsed, "modernize", modernized_code)
+            fast_path = self._fast_path(parsed, module_name) if modernized_code is None else None
+            reused = self._reuse_structural_duplicate(parsed) if modernized_code is None and fast_path is None else None
+            status = "fast_path" if fast_path else "reused" if reused else "modernized"
+            previous = self._previous_outputs(parsed, paths) if status == "modernized" else None
+            file_span.set("origin", status)
+            # Outputs known up front (from an earlier attempt, a batch, the fast path or a structural duplicate)
+            # skip their LLM request
+            known = dict(stored, **(fast_path or reused or {"modernize": modernized_code}))
+            stages = [
+                Stage("modernize", lambda inputs: known["modernize"] or self._modernize_stage(parsed, paths["modernize"], previous)),
+                Stage("tests", lambda inputs: known.get("tests")
+                      or self._tests_stage(parsed, inputs["modernize"], module_name, paths["tests"], previous),
+                      requires=["modernize"]),
+                Stage("docs", lambda inputs: known.get("docs")
+                      or self._docs_stage(parsed, inputs["modernize"], module_name, paths["docs"], previous),
+                      requires=["modernize"]),
+                Stage("write", lambda inputs: self._write_stage(parsed, inputs, paths, status),
+                      requires=["modernize"], after=["tests", "docs"]),
+            ]
+            results = self.stage_runner.run(stages, trace_parent=file_span)
+            if self.validate and results["write"] is not None:
+                validation = self.stage_runner.submit(
+                    Stage("validate", lambda inputs: self._validate_stage(parsed, inputs["write"], paths)),
+                    {"write": results["write"]}, trace_parent=file_span)
+                with self._validations_lock:
+                    self._validations.append((file_path, validation))
+            if "modernize" in results.errors:
+                self.report.record(file_path, "failed", error=str(results.errors["modernize"]))
+            elif results["modernize"] is not None and results["write"] is None:
+                self.report.record(file_path, "failed", error=str(results.errors.get("write", "Could not write the outputs")))
+            file_span.set("status", self.report.status(file_path) or "failed")
+        return results["write"] is not None
+
+    def _takes_fast_path(self, parsed: ParsedJavaFile) -> bool:
+        return self.pojo_fast_path and is_trivial_pojo(parsed.tree)
+
+    def _fast_path(self, parsed: ParsedJavaFile, module_name: str):
+        """The outputs of a plain data class translated without the LLM, or None for any other class."""
+        if not self.pojo_fast_path:
+            return None
+        outputs = translate_pojo(parsed.tree, module_name, include_router=POJO_FAST_PATH_ROUTER,
+                                 include_tests=POJO_FAST_PATH_TESTS)
+        if outputs is not None:
+            print(f"[ORCHESTRATOR] {os.path.basename(parsed.file_path)} is a plain data class; "
+                  f"translated by the fast path without the LLM.")
+        return outputs
+
+    def _reuse_structural_duplicate(self, parsed: ParsedJavaFile):
+        """
+        Returns {"modernize", "tests", "docs": text} adapted from a structurally identical file modernized
+        before, or None when there is none or the rename is not trustworthy (below the confidence threshold,
+        or producing code that does not compile). The file is then generated as usual.
+        """
+        if not self.reuse_structural_duplicates or parsed.fingerprint is None:
+            return None
+        match = self.fingerprints.lookup(parsed.fingerprint)
+        if match is None:
+            return None
+        reference_file, reference_identifiers, texts = match
+        confidence = rename_confidence(reference_identifiers, parsed.identifiers, texts.values())
+        if confidence < STRUCTURAL_REUSE_MIN_CONFIDENCE:
+            print(f"[ORCHESTRATOR] {os.path.basename(parsed.file_path)} matches {os.path.basename(reference_file)} "
+                  f"structurally, but renaming is too ambiguous (confidence {confidence:.2f}). Generating it fresh.")
+            return None
+        pairs = rename_pairs(reference_identifiers, parsed.identifiers)
+        renamed = {stage: rename_identifiers(text, pairs) for stage, text in texts.items()}
+        if not is_valid_python(renamed["modernize"]) or not is_valid_python(renamed["tests"]):
+            print(f"[ORCHESTRATOR] Renamed outputs of {os.path.basename(reference_file)} do not compile "
+                  f"for {os.path.basename(parsed.file_path)}. Generating it fresh.")
+            return None
+        print(f"[ORCHESTRATOR] {os.path.basename(parsed.file_path)} is structurally identical to "
+              f"{os.path.basename(reference_file)}; reusing its outputs (confidence {confidence:.2f}).")
+        self.report.record(parsed.file_path, "reused", reused_from=reference_file, confidence=round(confidence, 2))
+        return renamed
+
+    def _previous_outputs(self, parsed: ParsedJavaFile, paths: dict):
+        """
+        In update mode, returns {"java_diff", "modernize", "tests", "docs"} for a file that changed since its
+        outputs were generated: the diff from the source they were generated from, and the outputs as they
+        are on disk (None for one that cannot be read). Returns None when the file is to be generated from
+        scratch: it is new or unchanged, its previous source is unknown, or it changed too much.
+        """
+        if not self.update_mode:
+            return None
+        previous_hash = self.manifest.reusable_hash(parsed.file_path)
+        if previous_hash is None or previous_hash == parsed.source_hash:
+            return None
+        previous_source = self.snapshots.load(parsed.file_path, previous_hash)
+        if previous_source is None:
+            return None
+        name = os.path.basename(parsed.file_path)
+        if parsed.line_count > self.modernization_agent.chunking_threshold_lines:
+            # A single update prompt would carry the whole oversized module; it is regenerated in chunks instead
+            print(f"[ORCHESTRATOR] {name} is too large to patch its outputs in one prompt. Regenerating them.")
+            return None
+        java_diff, changed = source_diff(previous_source, parsed.source, name)
+        if changed > UPDATE_MAX_CHANGED_FRACTION:
+            print(f"[ORCHESTRATOR] {name} changed too much to patch its outputs ({changed:.0%} of its lines). Regenerating them.")
+            return None
+        previous = {"java_diff": java_diff}
+        for stage, path in paths.items():
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    previous[stage] = file.read()
+            except (OSError, ValueError):
+                previous[stage] = None
+        if previous["modernize"] is None or previous["modernize"].count('\n') + 1 > self.modernization_agent.chunking_threshold_lines:
+            return None
+        print(f"[ORCHESTRATOR] {name} changed since its outputs were generated; patching them instead of regenerating them.")
+        return previous
+
+    def _patched(self, parsed: ParsedJavaFile, stage: str, patched: str):
+        """Returns a patched output, or None (after saying so) when it is unusable and must be regenerated."""
+        if patched and not patched.startswith("Error:"):
+            self.report.annotate(parsed.file_path, **{f"update_{stage}": "patched"})
+            return patched
+        print(f"[ORCHESTRATOR] Could not patch the previous {stage} output of {os.path.basename(parsed.file_path)} "
+              f"({patched or 'empty response'}). Regenerating it in full.")
+        self.report.annotate(parsed.file_path, **{f"update_{stage}": "regenerated"})
+        return None
+
+    def _kept(self, parsed: ParsedJavaFile, stage: str, previous_output: str) -> str:
+        self.report.annotate(parsed.file_path, **{f"update_{stage}": "kept"})
+        return previous_output
+
+    # === STAGES ===
+    # Each stage returns None when it produced nothing; stages requiring it are then skipped.
+
+    def _modernize_stage(self, parsed: ParsedJavaFile, output_path_py: str, previous: dict = None):
+        file_path = parsed.file_path
+        related_context = self.symbol_index.context_for(file_path)
+        modernized_code = None
+        if previous is not None:
+            modernized_code = self._patched(parsed, "modernize", self.modernization_agent.update_file(
+                file_path, previous["java_diff"], previous["modernize"], related_context))
+        if modernized_code is None:
+            modernized_code = self.modernization_agent.analyze_and_refactor_file(
+                file_path, parsed, related_context, stream_to=output_path_py + PARTIAL_SUFFIX)
+
+        if not modernized_code or modernized_code.startswith("Error:"):
+            print(f"[ORCHESTRATOR] Failed to modernize {file_path}. Skipping.")
+            self.report.record(file_path, "failed", error=modernized_code or "Empty response")
+            return None
+        self._record_stage(parsed, "modernize", modernized_code)
+        return modernized_code
+
+    def _tests_stage(self, parsed: ParsedJavaFile, modernized_code: str, module_name: str, output_path_test: str,
+                     previous: dict = None):
+        test_script = None
+        if previous is not None and previous["tests"]:
+            module_diff, _ = source_diff(previous["modernize"], modernized_code, module_name)
+            if not module_diff:
+                # The module came out unchanged, so its tests still apply as they are
+                test_script = self._kept(parsed, "tests", previous["tests"])
+            else:
+                test_script = self._patched(parsed, "tests", self.testing_agent.update_tests(
+                    previous["java_diff"], module_diff, previous["tests"], module_name))
+        if test_script is None:
+            test_script = self.testing_agent.generate_tests(parsed.source, modernized_code, module_name,
+                                                            stream_to=output_path_test + PARTIAL_SUFFIX)
+        if not test_script or test_script.startswith("Error:"):
+            return None
+        self._record_stage(parsed, "tests", test_script)
+        return test_script
+
+    def _docs_stage(self, parsed: ParsedJavaFile, modernized_code: str, module_name: str, output_path_doc: str,
+                    previous: dict = None):
+        documentation = None
+        if previous is not None and previous["docs"]:
+            module_diff, _ = source_diff(previous["modernize"], modernized_code, module_name)
+            if not module_diff:
+                documentation = self._kept(parsed, "docs", previous["docs"])
+            else:
+                documentation = self._patched(parsed, "docs", self.documentation_agent.update_docs(
+                    module_diff, previous["docs"], module_name))
+        if documentation is None:
+            documentation = self.documentation_agent.generate_docs(modernized_code, module_name,
+                                                                   stream_to=output_path_doc + PARTIAL_SUFFIX)
+        if not documentation or documentation.startswith("Error:"):
+            return None
+        self._record_stage(parsed, "docs", documentation)
+        return documentation
+
+    def _record_stage(self, parsed: ParsedJavaFile, stage: str, output: str):
+        """Stores a generated output in the job store, so an interrupted file resumes after this stage."""
+        if self.jobs is not None:
+            self.jobs.record_stage(parsed.file_path, stage, output)
+
+    def _collect_validations(self):
+        """Waits for the validations handed off by process_file, so their results are in the run report."""
+        with self._validations_lock:
+            validations, self._validations = self._validations, []
+        for file_path, validation in validations:
+            try:
+                validation.result()
+            except Exception as e:
+                print(f"[VALIDATION] Could not validate {os.path.basename(file_path)}: {e}")
+
+    def _validate_stage(self, parsed: ParsedJavaFile, written: list, paths: dict):
+        test_path = paths["tests"] if paths["tests"] in written else None
+        result = validate_outputs(paths["modernize"], test_path, self.output_path, run_tests=self.run_tests)
+        self.report.annotate(parsed.file_path, validation=result)
+        span = get_tracer().current_span()
+        span.set("compiles", result["compiles"])
+        span.set("tests", result["tests"])
+        name = os.path.basename(parsed.file_path)
+        if not result["compiles"]:
+            print(f"[VALIDATION] {name}: generated code does not compile ({'; '.join(result['errors'])}).")
+        elif result["tests"] != "not_run":
+            print(f"[VALIDATION] {name}: tests {result['tests']} in {result['tests_duration']:.1f}s.")
+            if result["tests"] not in ("passed", "no_tests") and result.get("output"):
+                # The last lines say why: the failing assertion, or the import that broke collection
+                tail = [line for line in result["output"].splitlines()
+                        if line.strip() and not line.strip().startswith(('===', '!!!', '^^^'))][-_VALIDATION_OUTPUT_LINES:]
+                print('\n'.join(f"    {line}" for line in tail))
+        return result
 
-            # === PHASE 1: ANALYSIS & REFACTORING ===
-            modernized_code = self.modernization_agent.analyze_and_refactor_file(file_path)
-            
-            if not modernized_code or modernized_code.startswith("Error:"):
-                print(f"[ORCHESTRATOR] Failed to modernize {file_path}. Skipping.")
+    def _write_stage(self, parsed: ParsedJavaFile, results: dict, paths: dict, status: str = "modernized"):
+        # Hand every output to the writer thread first, then wait for all of them together
+        pending = []
+        for stage, label in (("modernize", "modernized code"), ("tests", "generated tests"), ("docs", "generated documentation")):
+            if results[stage] is None:
                 continue
+            print(f"[ORCHESTRATOR] Saving {label} to: {paths[stage]}")
+            pending.append((paths[stage], self.output_writer.submit(paths[stage], results[stage])))
+        outputs, unchanged = [], 0
+        for path, written in pending:
+            if not written.result():
+                unchanged += 1
+            outputs.append(path)
 
-            base_name = os.path.basename(file_path)
-            file_name_without_ext, _ = os.path.splitext(base_name)
-            new_file_name_py = ''.join(['_' + i.lower() if i.isupper() else i for i in file_name_without_ext]).lstrip('_') + '.py'
-            output_path_py = os.path.join(MODERNIZED_CODE_PATH, new_file_name_py)
-            
-            print(f"[ORCHESTRATOR] Saving modernized code to: {output_path_py}")
-            save_modernized_code(output_path_py, modernized_code)
-
-            with open(file_path, 'r', encoding='utf-8') as f:
-                analysis_context = f.read()
-
-            # === PHASE 2: TEST GENERATION ===
-            test_script = self.testing_agent.generate_tests(analysis_context, modernized_code, new_file_name_py)
-            if test_script and not test_script.startswith("Error:"):
-                test_file_name = 'test_' + new_file_name_py
-                output_path_test = os.path.join(MODERNIZED_CODE_PATH, 'tests', test_file_name)
-                print(f"[ORCHESTRATOR] Saving generated tests to: {output_path_test}")
-                save_modernized_code(output_path_test, test_script)
-
-            # === PHASE 3: DOCUMENTATION GENERATION ===
-            documentation = self.documentation_agent.generate_docs(modernized_code, new_file_name_py)
-            if documentation and not documentation.startswith("Error:"):
-                doc_file_name = 'README_' + file_name_without_ext + '.md'
-                output_path_doc = os.path.join(MODERNIZED_CODE_PATH, 'docs', doc_file_name)
-                print(f"[ORCHESTRATOR] Saving generated documentation to: {output_path_doc}")
-                save_modernized_code(output_path_doc, documentation)
-
-        print("\n--- [ORCHESTRATOR] CodeGenesis Pipeline Finished ---")
\ No newline at end of file
+        # Only a file with all three outputs counts as done; anything partial is retried next run
+        if len(outputs) == 3:
+            self.manifest.record(parsed.file_path, parsed.source_hash, outputs)
+            # The source the outputs now describe, for the next run to diff against in update mode
+            try:
+                self.output_writer.write(self.snapshots.path_for(parsed.file_path), parsed.source)
+            except OSError:
+                pass
+            if self.jobs is not None:
+                self.jobs.complete(parsed.file_path, outputs)
+            # Only files generated by the model serve as a reference, so renames never compound
+            if status == "modernized" and parsed.fingerprint is not None:
+                self.fingerprints.record(parsed.fingerprint, parsed.file_path, parsed.identifiers,
+                                         {stage: (paths[stage], results[stage]) for stage in paths})
+        self.report.record(parsed.file_path, status, outputs=len(outputs), unchanged_outputs=unchanged)
+        return outputs
@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+import time
+
+RUN_REPORT_FILE_NAME = "run_report.json"
+# Files listed by name in the summary when their validation did not pass; the rest are in the saved report
+_LISTED_VALIDATION_FAILURES = 10
+
+class RunReport:
+    """
+    Collects the per-file outcome of a pipeline run.
+    Workers record results concurrently, so every mutation goes through a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.files = {}
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def record(self, file_path: str, status: str, **details):
+        """Records (or updates) the outcome of a single input file."""
+        with self._lock:
+            entry = self.files.setdefault(file_path, {})
+            entry["status"] = status
+            entry.update(details)
+
+    def annotate(self, file_path: str, **details):
+        """Adds details to a file's entry without touching its status."""
+        with self._lock:
+            self.files.setdefault(file_path, {"status": "pending"}).update(details)
+
+    def status(self, file_path: str):
+        """The recorded status of a file, or None if nothing was recorded for it."""
+        with self._lock:
+            return self.files.get(file_path, {}).get("status")
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return sum(1 for entry in self.files.values() if entry["status"] == status)
+
+    def finish(self):
+        self.finished_at = time.time()
+
+    def save(self, path: str, legacy_root: str = ""):
+        """Writes every file's outcome (validation results included) as JSON, keyed by the input's relative path."""
+        with self._lock:
+            files = {os.path.relpath(file_path, legacy_root).replace(os.sep, '/') if legacy_root else file_path: dict(entry)
+                     for file_path, entry in self.files.items()}
+        payload = json.dumps({"started_at": self.started_at, "finished_at": self.finished_at, "files": files},
+                             indent=2, sort_keys=True, default=str)
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(payload)
+        except OSError as e:
+            print(f"  [REPORT_WARNING] Could not write the run report to {path}: {e}")
+
+    def print_summary(self):
+        """Prints a short, human readable summary of the run."""
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        with self._lock:
+            statuses, validation = {}, {}
+            outputs = unchanged_outputs = 0
+            updates = {}
+            failing = []
+            for file_path, entry in sorted(self.files.items()):
+                for key, outcome in entry.items():
+                    if key.startswith("update_"):
+                        updates[outcome] = updates.get(outcome, 0) + 1
+                statuses[entry["status"]] = statuses.get(entry["status"], 0) + 1
+                outputs += entry.get("outputs", 0)
+                unchanged_outputs += entry.get("unchanged_outputs", 0)
+                if "validation" in entry:
+                    result = entry["validation"]
+                    outcome = result["tests"] if result["compiles"] else "not_compiling"
+                    validation[outcome] = validation.get(outcome, 0) + 1
+                    if outcome not in ("passed", "no_tests", "not_run"):
+                        failing.append((file_path, outcome, _first_error(result)))
+        print(f"[ORCHESTRATOR] Run summary ({elapsed:.1f}s):")
+        for status, total in sorted(statuses.items()):
+            print(f"  - {status}: {total}")
+        if unchanged_outputs:
+            print(f"[ORCHESTRATOR] Outputs: {outputs - unchanged_outputs} written, {unchanged_outputs} already up to date (not rewritten)")
+        if updates:
+            print("[ORCHESTRATOR] Update mode outputs: " + ", ".join(f"{outcome} {total}" for outcome, total in sorted(updates.items())))
+        if validation:
+            print("[ORCHESTRATOR] Validation: " + ", ".join(f"{outcome} {total}" for outcome, total in sorted(validation.items())))
+        for file_path, outcome, error in failing[:_LISTED_VALIDATION_FAILURES]:
+            print(f"  - {os.path.basename(file_path)}: {outcome}" + (f": {error}" if error else ""))
+        if len(failing) > _LISTED_VALIDATION_FAILURES:
+            print(f"  ... and {len(failing) - _LISTED_VALIDATION_FAILURES} more (see {RUN_REPORT_FILE_NAME} in the output directory)")
+
+def _first_error(result: dict) -> str:
+    """The line of a validation result that says best what went wrong: the compile error, or pytest's first error line."""
+    if result.get("errors"):
+        return result["errors"][0].splitlines()[0]
+    lines = [line.strip() for line in result.get("output", "").splitlines()
+             if line.strip() and not line.strip().startswith(('===', '!!!', '^^^'))]
+    for line in lines:
+        if line.startswith("E "):
+            return line[2:].strip()
+    return lines[-1] if lines else ""
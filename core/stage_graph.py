@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from utils.tracing import get_tracer
+
+class Stage:
+    """
+    One step of the per-file pipeline.
+
+    func receives a dict with the results of the stages it depends on. Stages listed in requires
+    must have produced a result (not None), otherwise this stage is skipped and yields None.
+    Stages listed in after only have to finish first; their result may be None.
+    """
+
+    def __init__(self, name: str, func, requires=(), after=()):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.after = tuple(after)
+
+    @property
+    def depends_on(self) -> tuple:
+        return self.requires + self.after
+
+class StageResults(dict):
+    """{stage name: result}, plus the exception of every stage that raised in .errors."""
+
+    def __init__(self):
+        super().__init__()
+        self.errors = {}
+
+class StageRunner:
+    """
+    Runs per-file stage graphs. Each stage name gets its own thread pool, so every stage type has an
+    independent concurrency limit (e.g. test generation can be throttled without slowing refactoring),
+    and stages of one file that do not depend on each other run in parallel.
+    """
+
+    def __init__(self, limits: dict):
+        self.limits = dict(limits)
+        self._executors = {name: ThreadPoolExecutor(max_workers=max(1, limit), thread_name_prefix=f"stage-{name}")
+                           for name, limit in self.limits.items()}
+        self._lock = threading.Lock()
+        self._durations = {name: [] for name in self.limits}
+
+    def run(self, stages: list, trace_parent=None) -> dict:
+        """
+        Runs a graph of stages to completion and returns StageResults ({stage name: result}).
+        A stage that raises is reported, treated as having produced None and listed in .errors.
+        Each stage is traced as a child span of trace_parent.
+        """
+        by_name = {stage.name: stage for stage in stages}
+        results, pending, futures = StageResults(), dict(by_name), {}
+
+        def submit_ready():
+            for name, stage in list(pending.items()):
+                if not all(dependency in results for dependency in stage.depends_on):
+                    continue
+                del pending[name]
+                if any(results[dependency] is None for dependency in stage.requires):
+                    results[name] = None
+                    continue
+                inputs = {dependency: results[dependency] for dependency in stage.depends_on}
+                futures[self._executors[name].submit(self._timed, stage, inputs, trace_parent)] = name
+
+        submit_ready()
+        while futures or pending:
+            if not futures:
+                # Only reachable if the graph references a stage that does not exist
+                raise ValueError(f"Unresolvable stage dependencies: {sorted(pending)}")
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"[ORCHESTRATOR] Stage '{name}' failed: {e}")
+                    results[name] = None
+                    results.errors[name] = e
+            submit_ready()
+        return results
+
+    def submit(self, stage: Stage, inputs: dict, trace_parent=None):
+        """Starts one stage on its pool, outside any graph, and returns its future without waiting for it."""
+        return self._executors[stage.name].submit(self._timed, stage, inputs, trace_parent)
+
+    def _timed(self, stage: Stage, inputs: dict, trace_parent=None):
+        started = time.perf_counter()
+        try:
+            with get_tracer().span(stage.name, parent=trace_parent) as span:
+                result = stage.func(inputs)
+                span.set("produced", result is not None)
+                return result
+        finally:
+            with self._lock:
+                self._durations[stage.name].append(time.perf_counter() - started)
+
+    def durations(self) -> dict:
+        """Per-stage list of wall-clock durations (seconds) of every stage run so far."""
+        with self._lock:
+            return {name: list(values) for name, values in self._durations.items()}
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
@@ -1,5 +1,66 @@
+import time
+
+# Measured from here, so the startup breakdown includes importing the pipeline itself
+_import_started = time.perf_counter()
+
+import argparse
+import os
+
+from config import (LLM_CACHE_ENABLED, BATCH_SMALL_FILES, STRUCTURAL_REUSE_ENABLED, VALIDATION_ENABLED,
+                    UPDATE_MODE_ENABLED, MODERNIZED_CODE_PATH, JOB_STORE_PATH)
 from core.orchestrator import Orchestrator
+from utils.startup_timing import record_startup
+
+record_startup("imports", time.perf_counter() - _import_started)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the CodeGenesis legacy code modernization pipeline.")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Bypass the on-disk LLM response cache for this run (nothing is read from or written to it).")
+    parser.add_argument("--clear-llm-cache", action="store_true",
+                        help="Delete every cached LLM response before the run starts.")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="Reprocess every Java file, even those unchanged since the last run.")
+    parser.add_argument("--batch-small-files", action="store_true",
+                        help="Modernize small files several at a time in a single LLM request.")
+    parser.add_argument("--force-fresh", action="store_true",
+                        help="Generate every file with the model from scratch: never by renaming the outputs of a structurally "
+                             "identical file, nor by patching the previous outputs of a changed file.")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="Do not compile-check the outputs or run the generated tests after saving them.")
+    parser.add_argument("--job-status", action="store_true",
+                        help="Print the progress of the job store shared by the workers of a run, then exit.")
+    parser.add_argument("--trace", action="store_true",
+                        help="Record a trace of every phase, file, stage and LLM call and export it with metrics at the end.")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    orchestrator = Orchestrator()
-    orchestrator.execute_modernization_pipeline()
\ No newline at end of file
+    args = parse_args()
+
+    if args.job_status:
+        from utils.job_store import JOB_STORE_FILE_NAME, JobStore, format_progress
+        store_path = JOB_STORE_PATH or os.path.join(MODERNIZED_CODE_PATH, JOB_STORE_FILE_NAME)
+        if not os.path.exists(store_path):
+            print(f"[MAIN] No job store at {store_path}.")
+        else:
+            store = JobStore(store_path)
+            print(f"[MAIN] Job store {store_path}: {format_progress(store.progress())}.")
+            store.close()
+        raise SystemExit(0)
+
+    if args.clear_llm_cache:
+        from utils.llm_client import get_response_cache
+        get_response_cache().invalidate()
+        print("[MAIN] Cleared the LLM response cache.")
+
+    if args.trace:
+        from utils.tracing import get_tracer
+        get_tracer().enabled = True
+
+    orchestrator = Orchestrator(use_llm_cache=LLM_CACHE_ENABLED and not args.no_llm_cache,
+                                force_full_rebuild=args.full_rebuild,
+                                batch_small_files=BATCH_SMALL_FILES or args.batch_small_files,
+                                reuse_structural_duplicates=STRUCTURAL_REUSE_ENABLED and not args.force_fresh,
+                                validate=VALIDATION_ENABLED and not args.no_validate,
+                                update_mode=UPDATE_MODE_ENABLED and not args.force_fresh)
+    orchestrator.execute_modernization_pipeline()
@@ -1,3 +1,5 @@
+from prompts.analysis_prompts import edit_format_instructions
+
 def create_test_generation_prompt(code_analysis: str, modernized_code: str, file_path: str) -> str:
     """Creates a prompt to generate unit tests for the modernized code."""
     prompt = f"""
@@ -47,4 +49,55 @@ def create_documentation_prompt(modernized_code: str, file_path: str) -> str:
 
     Begin writing the README.md file now.
     """
-    return prompt
\ No newline at end of file
+    return prompt
+
+def create_test_update_prompt(java_diff: str, module_diff: str, previous_tests: str, file_path: str) -> str:
+    """Creates a prompt to update a previously generated test suite after a change to the code it tests."""
+    prompt = f"""
+    **Objective:** You are a meticulous QA Automation Engineer. The Python module `{file_path}` has a `pytest` test suite, and the module has just been updated after a change to the legacy Java code it was modernized from. Your task is to update the test suite so it tests the module as it is now.
+
+    **Change to the Original Java Code (unified diff):**
+```diff
+{java_diff}
+```
+
+    **Change to the Python Module (unified diff):**
+```diff
+{module_diff}
+```
+
+    **Previous Test Suite:**
+```python
+{previous_tests}
+```
+
+    **Instructions:**
+    1.  **Analyze:** Identify the tests the change affects: tests of changed behaviour, of removed code, and missing tests for new functionality.
+    2.  **Update:** Fix or remove the affected tests and add tests for the new functionality, in the style of the existing tests. The suite must stay a complete, runnable `pytest` script.
+{edit_format_instructions("test suite")}
+    Begin the update now.
+    """
+    return prompt
+
+def create_documentation_update_prompt(module_diff: str, previous_docs: str, file_path: str) -> str:
+    """Creates a prompt to update a previously generated README.md after a change to the documented code."""
+    prompt = f"""
+    **Objective:** You are a professional Technical Writer. The Python script `{file_path}` has a `README.md`, and the script has just been changed. Your task is to update the README so it documents the script as it is now.
+
+    **Change to the Python Script (unified diff):**
+```diff
+{module_diff}
+```
+
+    **Previous README.md:**
+```markdown
+{previous_docs}
+```
+
+    **Instructions:**
+    1.  **Analyze:** Identify the parts of the README the change affects: attributes, endpoints, behaviour and usage examples.
+    2.  **Update:** Rewrite only those parts, keeping the structure and tone of the existing README.
+{edit_format_instructions("README")}
+    Begin the update now.
+    """
+    return prompt
@@ -1,20 +1,33 @@
 from config import TARGET_LANGUAGE, TARGET_FRAMEWORK
+from utils.batch_protocol import FILE_START, FILE_END
+from utils.patching import EDIT_SEARCH, EDIT_DIVIDER, EDIT_REPLACE, NO_CHANGES
 
-def create_analysis_and_refactor_prompt(code_structure: str, file_path: str) -> str:
+def create_analysis_and_refactor_prompt(code_structure: str, file_path: str, related_context: str = "") -> str:
     """
     Creates a detailed prompt for both analyzing and refactoring the code.
     This single, powerful prompt instructs the model to perform the full task.
+    related_context holds the signatures of other project types the file uses, if any.
     """
+    related_section = ""
+    if related_context:
+        related_section = f"""
+    **Related Project Types (signatures only, defined in other files of the same project):**
+    These types are modernized into their own Python modules. Import them from those modules instead of redefining them.
+    ```
+    {related_context}
+    ```
+"""
+
     prompt = f"""
     **Objective:** You are an expert software engineer specializing in legacy code modernization. Your task is to analyze a piece of legacy Java code and refactor it into a modern {TARGET_LANGUAGE} application using the {TARGET_FRAMEWORK} framework.
 
     **Source Java File:** `{file_path}`
 
-    **Analysis of the Code Structure (AST or Raw Code):**
+    **Analysis of the Code Structure (Compact AST Summary or Raw Code):**
     ```
     {code_structure}
     ```
-
+{related_section}
     **Instructions:**
     1.  **Analyze:** First, deeply understand the purpose of the Java code provided. Identify the main classes, methods, attributes, and the core business logic it represents. What is its primary function?
     2.  **Modernize:** Rewrite this logic as a complete, runnable {TARGET_LANGUAGE} file.
@@ -30,4 +43,160 @@ def create_analysis_and_refactor_prompt(code_structure: str, file_path: str) ->
 
     Begin the refactoring now.
     """
-    return prompt
\ No newline at end of file
+    return prompt
+
+def create_chunk_refactor_prompt(chunk, class_outline: str, file_path: str, part_names: list, related_context: str = "") -> str:
+    """
+    Creates a prompt for modernizing one chunk of an oversized Java file.
+    Each chunk is rewritten on its own; the answers are merged back into a single module, so every
+    prompt pins down exactly which Python class the chunk must produce.
+    """
+    if chunk.role == "main":
+        bases = ', '.join(part_names)
+        task = f"""Rewrite the declaration, fields and constructors of class `{chunk.name}` as the main {TARGET_LANGUAGE} class `{chunk.name}`.
+        -   Its methods are modernized separately into the mixin classes {bases or '(none)'}. The class MUST inherit from {('these mixins, in this order, followed by any base class you need (e.g. `BaseModel`)') if part_names else 'any base class you need (e.g. `BaseModel`)'}.
+        -   Do NOT implement the methods handled by other parts and do NOT define the mixin classes yourself.
+        -   This is the only part that may create the {TARGET_FRAMEWORK} `app` and its endpoints. Endpoints may call any method listed in the class outline."""
+    elif chunk.role == "methods":
+        task = f"""Rewrite ONLY the methods below as methods of a mixin class named exactly `{chunk.name}`.
+        -   The fields and constructor live in the main class `{chunk.name.rsplit('Part', 1)[0]}`, which inherits from this mixin. Access them through `self`.
+        -   Do NOT define the main class, any fields, a constructor, an `app`, or any endpoints."""
+    else:
+        task = f"""Rewrite the type `{chunk.name}` as a standalone, module-level {TARGET_LANGUAGE} class named `{chunk.name}`.
+        -   Do NOT define the main class or any {TARGET_FRAMEWORK} `app` or endpoints."""
+
+    related_section = ""
+    if related_context:
+        related_section = f"""
+    **Related Project Types (signatures only, defined in other files of the same project):**
+    Import these from their own modules instead of redefining them.
+    ```
+    {related_context}
+    ```
+"""
+
+    prompt = f"""
+    **Objective:** You are an expert software engineer specializing in legacy code modernization. A legacy Java file is too large to modernize in one step, so it has been split into parts that are modernized separately and merged into one {TARGET_LANGUAGE} module using {TARGET_FRAMEWORK}. You are handling one part.
+
+    **Source Java File:** `{file_path}`
+
+    **Outline of the Whole File (signatures only):**
+    ```
+    {class_outline}
+    ```
+{related_section}
+    **Java Code of This Part:**
+    ```java
+    {chunk.source}
+    ```
+
+    **Your Task:**
+        {task}
+
+    **Instructions:**
+    1.  **Modernize:** Preserve the behaviour of the Java code exactly. Use modern language features, proper typing, and PEP 8 naming (snake_case methods and attributes).
+    2.  **Imports:** Include every import your code needs at the top. Duplicate imports across parts are removed when merging.
+    3.  **Provide Only Code:** Your output must be ONLY valid {TARGET_LANGUAGE} code. Do not include explanations or markdown formatting tags like ```python.
+
+    Begin the refactoring of this part now.
+    """
+    return prompt
+
+def create_batch_refactor_prompt(files: list, related_context: str = "") -> str:
+    """
+    Creates a prompt that modernizes several small Java files in one request.
+    files is a list of (file_path, code_structure) pairs. The answer must use the delimited
+    multi-file format from utils/batch_protocol.py, so it can be split back into one module per file.
+    """
+    sources = '\n'.join(f"""
+    **Source Java File {index}:** `{file_path}`
+    ```
+    {code_structure}
+    ```
+""" for index, (file_path, code_structure) in enumerate(files, start=1))
+
+    related_section = ""
+    if related_context:
+        related_section = f"""
+    **Related Project Types (signatures only, defined in other files of the same project):**
+    These types are modernized into their own Python modules. Import them from those modules instead of redefining them.
+    ```
+    {related_context}
+    ```
+"""
+
+    example_path = files[0][0]
+    prompt = f"""
+    **Objective:** You are an expert software engineer specializing in legacy code modernization. Your task is to analyze {len(files)} small legacy Java files and refactor EACH of them into its own modern {TARGET_LANGUAGE} module using the {TARGET_FRAMEWORK} framework.
+
+    **Analysis of the Code Structure of Each File (Compact AST Summary or Raw Code):**
+{sources}{related_section}
+    **Instructions:**
+    1.  **Analyze:** Understand the purpose of each Java file: its classes, methods, attributes and business logic.
+    2.  **Modernize:** Rewrite each file as a complete, runnable {TARGET_LANGUAGE} module. Each module is saved as a separate file, so it must include all of its own imports. Types from the other files in this request are modernized into their own modules; import them, do not redefine them.
+    3.  **Apply Best Practices:**
+        -   Use the {TARGET_FRAMEWORK} framework to expose the logic as a RESTful API if applicable. For a data class, create a Pydantic model.
+        -   Use modern language features, proper typing, and clear variable names.
+        -   Ensure the code is clean, efficient, and follows PEP 8 standards for Python.
+    4.  **Output Format:** Output one section per Java file, in the order given, using exactly these marker lines with the file path copied verbatim:
+        {FILE_START.format(path=example_path)}
+        ...the complete {TARGET_LANGUAGE} code for that file...
+        {FILE_END.format(path=example_path)}
+        Output nothing outside these sections. Do not include explanations or markdown formatting tags like ```python.
+
+    Begin the refactoring now.
+    """
+    return prompt
+
+def edit_format_instructions(output_name: str) -> str:
+    """The answer format of every update prompt: search/replace edits, parsed by utils/patching.py."""
+    return f"""
+    **Output Format:** Answer ONLY with edits to the previous {output_name}, each one exactly in this form:
+{EDIT_SEARCH}
+<lines copied verbatim from the previous {output_name}>
+{EDIT_DIVIDER}
+<the lines that replace them>
+{EDIT_REPLACE}
+    -   The SEARCH lines must match the previous {output_name} exactly, indentation included, and occur only once in it: include enough surrounding lines to make them unique.
+    -   To add lines, put the existing line(s) next to where they go in SEARCH and repeat them in the replacement. To delete lines, leave the replacement empty.
+    -   Keep every edit as small as possible and leave everything the change does not affect untouched.
+    -   If the previous {output_name} needs no change at all, answer exactly `{NO_CHANGES}`.
+    -   Do not add explanations or markdown tags.
+"""
+
+def create_module_update_prompt(java_diff: str, previous_code: str, file_path: str, related_context: str = "") -> str:
+    """
+    Creates a prompt that updates a previously modernized module after a small change to its Java source.
+    The model gets the unified diff of the Java file and the previous module, and answers with edits
+    to the module (see edit_format_instructions) instead of rewriting it.
+    """
+    related_section = ""
+    if related_context:
+        related_section = f"""
+    **Related Project Types (signatures only, defined in other files of the same project):**
+    These types are modernized into their own Python modules. Import them from those modules instead of redefining them.
+    ```
+    {related_context}
+    ```
+"""
+
+    prompt = f"""
+    **Objective:** You are an expert software engineer specializing in legacy code modernization. The legacy Java file `{file_path}` was already refactored into a modern {TARGET_LANGUAGE} module using the {TARGET_FRAMEWORK} framework. The Java file has since changed. Your task is to update the {TARGET_LANGUAGE} module so it reflects the change.
+
+    **Change to the Java File (unified diff):**
+```diff
+{java_diff}
+```
+
+    **Previous {TARGET_LANGUAGE} Module:**
+```python
+{previous_code}
+```
+{related_section}
+    **Instructions:**
+    1.  **Analyze:** Understand what the Java change does: new, removed or modified classes, fields, methods and business logic.
+    2.  **Update:** Change only the parts of the module that correspond to the changed Java code, following the style and conventions the module already uses.
+{edit_format_instructions("module")}
+    Begin the update now.
+    """
+    return prompt
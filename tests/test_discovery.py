@@ -0,0 +1,26 @@
+import os
+
+from utils.discovery import iter_java_files
+
+def _touch(root, relative):
+    path = os.path.join(root, *relative.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'w').close()
+
+def _discovered(root):
+    return sorted(os.path.relpath(path, root).replace(os.sep, '/') for path in iter_java_files(str(root)))
+
+def test_build_output_of_nested_modules_is_skipped(tmp_path):
+    for relative in ["pom.xml", "moduleA/pom.xml", "moduleA/src/main/java/x/A.java",
+                     "moduleA/target/classes.java",
+                     "moduleA/build/generated/sources/annotationProcessor/java/main/x/Gen.java",
+                     "moduleB/build.gradle.kts", "moduleB/src/main/java/com/acme/out/B.java",
+                     "moduleB/out/Stale.java", "target/Root.java"]:
+        _touch(tmp_path, relative)
+    assert _discovered(tmp_path) == ["moduleA/src/main/java/x/A.java", "moduleB/src/main/java/com/acme/out/B.java"]
+
+def test_build_named_package_without_build_file_is_kept(tmp_path):
+    for relative in ["src/com/acme/build/Builder.java", "src/com/acme/out/Writer.java",
+                     "src/com/acme/build/generated/Gen.java"]:
+        _touch(tmp_path, relative)
+    assert _discovered(tmp_path) == ["src/com/acme/build/Builder.java", "src/com/acme/out/Writer.java"]
@@ -0,0 +1,40 @@
+import os
+import re
+
+# Delimiters of the multi-file response format. They are Python comments, so a stray marker
+# left in an output cannot break the module it ends up in.
+FILE_START = "# === BEGIN FILE: {path} ==="
+FILE_END = "# === END FILE: {path} ==="
+
+_MARKER_PATTERN = re.compile(r"^[ \t]*# === (BEGIN|END) FILE: (.+?) ===[ \t]*$", re.MULTILINE)
+
+def split_batched_response(text: str, expected_paths: list) -> dict:
+    """
+    Splits a multi-file response into {path: code}. Only complete sections (a BEGIN marker followed
+    by the matching END marker) for one of expected_paths are returned; a file that is missing, cut off
+    or not closed properly is simply absent, so the caller can retry it on its own.
+    Paths the model echoed back as a bare file name are matched when the name is unambiguous.
+    """
+    by_name = {}
+    for path in expected_paths:
+        by_name.setdefault(os.path.basename(path), []).append(path)
+
+    def resolve(echoed: str):
+        echoed = echoed.strip().strip('`')
+        if echoed in expected_paths:
+            return echoed
+        candidates = by_name.get(os.path.basename(echoed.replace('\\', '/')), [])
+        return candidates[0] if len(candidates) == 1 else None
+
+    sections = {}
+    open_path, open_at = None, None
+    for marker in _MARKER_PATTERN.finditer(text):
+        kind, path = marker.group(1), resolve(marker.group(2))
+        if kind == "BEGIN":
+            # A BEGIN while another section is still open means that section was never closed
+            open_path, open_at = path, marker.end()
+        elif open_path is not None and path == open_path:
+            if open_path not in sections:
+                sections[open_path] = text[open_at:marker.start()].strip()
+            open_path, open_at = None, None
+    return {path: code for path, code in sections.items() if code}
@@ -1,38 +1,516 @@
 import javalang
 import os
+import re
+import threading
 
-def parse_java_file_to_ast_str(file_path: str) -> str:
+from config import AST_SUMMARY_TOKEN_BUDGET
+from utils.discovery import iter_java_files
+from utils.run_manifest import content_hash
+
+def parse_java_file_to_ast_str(file_path: str, token_budget: int = AST_SUMMARY_TOKEN_BUDGET) -> str:
     """
-    Parses a Java file and returns its Abstract Syntax Tree (AST) representation as a string.
+    Parses a Java file and returns a compact structural summary of its Abstract Syntax Tree (AST).
     If parsing fails, it returns the raw code as a fallback.
     """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        code = file.read()
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            code = file.read()
         # Attempt to parse the code into an AST
         tree = javalang.parse.parse(code)
-        # Return the string representation of the AST for the LLM to analyze
-        return str(tree)
     except Exception as e:
         print(f"  [PARSER_WARNING] Could not parse {os.path.basename(file_path)} into an AST: {e}. Falling back to raw code.")
-        # As a fallback, read the raw code and return it
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
+        # As a fallback, return the raw code we already read
+        return code
+    # Return a compact summary rather than str(tree): the repr of a javalang tree is
+    # several times larger than the source itself and inflates every prompt.
+    return summarize_java_ast(tree, code, token_budget)
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for prompt budgeting."""
+    return (len(text) + 3) // 4
+
+# === COMPACT AST SUMMARY ===
+# The summary keeps everything the model needs to rewrite the code (package, imports,
+# type declarations, annotations with their arguments, fields with their initializers,
+# enum constants with their arguments, initializer blocks, signatures and method bodies)
+# in a plain, indented text form. When the result is over the token budget it degrades in
+# steps: trivial getter/setter bodies are elided first, then the largest remaining bodies,
+# initializers and enum constant lists, and finally the summary is cut off.
+
+def summarize_java_ast(tree, code: str, token_budget: int = AST_SUMMARY_TOKEN_BUDGET) -> str:
+    """Renders a javalang CompilationUnit as a compact, token-budgeted structural summary."""
+    bodies = _SourceTexts(tree, code)
+
+    summary = _render_compilation_unit(tree, bodies)
+    if not token_budget or estimate_tokens(summary) <= token_budget:
+        return summary
+
+    # Work out what to elide from per-body sizes instead of re-rendering after every step,
+    # which would be quadratic on classes with thousands of methods.
+    size = len(summary)
+    budget_chars = token_budget * 4
+
+    # Step 1: trivial accessors carry no logic worth the tokens
+    for node in bodies.trivial:
+        if node in bodies.text:
+            bodies.elided.add(node)
+            size -= max(0, len(bodies.text[node]) - len(_ELIDED_ACCESSOR))
+
+    # Step 2: elide the largest remaining bodies, initializers and constant lists until the summary fits
+    for node in sorted(bodies.text, key=lambda n: len(bodies.text[n]), reverse=True):
+        if size <= budget_chars:
+            break
+        if node not in bodies.elided:
+            bodies.elided.add(node)
+            size -= max(0, len(bodies.text[node]) - len(_ELIDED_ACCESSOR))
+
+    summary = _render_compilation_unit(tree, bodies)
+    if estimate_tokens(summary) <= token_budget:
+        return summary
+
+    # Step 3: even the signatures do not fit, so cut the summary off at the budget
+    cut = summary[:budget_chars]
+    cut = cut[:cut.rfind('\n')] if '\n' in cut else cut
+    return cut + f"\n// ... summary truncated to fit a budget of ~{token_budget} tokens ..."
+
+_ELIDED_ACCESSOR = " { /* trivial accessor, body elided */ }"
+_TYPE_DECLARATIONS = (javalang.tree.ClassDeclaration, javalang.tree.InterfaceDeclaration,
+                      javalang.tree.EnumDeclaration, javalang.tree.AnnotationDeclaration)
+
+class _SourceTexts:
+    """
+    Source text of the parts of a file the summary renders verbatim, taken from the code itself since
+    javalang keeps no text and only some positions.
+
+    text maps each elidable part to its text: a method/constructor (its body), a field declarator (its
+    initializer), an EnumBody (its constants with their arguments and bodies) or the id() of an
+    initializer block (its body; javalang gives such blocks no node, only the list of their statements).
+    annotations maps each annotation to its text, arguments included; they are short and never elided.
+    """
+
+    def __init__(self, tree=None, code: str = None):
+        self.text = {}
+        self.trivial = set()
+        self.elided = set()
+        self.static_blocks = set()
+        self.annotations = {}
+        if tree is None:
+            # Signature-only rendering: no bodies at all
+            return
+        offsets = line_offsets(code)
+
+        for _, node in tree.filter(javalang.tree.MethodDeclaration):
+            self._collect(node, code, offsets)
+            if _is_trivial_accessor(node):
+                self.trivial.add(node)
+        for _, node in tree.filter(javalang.tree.ConstructorDeclaration):
+            self._collect(node, code, offsets)
+        for _, node in tree.filter(javalang.tree.FieldDeclaration):
+            self._collect_initializers(node, code, offsets)
+        for _, node in tree.filter(javalang.tree.EnumDeclaration):
+            self._collect_constants(node, code, offsets)
+        for _, node in tree.filter(javalang.tree.Annotation):
+            self._collect_annotation(node, code, offsets)
+        for node_type in _TYPE_DECLARATIONS:
+            for _, node in tree.filter(node_type):
+                members = node.body.declarations if isinstance(node.body, javalang.tree.EnumBody) else node.body
+                for member in members or []:
+                    if isinstance(member, list):
+                        self._collect_initializer_block(member, code, offsets)
+
+    def _collect(self, node, code, offsets):
+        if node.body is None or node.position is None:
+            return
+        start = offsets[node.position.line - 1] + node.position.column - 1
+        block = _extract_block(code, start)
+        if block is not None:
+            self.text[node] = block
+
+    def _collect_initializers(self, node, code, offsets):
+        """The initializer of each declarator; the declaration's position is that of its type."""
+        if node.position is None:
+            return
+        cursor = offsets[node.position.line - 1] + node.position.column - 1
+        end = _scan_to(code, cursor, ';')
+        for declarator in node.declarators:
+            match = re.compile(rf"\b{re.escape(declarator.name)}\s*(?:\[\s*\]\s*)*([=,;])").search(code, cursor, end + 1)
+            if match is None:
+                return
+            cursor = match.end()
+            if match.group(1) == '=':
+                initializer_end = _scan_to(code, cursor, ',;')
+                self.text[declarator] = _strip_comments(code[cursor:initializer_end]).strip()
+                cursor = initializer_end + 1
+
+    def _collect_constants(self, node, code, offsets):
+        """The enum constants as written, arguments and constant bodies included."""
+        if node.position is None or node.body is None or not node.body.constants:
+            return
+        span = find_block_span(code, offsets[node.position.line - 1] + node.position.column - 1)
+        if span is None:
+            return
+        body_start, body_end = span
+        constants_end = min(_scan_to(code, body_start, ';'), body_end)
+        constants, cursor = [], body_start
+        while cursor < constants_end:
+            constant_end = min(_scan_to(code, cursor, ','), constants_end)
+            constant = ' '.join(_strip_comments(code[cursor:constant_end]).split())
+            if constant:
+                constants.append(constant)
+            cursor = constant_end + 1
+        if len(constants) == len(node.body.constants):
+            self.text[node.body] = ', '.join(constants)
+
+    def _collect_annotation(self, node, code, offsets):
+        if node.position is None:
+            return
+        start = offsets[node.position.line - 1] + node.position.column - 1
+        match = re.compile(r"@\s*[\w.]+\s*").match(code, start)
+        if match is None:
+            return
+        end = match.end()
+        if code.startswith('(', end):
+            end = _scan_to(code, end + 1, ')') + 1
+        self.annotations[node] = ' '.join(_strip_comments(code[start:end]).split())
+
+    def _collect_initializer_block(self, statements, code, offsets):
+        """A static or instance initializer block, found from the brace before its first statement."""
+        first = next((statement for statement in statements if getattr(statement, 'position', None) is not None), None)
+        if first is None:
+            return
+        brace = code.rfind('{', 0, offsets[first.position.line - 1] + first.position.column - 1)
+        block = _extract_block(code, brace) if brace != -1 else None
+        if block is None:
+            return
+        self.text[id(statements)] = block
+        if re.search(r"\bstatic\s*$", code[max(0, brace - 20):brace]):
+            self.static_blocks.add(id(statements))
+
+def _scan_to(code: str, start: int, stops: str) -> int:
+    """
+    Offset of the first character in stops from start on that is outside any string, comment and
+    (), [] or {} nesting, or of the closing bracket that ends the enclosing nesting; len(code) if neither.
+    """
+    i, depth, length = start, 0, len(code)
+    while i < length:
+        char = code[i]
+        if char in '"\'':
+            quote = char
+            i += 1
+            while i < length and code[i] != quote:
+                i += 2 if code[i] == '\\' else 1
+        elif code.startswith('//', i):
+            i = code.find('\n', i)
+            if i == -1:
+                return length
+        elif code.startswith('/*', i):
+            i = code.find('*/', i)
+            if i == -1:
+                return length
+            i += 1
+        elif depth == 0 and char in stops:
+            return i
+        elif char in '([{':
+            depth += 1
+        elif char in ')]}':
+            if depth == 0:
+                return i
+            depth -= 1
+        i += 1
+    return length
+
+def _strip_comments(text: str) -> str:
+    """text without its // and /* */ comments; string and char literals are left alone."""
+    result, i, length = [], 0, len(text)
+    while i < length:
+        char = text[i]
+        if char in '"\'':
+            end = i + 1
+            while end < length and text[end] != char:
+                end += 2 if text[end] == '\\' else 1
+            result.append(text[i:end + 1])
+            i = end + 1
+        elif text.startswith('//', i):
+            end = text.find('\n', i)
+            i = length if end == -1 else end
+        elif text.startswith('/*', i):
+            end = text.find('*/', i)
+            result.append(' ')
+            i = length if end == -1 else end + 2
+        else:
+            result.append(char)
+            i += 1
+    return ''.join(result)
+
+def _is_trivial_accessor(node) -> bool:
+    """True for `return field;` getters and `this.field = value;` setters."""
+    if not node.body or len(node.body) != 1:
+        return False
+    statement = node.body[0]
+    if isinstance(statement, javalang.tree.ReturnStatement):
+        expression = statement.expression
+        return isinstance(expression, (javalang.tree.MemberReference, javalang.tree.This)) and not node.parameters
+    if isinstance(statement, javalang.tree.StatementExpression):
+        expression = statement.expression
+        return (isinstance(expression, javalang.tree.Assignment)
+                and isinstance(expression.value, javalang.tree.MemberReference)
+                and len(node.parameters) == 1)
+    return False
+
+def _extract_block(code: str, start: int):
+    """Returns the text between the first top-level '{' after start and its matching '}'."""
+    span = find_block_span(code, start)
+    return code[span[0]:span[1]] if span else None
+
+def find_block_span(code: str, start: int):
+    """
+    Finds the first top-level '{' after offset start and its matching '}'.
+    Returns (offset after '{', offset of '}') or None if the block is not closed.
+    String/char literals and comments are skipped so braces inside them are ignored.
+    """
+    i, depth, paren_depth, body_start = start, 0, 0, None
+    length = len(code)
+    while i < length:
+        char = code[i]
+        if char in '"\'':
+            quote = char
+            i += 1
+            while i < length and code[i] != quote:
+                i += 2 if code[i] == '\\' else 1
+        elif code.startswith('//', i):
+            i = code.find('\n', i)
+            if i == -1:
+                return None
+        elif code.startswith('/*', i):
+            i = code.find('*/', i)
+            if i == -1:
+                return None
+            i += 1
+        elif char == '(':
+            paren_depth += 1
+        elif char == ')':
+            paren_depth -= 1
+        elif char == '{' and paren_depth == 0:
+            if depth == 0:
+                body_start = i + 1
+            depth += 1
+        elif char == '}' and body_start is not None:
+            depth -= 1
+            if depth == 0:
+                return body_start, i
+        i += 1
+    return None
+
+def line_offsets(code: str) -> list:
+    """Offsets of the first character of each line, so that offsets[line - 1] maps a 1-based line to an offset."""
+    offsets = [0]
+    for line in code.splitlines(keepends=True):
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+def _compact_body(body: str) -> str:
+    lines = [line.strip() for line in body.splitlines()]
+    lines = [line for line in lines if line]
+    if not lines:
+        return "{ }"
+    if len(lines) == 1:
+        return "{ " + lines[0] + " }"
+    return "{\n" + "\n".join(lines) + "\n}"
+
+def _type_str(node) -> str:
+    if node is None:
+        return "void"
+    name = node.name
+    if getattr(node, 'arguments', None):
+        arguments = []
+        for argument in node.arguments:
+            if argument.type is None:
+                arguments.append('?')
+            elif argument.pattern_type:
+                arguments.append(f"? {argument.pattern_type} {_type_str(argument.type)}")
+            else:
+                arguments.append(_type_str(argument.type))
+        name += '<' + ', '.join(arguments) + '>'
+    if getattr(node, 'sub_type', None):
+        name += '.' + _type_str(node.sub_type)
+    return name + '[]' * len(node.dimensions or [])
+
+def _modifiers_str(node, bodies=None) -> str:
+    annotations = [bodies.annotations.get(annotation, f"@{annotation.name}") if bodies else f"@{annotation.name}"
+                   for annotation in (node.annotations or [])]
+    return ' '.join(annotations + sorted(node.modifiers or []))
+
+def _params_str(parameters, bodies=None) -> str:
+    rendered = []
+    for parameter in parameters:
+        varargs = '...' if parameter.varargs else ''
+        annotations = ''.join(bodies.annotations[annotation] + ' ' for annotation in parameter.annotations or []
+                              if annotation in bodies.annotations) if bodies else ''
+        rendered.append(f"{annotations}{_type_str(parameter.type)}{varargs} {parameter.name}")
+    return ', '.join(rendered)
+
+def _prefixed(modifiers: str, text: str) -> str:
+    return f"{modifiers} {text}" if modifiers else text
+
+def _render_compilation_unit(tree, bodies: _SourceTexts) -> str:
+    lines = []
+    if tree.package:
+        lines.append(f"package {tree.package.name}")
+    for imported in tree.imports:
+        suffix = '.*' if imported.wildcard else ''
+        static = 'static ' if imported.static else ''
+        lines.append(f"import {static}{imported.path}{suffix}")
+    for type_declaration in tree.types:
+        _render_type(type_declaration, bodies, lines, indent='')
+    return '\n'.join(lines)
+
+def render_type_signature(node, include_private: bool = False) -> str:
+    """
+    Renders a type declaration (and its nested types) as signatures only, without any method bodies.
+    Private members are left out by default since other files cannot use them anyway.
+    """
+    lines = []
+    _render_type(node, _SourceTexts(), lines, indent='', include_private=include_private)
+    return '\n'.join(lines)
+
+def member_signatures(node) -> dict:
+    """Maps each field and method name declared directly in a type to its one-line signature."""
+    signatures = {}
+    for member in node.body if isinstance(node.body, list) else []:
+        if isinstance(member, javalang.tree.FieldDeclaration):
+            for declarator in member.declarators:
+                signatures[declarator.name] = f"{_type_str(member.type)} {declarator.name}"
+        elif isinstance(member, javalang.tree.MethodDeclaration):
+            signatures[member.name] = f"{_type_str(member.return_type)} {member.name}({_params_str(member.parameters)})"
+    return signatures
+
+def _render_type(node, bodies: _SourceTexts, lines: list, indent: str, include_private: bool = True):
+    kind = {
+        javalang.tree.ClassDeclaration: 'class',
+        javalang.tree.InterfaceDeclaration: 'interface',
+        javalang.tree.EnumDeclaration: 'enum',
+        javalang.tree.AnnotationDeclaration: '@interface',
+    }.get(type(node), 'type')
+    header = _prefixed(_modifiers_str(node, bodies), f"{kind} {node.name}")
+    if getattr(node, 'type_parameters', None):
+        header += '<' + ', '.join(parameter.name for parameter in node.type_parameters) + '>'
+    extends = getattr(node, 'extends', None)
+    if extends:
+        extends = extends if isinstance(extends, list) else [extends]
+        header += ' extends ' + ', '.join(_type_str(t) for t in extends)
+    if getattr(node, 'implements', None):
+        header += ' implements ' + ', '.join(_type_str(t) for t in node.implements)
+    lines.append(indent + header)
+
+    member_indent = indent + '  '
+    if isinstance(node, javalang.tree.EnumDeclaration) and node.body:
+        constants = bodies.text.get(node.body)
+        if constants is None or node.body in bodies.elided:
+            constants = ', '.join(constant.name for constant in node.body.constants)
+        lines.append(f"{member_indent}constants: {constants}")
+
+    for member in node.body if not isinstance(node, javalang.tree.EnumDeclaration) else (node.body.declarations if node.body else []):
+        if not include_private and 'private' in (getattr(member, 'modifiers', None) or ()):
+            continue
+        if isinstance(member, list):
+            _render_initializer_block(member, bodies, lines, member_indent)
+        elif isinstance(member, javalang.tree.FieldDeclaration):
+            for declarator in member.declarators:
+                initializer = ''
+                text = bodies.text.get(declarator)
+                if text is not None and declarator not in bodies.elided:
+                    initializer = " = " + _indent_lines(text, member_indent)
+                elif isinstance(declarator.initializer, javalang.tree.Literal):
+                    initializer = f" = {declarator.initializer.value}"
+                elif declarator.initializer is not None:
+                    initializer = " = <initialized>"
+                field = f"{_type_str(member.type)} {declarator.name}{initializer}"
+                lines.append(member_indent + _prefixed(_modifiers_str(member, bodies), field))
+        elif isinstance(member, (javalang.tree.MethodDeclaration, javalang.tree.ConstructorDeclaration)):
+            _render_callable(member, bodies, lines, member_indent)
+        elif isinstance(member, (javalang.tree.ClassDeclaration, javalang.tree.InterfaceDeclaration,
+                                 javalang.tree.EnumDeclaration, javalang.tree.AnnotationDeclaration)):
+            _render_type(member, bodies, lines, member_indent, include_private)
+
+def _render_initializer_block(statements, bodies: _SourceTexts, lines: list, indent: str):
+    key = id(statements)
+    body = bodies.text.get(key)
+    if body is None:
+        return
+    keyword = "static" if key in bodies.static_blocks else "initializer"
+    if key in bodies.elided:
+        elided_lines = len([line for line in body.splitlines() if line.strip()])
+        lines.append(f"{indent}{keyword} {{ /* {elided_lines} line(s) elided */ }}")
+    else:
+        body_indent = indent + '  '
+        compact = _compact_body(body).replace('\n', '\n' + body_indent).replace('\n' + body_indent + '}', '\n' + indent + '}')
+        lines.append(f"{indent}{keyword} {compact}")
+
+def _indent_lines(text: str, indent: str) -> str:
+    """A multi-line initializer with its continuation lines stripped and re-indented under the field at indent."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return '\n'.join([lines[0]] + [indent + ('' if line.startswith(('}', ')', ']')) else '  ') + line for line in lines[1:]])
+
+def _render_callable(node, bodies: _SourceTexts, lines: list, indent: str):
+    if isinstance(node, javalang.tree.ConstructorDeclaration):
+        signature = f"{node.name}({_params_str(node.parameters, bodies)})"
+    else:
+        signature = f"{_type_str(node.return_type)} {node.name}({_params_str(node.parameters, bodies)})"
+    if node.throws:
+        signature += ' throws ' + ', '.join(node.throws)
+    signature = indent + _prefixed(_modifiers_str(node, bodies), signature)
+
+    body = bodies.text.get(node)
+    if body is None:
+        lines.append(signature)
+    elif node in bodies.elided:
+        if node in bodies.trivial:
+            lines.append(signature + _ELIDED_ACCESSOR)
+        else:
+            elided_lines = len([line for line in body.splitlines() if line.strip()])
+            lines.append(signature + f" {{ /* {elided_lines} line(s) elided */ }}")
+    else:
+        body_indent = indent + '  '
+        compact = _compact_body(body).replace('\n', '\n' + body_indent).replace('\n' + body_indent + '}', '\n' + indent + '}')
+        lines.append(f"{signature} {compact}")
+
+def python_module_name(file_path: str) -> str:
+    """Maps a Java source file to its snake_case Python module name (LegacyUser.java -> legacy_user.py)."""
+    file_name_without_ext, _ = os.path.splitext(os.path.basename(file_path))
+    return ''.join(['_' + i.lower() if i.isupper() else i for i in file_name_without_ext]).lstrip('_') + '.py'
 
 def get_all_java_files(directory: str):
-    """Recursively gets all .java files from a given directory."""
-    java_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.java'):
-                java_files.append(os.path.join(root, file))
-    return java_files
-
-def save_modernized_code(file_path: str, code: str):
-    """Saves the generated code to the specified output path, creating directories if needed."""
+    """Recursively gets all .java files from a given directory (see utils.discovery.iter_java_files)."""
+    return list(iter_java_files(directory))
+
+def save_modernized_code(file_path: str, code: str, strict: bool = False) -> bool:
+    """
+    Saves the generated code to the specified output path, creating directories if needed.
+    An output that already holds exactly this content is left untouched (its mtime included) and False
+    is returned; otherwise the code is written to a temp file beside it and renamed into place, so a
+    crash never leaves a half-written output behind, and True is returned. A write error is logged and
+    False returned, or re-raised when strict is set.
+    """
+    data = code.encode('utf-8')
+    try:
+        # Sizes differ far more often than contents do, and cost a stat rather than a read
+        if os.path.getsize(file_path) == len(data):
+            with open(file_path, 'rb') as file:
+                if content_hash(file.read()) == content_hash(data):
+                    return False
+    except OSError:
+        pass
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
     try:
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.write(code)
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, file_path)
     except Exception as e:
-        print(f"  [ERROR] Could not save modernized code to {file_path}: {e}")
\ No newline at end of file
+        print(f"  [ERROR] Could not save modernized code to {file_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if strict:
+            raise
+        return False
+    return True
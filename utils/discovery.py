@@ -0,0 +1,91 @@
+import fnmatch
+import os
+import queue
+import threading
+
+from config import DISCOVERY_INCLUDE_GLOBS, DISCOVERY_EXCLUDE_GLOBS, DISCOVERY_BUILD_OUTPUT_DIRS, DISCOVERY_BUILD_FILES
+
+def _matches(name: str, relative_path: str, patterns) -> bool:
+    """A pattern starting with "/" is anchored at the root; any other may match the name as well."""
+    return any(fnmatch.fnmatchcase(relative_path, pattern[1:]) if pattern.startswith('/')
+               else fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(relative_path, pattern)
+               for pattern in patterns)
+
+def iter_java_files(directory: str, include=DISCOVERY_INCLUDE_GLOBS, exclude=DISCOVERY_EXCLUDE_GLOBS,
+                    build_outputs=DISCOVERY_BUILD_OUTPUT_DIRS, build_files=DISCOVERY_BUILD_FILES):
+    """
+    Lazily yields the source files under directory, as the walk finds them, in name order.
+    Which files and directories are skipped is described with the discovery settings in config.py;
+    skipped directories are not even entered. Only the directories still to be visited are held in
+    memory, however large the tree.
+    """
+    pending = [(directory, '')]
+    while pending:
+        path, relative = pending.pop()
+        try:
+            with os.scandir(path) as scan:
+                entries = sorted(scan, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"  [DISCOVERY_WARNING] Could not list {path}: {e}")
+            continue
+        subdirectories = []
+        # Beside a build file, target/, build/ and out/ are that module's build output
+        is_module = any(entry.name in build_files for entry in entries)
+        for entry in entries:
+            entry_relative = f"{relative}/{entry.name}" if relative else entry.name
+            if _matches(entry.name, entry_relative, exclude):
+                continue
+            if is_module and entry.name in build_outputs and entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                # Symlinked directories are not followed, like os.walk, so a link cycle cannot trap the walk
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append((entry.path, entry_relative))
+                elif entry.is_file() and _matches(entry.name, entry_relative, include):
+                    yield entry.path
+            except OSError:
+                continue
+        # Depth first, in name order: push the subdirectories in reverse so the first is popped first
+        pending.extend(reversed(subdirectories))
+
+def prefetch(iterable, maxsize: int):
+    """
+    Consumes iterable on a background thread and yields its items through a bounded queue: the producer
+    runs ahead of the consumer by at most maxsize items, and blocks (backpressure) when it is that far
+    ahead. An exception raised by the producer is re-raised in the consumer. When the consumer stops
+    early, the producer is told to stop as well.
+    """
+    items = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+    finished = object()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as e:
+            put((finished, e))
+        else:
+            put((finished, None))
+
+    threading.Thread(target=produce, name="prefetch", daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is finished:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,323 @@
+import builtins
+import hashlib
+import io
+import json
+import keyword
+import os
+import re
+import threading
+import tokenize
+
+import javalang
+
+from utils.run_manifest import content_hash, file_lock, read_json_section, write_json_atomically
+
+FINGERPRINT_INDEX_FILE_NAME = ".codegenesis_fingerprints.json"
+
+# === STRUCTURAL FINGERPRINT ===
+# Two files get the same fingerprint when they are the same code up to the names they declare:
+# every type, field, method, parameter and local variable declared in the file is replaced by a
+# placeholder numbered in order of first appearance. Names the file only uses (JDK types, methods
+# of other classes, annotations) are kept as they are, so two DTOs holding a List and a Set still differ.
+
+# Attributes holding a (possibly dotted) name that may refer to a declaration of the file
+_NAME_ATTRIBUTES = {"name", "member", "qualifier"}
+# Attributes irrelevant to the structure: comments and source positions
+_IGNORED_ATTRIBUTES = {"documentation", "position"}
+_DECLARING_NODES = (javalang.tree.TypeDeclaration, javalang.tree.MethodDeclaration,
+                    javalang.tree.ConstructorDeclaration, javalang.tree.FormalParameter,
+                    javalang.tree.InferredFormalParameter, javalang.tree.VariableDeclarator,
+                    javalang.tree.EnumConstantDeclaration, javalang.tree.CatchClauseParameter)
+_WORD_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+def structural_fingerprint(tree):
+    """
+    Returns (fingerprint, identifiers) for a javalang CompilationUnit: a hash of its structure with
+    declared names canonicalized, and those names in placeholder order. Two files with the same
+    fingerprint correspond name for name: identifiers[i] of one plays the role of identifiers[i] of the other.
+    The package and imports are left out, so the same class in another package matches too.
+    """
+    # One walk collects the tokens and the declared names; names are only canonicalized afterwards,
+    # since a name may be used before the declaration that makes it one of the file's own
+    declared = set()
+    tokens = []
+
+    # Iterative pre-order walk: deeply nested expressions would overflow the recursion limit
+    stack = list(reversed(tree.types or []))
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            # A bracket pushed below
+            tokens.append(item)
+            continue
+        if isinstance(item, _DECLARING_NODES) and isinstance(item.name, str):
+            declared.add(item.name)
+        tokens.append(f"({type(item).__name__}")
+        # Scalar attributes are emitted right away, child nodes are visited afterwards in attribute order
+        children = []
+        literal = isinstance(item, javalang.tree.Literal)
+        for attribute in item.attrs:
+            if attribute in _IGNORED_ATTRIBUTES:
+                continue
+            value = getattr(item, attribute)
+            if value is None:
+                continue
+            if isinstance(value, javalang.ast.Node):
+                children.append(value)
+            elif isinstance(value, (list, tuple)):
+                if value:
+                    children.append(f"{attribute}=[")
+                    children.extend(child for child in value if isinstance(child, javalang.ast.Node))
+                    children.append("]")
+            elif isinstance(value, set):
+                if value:
+                    tokens.append(f"{attribute}={','.join(sorted(map(str, value)))}")
+            elif isinstance(value, str):
+                if attribute in _NAME_ATTRIBUTES:
+                    tokens.append((attribute, value.split('.')))
+                elif literal:
+                    # String literals often spell a declared name ("User[id=" ...); those words are canonicalized too
+                    tokens.append((attribute, _WORD_PATTERN.split(value), _WORD_PATTERN.findall(value)))
+                else:
+                    tokens.append(f"{attribute}={value}")
+            else:
+                tokens.append(f"{attribute}={value}")
+        stack.append(")")
+        stack.extend(reversed(children))
+
+    placeholders = {}
+
+    def canonical(name: str) -> str:
+        if name not in declared:
+            return name
+        if name not in placeholders:
+            placeholders[name] = f"${len(placeholders)}"
+        return placeholders[name]
+
+    for index, token in enumerate(tokens):
+        if isinstance(token, str):
+            continue
+        if len(token) == 2:
+            attribute, parts = token
+            tokens[index] = f"{attribute}={'.'.join(canonical(part) for part in parts)}"
+        else:
+            attribute, gaps, words = token
+            text = [gaps[0]]
+            for word, gap in zip(words, gaps[1:]):
+                text += [canonical(word), gap]
+            tokens[index] = f"{attribute}={''.join(text)}"
+
+    identifiers = sorted(placeholders, key=lambda name: int(placeholders[name][1:]))
+    return hashlib.sha256('\x1f'.join(tokens).encode('utf-8')).hexdigest(), identifiers
+
+# === RENAMING ===
+# The outputs of the reference file are adapted by renaming every identifier in each of the
+# spellings generated code uses for it (UserDTO, user_dto, USER_DTO, user_d_t_o, userdto, userDTO).
+
+def name_forms(name: str) -> list:
+    snake = _CAMEL_BOUNDARY.sub('_', name).lower()
+    # The spelling python_module_name gives a file's module: one underscore per capital (UserDTO -> user_d_t_o)
+    module = ''.join('_' + char.lower() if char.isupper() else char for char in name).lstrip('_')
+    # snake_case first: where two spellings of the old name coincide (`total`), the Python spelling of the new one wins
+    return [snake, name, snake.upper(), module, name.lower(), name[:1].lower() + name[1:], name[:1].upper() + name[1:]]
+
+def rename_pairs(old_names, new_names) -> dict:
+    """Maps every spelling of each old identifier to the same spelling of its new counterpart."""
+    pairs = {}
+    for old, new in zip(old_names, new_names):
+        if old == new:
+            continue
+        for old_form, new_form in zip(name_forms(old), name_forms(new)):
+            pairs.setdefault(old_form, new_form)
+    return {old: new for old, new in pairs.items() if old != new}
+
+def rename_identifiers(text: str, pairs: dict) -> str:
+    """
+    Renames whole words in one pass, so swapped names (a <-> b) do not clobber each other. Keyword
+    arguments of calls to something the file does not declare (Field(description=...)) are kept.
+    """
+    if not pairs:
+        return text
+    keep = {offset for offset, (kind, _) in _foreign_sites(text, pairs).items() if kind == "keyword"}
+    pattern = re.compile(r"\b(?:" + '|'.join(re.escape(old) for old in sorted(pairs, key=len, reverse=True)) + r")\b")
+    return pattern.sub(lambda match: match.group(0) if match.start() in keep else pairs[match.group(0)], text)
+
+# Receivers and callees that are the file's own code whatever the names it declares
+_OWN_NAMES = {"self", "cls", "__init__"}
+_INSIGNIFICANT_TOKENS = {tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT}
+
+def _foreign_sites(text: str, pairs: dict) -> dict:
+    """
+    Finds the old spellings that sit where they may name something the file does not declare, and returns
+    {offset: (kind, spelling)}: "keyword" for a keyword argument of a call to something else
+    (Field(description=...)), "attribute" for an attribute of a receiver that is not self, cls or a value of
+    one of the file's types (request.description). Strings, comments and imports are not looked at, and
+    text that is not Python (the docs) has no such sites.
+    """
+    try:
+        tokens = [token for token in tokenize.generate_tokens(io.StringIO(text).readline)
+                  if token.type not in _INSIGNIFICANT_TOKENS]
+    except (tokenize.TokenError, SyntaxError):
+        return {}
+    line_starts = [0] + [match.end() for match in re.finditer('\n', text)]
+    own = set(pairs) | _OWN_NAMES | _own_values(text, pairs)
+    sites = {}
+    openers = []
+    statement_start = 0
+    for index, token in enumerate(tokens):
+        if token.type == tokenize.NEWLINE:
+            statement_start = index + 1
+        elif token.type == tokenize.OP and token.string in '([{':
+            openers.append(index)
+        elif token.type == tokenize.OP and token.string in ')]}':
+            if openers:
+                openers.pop()
+        elif token.type == tokenize.NAME and token.string in pairs and index > 0:
+            previous = tokens[index - 1].string
+            following = tokens[index + 1].string if index + 1 < len(tokens) else ''
+            kind = None
+            if previous == '.' and tokens[statement_start].string not in ("import", "from"):
+                receiver = tokens[index - 2]
+                if receiver.type != tokenize.NAME or receiver.string not in own:
+                    kind = "attribute"
+            elif following == '=' and previous in ('(', ',') and openers and tokens[openers[-1]].string == '(':
+                opener = openers[-1]
+                callee = tokens[opener - 1] if opener else None
+                declaration = opener >= 2 and tokens[opener - 2].string in ("def", "class")
+                if not declaration and (callee is None or callee.type != tokenize.NAME or callee.string not in own):
+                    kind = "keyword"
+            if kind:
+                sites[line_starts[token.start[0] - 1] + token.start[1]] = (kind, token.string)
+    return sites
+
+def _own_values(text: str, pairs: dict) -> set:
+    """Names bound to a value of one of the file's types: `user = UserDTO(...)`, `user: UserDTO`, `def user() -> UserDTO`."""
+    types = sorted((re.escape(name) for name in pairs if name[:1].isupper()), key=len, reverse=True)
+    if not types:
+        return set()
+    alternatives = '|'.join(types)
+    bound = re.findall(rf"\b([A-Za-z_]\w*)\s*(?::\s*[\w\[\]., |]*?|=\s*)\b(?:{alternatives})\b", text)
+    returned = re.findall(rf"\bdef\s+([A-Za-z_]\w*)\s*\([^)]*\)\s*->\s*[\w\[\]., |]*?\b(?:{alternatives})\b", text)
+    return set(bound) | set(returned)
+
+_PYTHON_NAMES = set(keyword.kwlist) | set(dir(builtins))
+
+def rename_confidence(old_names, new_names, texts) -> float:
+    """
+    Estimates how safely the reference outputs can be adapted by renaming, between 0 and 1: the share of
+    renamed identifiers that are unambiguous. An identifier is ambiguous when one of its new spellings
+    already occurs in the outputs for another reason (the rename would merge two names), when the old
+    or new spelling is a Python keyword or builtin (renaming it would touch unrelated code), or when an
+    old spelling is a keyword argument or attribute that may belong to something else (see _foreign_sites).
+    """
+    pairs = rename_pairs(old_names, new_names)
+    renamed = [(old, new) for old, new in zip(old_names, new_names) if old != new]
+    if not renamed:
+        return 1.0
+    words = set()
+    foreign = set()
+    for text in texts:
+        words.update(_WORD_PATTERN.findall(text))
+        foreign.update(spelling for _, spelling in _foreign_sites(text, pairs).values())
+    ambiguous = 0
+    for old, new in renamed:
+        for old_form, new_form in zip(name_forms(old), name_forms(new)):
+            if old_form == new_form:
+                continue
+            if (old_form in _PYTHON_NAMES or new_form in _PYTHON_NAMES or old_form in foreign
+                    or (new_form in words and new_form not in pairs)):
+                ambiguous += 1
+                break
+    return 1 - ambiguous / len(renamed)
+
+# === INDEX OF MODERNIZED STRUCTURES ===
+
+class FingerprintIndex:
+    """
+    Remembers, per structural fingerprint, one file that was modernized from scratch with that structure:
+    its identifiers and its outputs (with their hashes, so an output regenerated since is not reused).
+    Stored as JSON inside the output directory, and saved like the run manifest: merged into the file on
+    disk, so workers sharing the output directory keep each other's entries.
+    """
+
+    def __init__(self, output_root: str):
+        self.output_root = output_root
+        self.path = os.path.join(output_root, FINGERPRINT_INDEX_FILE_NAME)
+        self._lock = threading.Lock()
+        # fingerprint -> {"file": ..., "identifiers": [...], "outputs": {stage: {"path": ..., "hash": ...}}}
+        self.entries = {}
+        # Fingerprints this worker recorded since the last save, and the entries it dropped as outdated
+        self._changed = set()
+        self._removed = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file).get("fingerprints", {})
+        except (OSError, ValueError) as e:
+            print(f"  [FINGERPRINT_WARNING] Could not read {self.path}: {e}. Starting with an empty index.")
+            self.entries = {}
+
+    def contains(self, fingerprint: str) -> bool:
+        with self._lock:
+            return fingerprint in self.entries
+
+    def record(self, fingerprint: str, file_path: str, identifiers: list, outputs: dict):
+        """Registers the outputs ({stage: (path, text)}) a file with this fingerprint was modernized to."""
+        entry = {
+            "file": file_path,
+            "identifiers": list(identifiers),
+            "outputs": {stage: {"path": os.path.relpath(path, self.output_root).replace(os.sep, '/'),
+                                "hash": content_hash(text)}
+                        for stage, (path, text) in outputs.items()},
+        }
+        with self._lock:
+            self.entries[fingerprint] = entry
+            self._changed.add(fingerprint)
+            self._removed.pop(fingerprint, None)
+
+    def lookup(self, fingerprint: str):
+        """
+        Returns (reference file, identifiers, {stage: text}) for a fingerprint, or None if no file with this
+        structure was modernized or its outputs were changed or removed since.
+        """
+        with self._lock:
+            entry = self.entries.get(fingerprint)
+        if entry is None:
+            return None
+        texts = {}
+        for stage, output in entry["outputs"].items():
+            try:
+                with open(os.path.join(self.output_root, output["path"]), 'r', encoding='utf-8') as file:
+                    text = file.read()
+            except OSError:
+                text = None
+            if text is None or content_hash(text) != output["hash"]:
+                with self._lock:
+                    if self.entries.get(fingerprint) is entry:
+                        del self.entries[fingerprint]
+                        self._changed.discard(fingerprint)
+                        self._removed[fingerprint] = entry
+                return None
+            texts[stage] = text
+        return entry["file"], entry["identifiers"], texts
+
+    def save(self):
+        """Writes the entries this worker changed over those on disk, keeping what other workers saved."""
+        with file_lock(self.path):
+            on_disk = read_json_section(self.path, "fingerprints", "FINGERPRINT_WARNING")
+            with self._lock:
+                for fingerprint, entry in self._removed.items():
+                    # Only if no other worker recorded a newer entry for it meanwhile
+                    if on_disk.get(fingerprint) == entry:
+                        del on_disk[fingerprint]
+                for fingerprint in self._changed:
+                    on_disk[fingerprint] = self.entries[fingerprint]
+                self.entries = on_disk
+                self._changed, self._removed = set(), {}
+                payload = json.dumps({"version": 1, "fingerprints": self.entries}, indent=2, sort_keys=True)
+            write_json_atomically(self.path, payload)
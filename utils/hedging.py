@@ -0,0 +1,170 @@
+import collections
+import queue
+import threading
+import time
+
+from config import (LLM_HEDGING_ENABLED, LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_SAMPLES, LLM_HEDGE_MAX_EXTRA_FRACTION,
+                    LLM_HEDGE_HISTORY)
+from utils.tracing import get_tracer
+
+class HedgeCancelled(Exception):
+    """Raised inside the losing attempt of a hedged request once the other attempt has won."""
+
+class _Attempt:
+    """
+    One attempt of a request: func(attempt) runs it, and calls attempt.started() right before its backend
+    call, once it no longer waits for the rate limiter or a connection slot. Its latency is measured from
+    there and recorded once it succeeds, whether it won or not.
+    """
+
+    def __init__(self, func, hedged: bool, policy, finished: queue.Queue = None):
+        self.cancel = threading.Event()
+        self.hedged = hedged
+        self.result = None
+        self.error = None
+        self.call_started_at = None
+        # Set once the backend call starts, or when the attempt ends without one
+        self.progressed = threading.Event()
+        self._func = func
+        self._policy = policy
+        self._finished = finished
+
+    def started(self):
+        self.call_started_at = time.perf_counter()
+        self.progressed.set()
+
+    def call_elapsed(self) -> float:
+        return time.perf_counter() - self.call_started_at
+
+    def start(self):
+        threading.Thread(target=get_tracer().wrap(self.run), name="llm-hedge" if self.hedged else "llm-attempt",
+                         daemon=True).start()
+
+    def run(self):
+        try:
+            self.result = self._func(self)
+        except BaseException as e:
+            self.error = e
+        self.progressed.set()
+        if self.error is None and self.call_started_at is not None:
+            # A loser that was left to finish is as much a sample of the latency as the winner
+            self._policy.record_latency(self.call_elapsed())
+        if self._finished is not None:
+            self._finished.put(self)
+
+class HedgingPolicy:
+    """
+    Hedged requests against tail latency. A request still running after the given percentile of
+    recent request latencies gets one duplicate (a hedge); whichever finishes first is used and the
+    other is cancelled. Latencies are those of the backend calls alone, and a request is only hedged once
+    its backend call has run that long: time queued for the rate limiter or a connection slot does not
+    count, and no hedge is sent while every connection is busy, where it would only add load. Hedges are
+    capped at max_extra_fraction of all requests, which bounds the extra spend, and nothing is hedged until
+    min_samples latencies have been observed. Shared by every request of a client, so the latency history
+    and the counters are process-wide.
+    """
+
+    def __init__(self, percentile: float = LLM_HEDGE_PERCENTILE, min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+                 max_extra_fraction: float = LLM_HEDGE_MAX_EXTRA_FRACTION, history: int = LLM_HEDGE_HISTORY):
+        self.percentile = percentile
+        self.min_samples = max(1, min_samples)
+        self.max_extra_fraction = max_extra_fraction
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=max(self.min_samples, history))
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+        self.capped = 0
+        self.saturated = 0
+
+    def delay(self):
+        """Seconds after which a request gets hedged, or None while too few latencies are known."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(round(self.percentile / 100 * (len(ordered) - 1))))]
+
+    def record_latency(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.fired + 1 > self.max_extra_fraction * self.requests:
+                self.capped += 1
+                return False
+            self.fired += 1
+            return True
+
+    def run(self, attempt, can_hedge=None):
+        """
+        Calls attempt(a) and returns its result; a.cancel, a.hedged and a.started() are described in _Attempt.
+        If its backend call has not finished delay() seconds after it started (and the spend cap and
+        can_hedge() allow), a hedged attempt is started alongside it: the first to succeed wins and the
+        other's cancel event is set. If both fail, the first attempt's error is raised.
+        """
+        with self._lock:
+            self.requests += 1
+        delay = self.delay()
+        if delay is None:
+            single = _Attempt(attempt, False, self)
+            single.run()
+            if single.error is not None:
+                raise single.error
+            return single.result
+
+        finished = queue.Queue()
+        primary = _Attempt(attempt, False, self, finished)
+        primary.start()
+        attempts = [primary]
+        primary.progressed.wait()
+        try:
+            first = finished.get(timeout=max(0.0, delay - primary.call_elapsed()) if primary.call_started_at is not None else None)
+        except queue.Empty:
+            first = None
+            if can_hedge is not None and not can_hedge():
+                with self._lock:
+                    self.saturated += 1
+            elif self._take_budget():
+                span = get_tracer().current_span()
+                span.set("hedged", True)
+                span.set("hedge_delay", round(delay, 3))
+                hedge = _Attempt(attempt, True, self, finished)
+                hedge.start()
+                attempts.append(hedge)
+
+        pending = len(attempts)
+        while pending:
+            done = first or finished.get()
+            first = None
+            pending -= 1
+            if done.error is not None:
+                continue
+            for other in attempts:
+                if other is not done:
+                    other.cancel.set()
+            if done.hedged:
+                with self._lock:
+                    self.won += 1
+                get_tracer().current_span().set("hedge_won", True)
+            return done.result
+        raise primary.error
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "fired": self.fired, "won": self.won, "capped": self.capped,
+                    "saturated": self.saturated, "samples": len(self._latencies)}
+
+_shared_policy = None
+_shared_policy_lock = threading.Lock()
+
+def get_hedging_policy():
+    """Returns the process-wide hedging policy, or None when LLM_HEDGING_ENABLED is off."""
+    global _shared_policy
+    if not LLM_HEDGING_ENABLED:
+        return None
+    with _shared_policy_lock:
+        if _shared_policy is None:
+            _shared_policy = HedgingPolicy()
+        return _shared_policy
@@ -0,0 +1,145 @@
+import javalang
+
+from utils.code_parser import find_block_span, line_offsets, render_type_signature
+
+_TYPE_DECLARATIONS = (javalang.tree.ClassDeclaration, javalang.tree.InterfaceDeclaration,
+                      javalang.tree.EnumDeclaration, javalang.tree.AnnotationDeclaration)
+
+class JavaChunk:
+    """
+    One independently modernizable slice of an oversized Java file.
+
+    role is one of:
+      - "main":    the declaration, fields and constructors of the primary class
+      - "methods": a group of consecutive methods of the primary class
+      - "type":    a nested class or a secondary top-level type, modernized as a standalone class
+    """
+
+    def __init__(self, role: str, name: str, source: str):
+        self.role = role
+        self.name = name
+        self.source = source
+
+    @property
+    def line_count(self) -> int:
+        return self.source.count('\n') + 1
+
+def split_java_file(tree, source: str, max_chunk_lines: int) -> list:
+    """
+    Splits a parsed Java file along class, nested-class and method-group boundaries.
+    Returns a single chunk holding the whole file when it cannot be split usefully.
+    """
+    lines = source.splitlines()
+    offsets = line_offsets(source)
+    types = [node for node in tree.types if node.position is not None]
+    if not types:
+        return [JavaChunk("main", "", source)]
+
+    spans = {node: _type_line_span(node, source, offsets) for node in types}
+    if any(span is None for span in spans.values()):
+        return [JavaChunk("main", "", source)]
+    primary = max(types, key=lambda node: spans[node][1] - spans[node][0])
+
+    chunks = []
+    for node in types:
+        if node is not primary:
+            start, end = spans[node]
+            chunks.append(JavaChunk("type", node.name, '\n'.join(lines[start - 1:end])))
+
+    if not isinstance(primary.body, list):
+        # Enum/annotation bodies are not plain member lists; keep them in one piece
+        start, end = spans[primary]
+        return [JavaChunk("main", primary.name, '\n'.join(lines[start - 1:end]))] + chunks
+
+    header_start, body_end = spans[primary]
+    members = sorted(((member, line) for member, line in ((member, _member_line(member, lines)) for member in primary.body)
+                      if line is not None), key=lambda item: item[1])
+    member_spans = _member_line_spans(members, lines, body_end)
+
+    # The class header is everything up to and including the line with its opening brace
+    first_member_line = member_spans[0][1] if member_spans else body_end
+    if first_member_line <= header_start:
+        return [JavaChunk("main", primary.name, source)]
+    declaration = '\n'.join(lines[header_start - 1:first_member_line - 1])
+
+    main_parts, method_groups, current, current_lines = [], [], [], 0
+    for member, start, end in member_spans:
+        text = '\n'.join(lines[start - 1:end])
+        if isinstance(member, _TYPE_DECLARATIONS):
+            chunks.append(JavaChunk("type", member.name, text))
+        elif isinstance(member, javalang.tree.MethodDeclaration):
+            size = end - start + 1
+            if current and current_lines + size > max_chunk_lines:
+                method_groups.append(current)
+                current, current_lines = [], 0
+            current.append(text)
+            current_lines += size
+        else:
+            # Fields, constructors and initializer blocks define the class itself
+            main_parts.append(text)
+    if current:
+        method_groups.append(current)
+
+    main_source = '\n'.join([declaration] + main_parts + ['}'])
+    result = [JavaChunk("main", primary.name, main_source)]
+    for index, group in enumerate(method_groups, start=1):
+        part_name = f"{primary.name}Part{index}"
+        header = f"// Methods of class {primary.name} (part {index} of {len(method_groups)})"
+        result.append(JavaChunk("methods", part_name, '\n'.join([header] + group)))
+    return result + chunks
+
+def class_outline(tree) -> str:
+    """Signature-only outline of every type in the file, shared as context by all chunks."""
+    return '\n'.join(render_type_signature(node, include_private=True) for node in tree.types)
+
+def _type_line_span(node, source: str, offsets: list):
+    """1-based (first line, last line) of a type declaration including its closing brace."""
+    start_offset = offsets[node.position.line - 1] + node.position.column - 1
+    span = find_block_span(source, start_offset)
+    if span is None:
+        return None
+    end_line = source.count('\n', 0, span[1]) + 1
+    return _leading_decoration_start(source.splitlines(), node.position.line), end_line
+
+def _member_line(member, lines: list):
+    """
+    1-based line a class body member starts on, or None if it cannot be located.
+    javalang gives static and instance initializer blocks no node of their own, only the list of their
+    statements; such a block starts on the line of the brace that opens it, before its first statement.
+    """
+    if not isinstance(member, list):
+        return member.position.line if member.position is not None else None
+    first = next((statement for statement in member if getattr(statement, 'position', None) is not None), None)
+    if first is None:
+        return None
+    line = first.position.line
+    if '{' in lines[line - 1][:first.position.column - 1]:
+        return line
+    while line > 1:
+        line -= 1
+        if lines[line - 1].rstrip().endswith('{'):
+            return line
+    return None
+
+def _member_line_spans(members, lines: list, body_end_line: int) -> list:
+    """
+    Assigns each (member, line) the lines from its first annotation/comment line up to the line
+    before the next member; the last member ends just before the closing brace of the class.
+    """
+    starts = [_leading_decoration_start(lines, line) for _, line in members]
+    spans = []
+    for index, (member, _) in enumerate(members):
+        end = starts[index + 1] - 1 if index + 1 < len(members) else body_end_line - 1
+        spans.append((member, starts[index], max(starts[index], end)))
+    return spans
+
+def _leading_decoration_start(lines: list, line: int) -> int:
+    """Walks back from line over annotations and comments that belong to the declaration."""
+    start = line
+    while start > 1:
+        previous = lines[start - 2].strip()
+        if previous.startswith(('@', '*', '/*', '//')) or previous.endswith('*/'):
+            start -= 1
+        else:
+            break
+    return start
@@ -0,0 +1,347 @@
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from config import JOB_LEASE_SECONDS, JOB_HEARTBEAT_SECONDS, JOB_MAX_ATTEMPTS
+
+JOB_STORE_FILE_NAME = ".codegenesis_jobs.sqlite3"
+
+# A file moves forward through these states as its stages finish; each one implies all earlier stages'
+# outputs are stored (docs finishing before tests leave a file "modernized" until its tests are in too)
+STATES = ("pending", "modernized", "tested", "documented", "done", "failed")
+# Stage outputs kept per file, in the order their states follow "pending"
+_STAGE_STATES = (("modernize", "modernized"), ("tests", "tested"), ("docs", "documented"))
+_FINISHED = ("done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    file TEXT PRIMARY KEY,
+    source_hash TEXT NOT NULL,
+    source_bytes INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0,
+    outputs TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state);
+CREATE TABLE IF NOT EXISTS stage_outputs (
+    file TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (file, stage)
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    file TEXT NOT NULL,
+    depends_on TEXT NOT NULL,
+    PRIMARY KEY (file, depends_on)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+class JobStore:
+    """
+    A SQLite job queue shared by every worker (`python main.py` process) of a run, on one host or on
+    storage they all mount. It tracks each file to modernize: its stage state, the outputs of the stages
+    it already finished, and which worker holds it. A worker claims ready files under a lease that its
+    heartbeat thread keeps renewing; the files of a worker that stops renewing are claimed by another,
+    which resumes them from their stored stage outputs instead of starting over.
+
+    Files are keyed by their path relative to the legacy root and outputs by their path relative to the
+    output root, so workers mounting the shared directories at different places agree on them.
+    """
+
+    def __init__(self, path: str, legacy_root: str = "", output_root: str = "",
+                 lease_seconds: float = JOB_LEASE_SECONDS, heartbeat_seconds: float = JOB_HEARTBEAT_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.legacy_root = legacy_root
+        self.output_root = output_root
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max(1, max_attempts)
+        # A worker whose heartbeat is this late has stopped, whatever its leases say
+        self.stale_after = min(lease_seconds, 3 * heartbeat_seconds)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+        self._hashes = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One connection shared by this worker's threads; other workers are serialized by SQLite's file locks
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        # Files this worker parsed, with their hash: it only claims files it can actually process
+        self._db.execute("CREATE TEMP TABLE IF NOT EXISTS local_jobs (file TEXT PRIMARY KEY, source_hash TEXT NOT NULL)")
+
+    def _key(self, file_path: str) -> str:
+        return os.path.relpath(file_path, self.legacy_root).replace(os.sep, '/')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.legacy_root, key)
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE takes the write lock up front, so two workers never claim the same file."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    # === RUN LIFECYCLE ===
+
+    def sync(self, jobs, dependencies: dict, fresh: bool = False) -> dict:
+        """
+        Registers this worker and adds jobs ([(file_path, source_hash, source_bytes)]) to the store, with
+        the files each one waits for (dependencies: {file_path: {file_path}}). A job whose source changed
+        starts over. When no other worker is alive this starts a new run: failed and abandoned files get
+        a fresh set of attempts, and rows of files no longer to be processed are dropped. With fresh
+        (a full rebuild) the stored stage outputs are discarded as well; only a new run honours it.
+        Returns {"new_run", "resumed", "completed"}: the files resumed from stored stage outputs and
+        the files already completed (by another worker, or before a crash).
+        """
+        now = time.time()
+        jobs = list(jobs)
+        keys = {self._key(file_path): (source_hash, source_bytes) for file_path, source_hash, source_bytes in jobs}
+        with self._lock, self._transaction() as db:
+            live_workers = db.execute("SELECT COUNT(*) FROM workers WHERE id != ? AND heartbeat_at > ?",
+                                      (self.worker_id, now - self.lease_seconds)).fetchone()[0]
+            new_run = live_workers == 0
+            db.execute("INSERT OR REPLACE INTO workers (id, host, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?)",
+                       (self.worker_id, socket.gethostname(), os.getpid(), now, now))
+            db.execute("DELETE FROM local_jobs")
+            db.executemany("INSERT INTO local_jobs (file, source_hash) VALUES (?, ?)",
+                           [(key, source_hash) for key, (source_hash, _) in keys.items()])
+            if new_run:
+                db.execute("DELETE FROM workers WHERE heartbeat_at <= ?", (now - self.lease_seconds,))
+                for table in ("jobs", "stage_outputs", "dependencies"):
+                    db.execute(f"DELETE FROM {table} WHERE file NOT IN (SELECT file FROM local_jobs)")
+                if fresh:
+                    db.execute("DELETE FROM stage_outputs")
+                    db.execute("UPDATE jobs SET state = 'pending', outputs = NULL")
+            existing = {row[0]: row[1:] for row in db.execute("SELECT file, source_hash, state, outputs FROM jobs")}
+            for key, (source_hash, source_bytes) in keys.items():
+                row = existing.get(key)
+                if row is None or row[0] != source_hash:
+                    db.execute("INSERT OR REPLACE INTO jobs (file, source_hash, source_bytes, state, updated_at) "
+                               "VALUES (?, ?, ?, 'pending', ?)", (key, source_hash, source_bytes, now))
+                    db.execute("DELETE FROM stage_outputs WHERE file = ? AND source_hash != ?", (key, source_hash))
+                elif row[1] == "done" and not self._outputs_exist(row[2]):
+                    db.execute("UPDATE jobs SET state = 'pending', outputs = NULL, updated_at = ? WHERE file = ?", (now, key))
+                elif new_run and row[1] != "done":
+                    db.execute("UPDATE jobs SET state = 'pending', attempts = 0, owner = NULL, lease_expires = 0, "
+                               "error = NULL, updated_at = ? WHERE file = ?", (now, key))
+                    self._refresh_state(db, key)
+            db.executemany("DELETE FROM dependencies WHERE file = ?", [(key,) for key in keys])
+            db.executemany("INSERT OR IGNORE INTO dependencies (file, depends_on) VALUES (?, ?)",
+                           [(self._key(file_path), self._key(dependency))
+                            for file_path, waiting_on in dependencies.items() for dependency in waiting_on])
+            rows = db.execute("SELECT j.file, j.state, (SELECT COUNT(*) FROM stage_outputs s WHERE s.file = j.file) "
+                              "FROM jobs j JOIN local_jobs l ON l.file = j.file AND l.source_hash = j.source_hash").fetchall()
+        self._hashes = {key: source_hash for key, (source_hash, _) in keys.items()}
+        self._start_heartbeat()
+        return {
+            "new_run": new_run,
+            "resumed": [self._path(key) for key, state, stored in rows if state not in _FINISHED and stored],
+            "completed": [self._path(key) for key, state, _ in rows if state == "done"],
+        }
+
+    def _outputs_exist(self, outputs) -> bool:
+        return bool(outputs) and all(os.path.exists(os.path.join(self.output_root, output)) for output in json.loads(outputs))
+
+    def _start_heartbeat(self):
+        if self._heartbeat is not None:
+            return
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+            except sqlite3.Error as e:
+                print(f"  [JOBS_WARNING] Could not renew the leases of {self.worker_id}: {e}")
+
+    def heartbeat(self):
+        """Marks this worker alive and extends the lease of every file it holds."""
+        now = time.time()
+        with self._lock, self._transaction() as db:
+            db.execute("UPDATE workers SET heartbeat_at = ? WHERE id = ?", (now, self.worker_id))
+            db.execute("UPDATE jobs SET lease_expires = ? WHERE owner = ? AND state NOT IN ('done', 'failed')",
+                       (now + self.lease_seconds, self.worker_id))
+
+    def close(self):
+        """Stops the heartbeat, hands back every unfinished file this worker holds and unregisters it."""
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        with self._lock:
+            try:
+                with self._transaction() as db:
+                    db.execute("UPDATE jobs SET owner = NULL, lease_expires = 0 WHERE owner = ?", (self.worker_id,))
+                    db.execute("DELETE FROM workers WHERE id = ?", (self.worker_id,))
+            except sqlite3.Error as e:
+                print(f"  [JOBS_WARNING] Could not release the files of {self.worker_id}: {e}")
+            self._db.close()
+
+    # === CLAIMING ===
+
+    def claim(self, limit: int) -> list:
+        """
+        Leases up to limit files that are ready (not finished, not held by a live worker, and not waiting
+        on an unfinished file), largest first, and returns their paths. Files abandoned by crashed workers
+        max_attempts times are marked failed instead of being handed out again. Only an expired lease
+        counts as an attempt: a file handed back by a worker shutting down, or claimed and finished, does not.
+        The leases of a dead worker expire at once (see _expire_dead_workers).
+        """
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self._lock, self._transaction() as db:
+            self._expire_dead_workers(db, now)
+            db.execute("UPDATE jobs SET attempts = attempts + 1, owner = NULL, lease_expires = 0, updated_at = ? "
+                       "WHERE state NOT IN ('done', 'failed') AND owner IS NOT NULL AND lease_expires < ?", (now, now))
+            db.execute("UPDATE jobs SET state = 'failed', error = ?, updated_at = ? "
+                       "WHERE state NOT IN ('done', 'failed') AND attempts >= ?",
+                       (f"Abandoned {self.max_attempts} time(s) by crashed workers", now, self.max_attempts))
+            keys = [row[0] for row in db.execute(
+                "SELECT j.file FROM jobs j JOIN local_jobs l ON l.file = j.file AND l.source_hash = j.source_hash "
+                "WHERE j.state NOT IN ('done', 'failed') AND (j.owner IS NULL OR j.lease_expires < ?) "
+                "AND NOT EXISTS (SELECT 1 FROM dependencies d JOIN jobs dependency ON dependency.file = d.depends_on "
+                "                WHERE d.file = j.file AND dependency.state NOT IN ('done', 'failed')) "
+                "ORDER BY j.source_bytes DESC LIMIT ?", (now, limit))]
+            db.executemany("UPDATE jobs SET owner = ?, lease_expires = ?, updated_at = ? WHERE file = ?",
+                           [(self.worker_id, now + self.lease_seconds, now, key) for key in keys])
+        return [self._path(key) for key in keys]
+
+    def _expire_dead_workers(self, db, now: float):
+        """
+        Unregisters the workers that stopped, and expires their leases: those whose heartbeat is
+        stale_after seconds late, and those on this host whose process is gone. A worker restarted after
+        a crash thus resumes its files right away instead of waiting out the dead worker's leases.
+        """
+        dead = [worker_id for worker_id, host, pid, heartbeat_at in db.execute(
+                    "SELECT id, host, pid, heartbeat_at FROM workers WHERE id != ?", (self.worker_id,))
+                if heartbeat_at < now - self.stale_after or (host == socket.gethostname() and not _process_alive(pid))]
+        for worker_id in dead:
+            db.execute("UPDATE jobs SET lease_expires = 0 WHERE owner = ? AND state NOT IN ('done', 'failed')", (worker_id,))
+            db.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def unfinished(self) -> int:
+        """How many of this worker's files (for the source it parsed) are not finished yet, whoever holds them."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs j JOIN local_jobs l ON l.file = j.file "
+                                    "AND l.source_hash = j.source_hash WHERE j.state NOT IN ('done', 'failed')").fetchone()[0]
+
+    # === STAGE STATE ===
+
+    def stage_outputs(self, file_path: str) -> dict:
+        """{stage: content} of the stages of file_path already finished for its current source."""
+        key = self._key(file_path)
+        with self._lock:
+            rows = self._db.execute("SELECT stage, content FROM stage_outputs WHERE file = ? AND source_hash = ?",
+                                    (key, self._hashes.get(key))).fetchall()
+        return dict(rows)
+
+    def record_stage(self, file_path: str, stage: str, content: str):
+        """Stores the output of a finished stage, so the stage is never redone for this source."""
+        key = self._key(file_path)
+        if key not in self._hashes:
+            return
+        with self._lock, self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO stage_outputs (file, stage, source_hash, content) VALUES (?, ?, ?, ?)",
+                       (key, stage, self._hashes[key], content))
+            self._refresh_state(db, key)
+
+    def _refresh_state(self, db, key: str):
+        stored = {row[0] for row in db.execute("SELECT stage FROM stage_outputs WHERE file = ?", (key,))}
+        state = "pending"
+        for stage, stage_state in _STAGE_STATES:
+            if stage not in stored:
+                break
+            state = stage_state
+        db.execute("UPDATE jobs SET state = ?, updated_at = ? WHERE file = ? AND state NOT IN ('done', 'failed')",
+                   (state, time.time(), key))
+
+    def complete(self, file_path: str, output_paths):
+        """Marks file_path done with the outputs it produced; its dependents become claimable."""
+        outputs = json.dumps(sorted(os.path.relpath(path, self.output_root).replace(os.sep, '/') for path in output_paths))
+        with self._lock, self._transaction() as db:
+            db.execute("UPDATE jobs SET state = 'done', owner = NULL, lease_expires = 0, outputs = ?, error = NULL, "
+                       "updated_at = ? WHERE file = ?", (outputs, time.time(), self._key(file_path)))
+
+    def release(self, file_paths, error: str = None):
+        """Marks every file of file_paths this worker still holds, unfinished, as failed."""
+        with self._lock, self._transaction() as db:
+            db.executemany("UPDATE jobs SET state = 'failed', owner = NULL, lease_expires = 0, error = ?, updated_at = ? "
+                           "WHERE file = ? AND owner = ? AND state NOT IN ('done', 'failed')",
+                           [(error or "Incomplete outputs", time.time(), self._key(file_path), self.worker_id)
+                            for file_path in file_paths])
+
+    def completed(self) -> list:
+        """[(file_path, source_hash, output_paths)] of every done file, whichever worker completed it."""
+        with self._lock:
+            rows = self._db.execute("SELECT file, source_hash, outputs FROM jobs WHERE state = 'done'").fetchall()
+        return [(self._path(key), source_hash, [os.path.join(self.output_root, output) for output in json.loads(outputs or "[]")])
+                for key, source_hash, outputs in rows]
+
+    def failures(self) -> dict:
+        """
+        {file_path: error} of this worker's files that are failed, whichever worker failed them, and of
+        those the store now holds for another version of their source (another worker synced an edit).
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT j.file, j.error FROM jobs j JOIN local_jobs l ON l.file = j.file "
+                                    "AND l.source_hash = j.source_hash WHERE j.state = 'failed'").fetchall()
+            superseded = self._db.execute("SELECT j.file FROM jobs j JOIN local_jobs l ON l.file = j.file "
+                                          "AND l.source_hash != j.source_hash").fetchall()
+        failures = {self._path(key): error or "Failed" for key, error in rows}
+        for (key,) in superseded:
+            failures[self._path(key)] = "Another worker is processing a different version of this file"
+        return failures
+
+    def progress(self) -> dict:
+        """{"states": {state: files}, "workers": live workers} across the whole store."""
+        with self._lock:
+            states = dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            workers = self._db.execute("SELECT COUNT(*) FROM workers WHERE heartbeat_at > ?",
+                                       (time.time() - self.lease_seconds,)).fetchone()[0]
+        return {"states": {state: states.get(state, 0) for state in STATES}, "workers": workers}
+
+def _process_alive(pid: int) -> bool:
+    """Whether a process of this host is running. Not checked on Windows, where os.kill(pid, 0) would signal it."""
+    if os.name == "nt" or pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+def format_progress(progress: dict) -> str:
+    states = progress["states"]
+    total = sum(states.values())
+    return (f"{states['done']}/{total} done, " + ", ".join(f"{state} {states[state]}" for state in STATES if state != "done")
+            + f" ({progress['workers']} worker(s) active)")
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from config import GOOGLE_API_KEY, LLM_BACKEND, MOCK_LLM_LATENCY_SECONDS, MOCK_LLM_SECONDS_PER_TOKEN, LLM_RECORDING_PATH
+from utils.batch_protocol import FILE_START, FILE_END
+from utils.startup_timing import startup_step
+
+# How a batched modernization prompt lists its files (see create_batch_refactor_prompt)
+_BATCHED_FILE_PATTERN = re.compile(r"\*\*Source Java File \d+:\*\* `([^`]+)`")
+
+class BackendResponse:
+    """A complete response, or one streamed chunk of it."""
+
+    def __init__(self, text: str, finish_reason: str = "STOP"):
+        self.text = text
+        # e.g. "STOP" or "MAX_TOKENS"; empty for intermediate stream chunks
+        self.finish_reason = finish_reason
+
+class LLMBackend:
+    """
+    What LLMClient needs from a model: one blocking call and one streaming call.
+    Caching, retries, rate limiting and budgets all live in LLMClient, on top of any backend.
+    """
+
+    model_name = "unknown"
+
+    def generate(self, prompt: str, temperature: float, max_output_tokens: int = 0, timeout: float = 0) -> BackendResponse:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, temperature: float, max_output_tokens: int = 0, timeout: float = 0):
+        """Yields BackendResponse chunks. The default implementation yields the whole response at once."""
+        yield self.generate(prompt, temperature, max_output_tokens, timeout)
+
+def _finish_reason(response) -> str:
+    """Name of the finish reason of the first candidate (e.g. "STOP" or "MAX_TOKENS"), if any."""
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return ""
+    return getattr(reason, 'name', str(reason))
+
+class GeminiBackend(LLMBackend):
+    """
+    The Google Gemini API. The SDK is imported and configured on the first request rather than at
+    construction, so runs served entirely from the response cache (or skipped) never pay for it.
+    The GenerativeModel, and the gRPC channel under it, is created once and shared by every request.
+    """
+
+    def __init__(self, model_name: str = 'gemini-2.5-pro', api_key: str = GOOGLE_API_KEY):
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file.")
+        # FINAL CORRECTION: Using the latest and most robust model name.
+        # This model is guaranteed to be available on the new API version.
+        self.model_name = model_name
+        self.api_key = api_key
+        self.genai = None
+        self.model = None
+        self._model_lock = threading.Lock()
+
+    def _ensure_model(self):
+        if self.model is not None:
+            return self.model
+        with self._model_lock:
+            if self.model is None:
+                # Imported here so the mock and replay backends work without the SDK installed
+                with startup_step("llm_sdk_import"):
+                    import google.generativeai as genai
+                with startup_step("llm_sdk_setup"):
+                    genai.configure(api_key=self.api_key)
+                    self.genai = genai
+                    self.model = genai.GenerativeModel(self.model_name)
+        return self.model
+
+    def generate(self, prompt, temperature, max_output_tokens=0, timeout=0):
+        model = self._ensure_model()
+        response = model.generate_content(prompt, generation_config=self._generation_config(temperature, max_output_tokens),
+                                          request_options=self._request_options(timeout))
+        reason = _finish_reason(response)
+        try:
+            text = response.text
+        except ValueError:
+            # A response cut off before producing any text part raises on .text
+            if reason != "MAX_TOKENS":
+                raise
+            text = ""
+        return BackendResponse(text, reason)
+
+    def stream(self, prompt, temperature, max_output_tokens=0, timeout=0):
+        model = self._ensure_model()
+        response = model.generate_content(prompt, generation_config=self._generation_config(temperature, max_output_tokens),
+                                          stream=True, request_options=self._request_options(timeout))
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. a bare finish_reason) raise on .text
+                text = ""
+            yield BackendResponse(text, _finish_reason(chunk))
+
+    def _generation_config(self, temperature: float, max_output_tokens: int):
+        if max_output_tokens:
+            return self.genai.GenerationConfig(temperature=temperature, max_output_tokens=max_output_tokens)
+        return self.genai.GenerationConfig(temperature=temperature)
+
+    @staticmethod
+    def _request_options(timeout: float) -> dict:
+        # The server-side timeout also covers a stream that stalls before sending anything
+        return {"timeout": timeout} if timeout else {}
+
+class MockBackend(LLMBackend):
+    """
+    A deterministic, offline stand-in for the real model, for benchmarks and dry runs.
+    Every response is a small valid Python module derived from a hash of the prompt, produced
+    after latency_seconds (time to first token) plus seconds_per_token for each output token.
+    """
+
+    model_name = "mock"
+
+    def __init__(self, latency_seconds: float = MOCK_LLM_LATENCY_SECONDS,
+                 seconds_per_token: float = MOCK_LLM_SECONDS_PER_TOKEN, jitter: float = 0.2):
+        self.latency_seconds = latency_seconds
+        self.seconds_per_token = seconds_per_token
+        # Latency varies by +/- jitter (as a fraction), but deterministically per prompt
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def respond(self, prompt: str) -> str:
+        batched_paths = _BATCHED_FILE_PATTERN.findall(prompt)
+        if batched_paths:
+            # Answer batched prompts in the multi-file format, one module per file
+            share = len(prompt) // len(batched_paths)
+            return '\n'.join(f"{FILE_START.format(path=path)}\n{self._module(path + prompt, share)}{FILE_END.format(path=path)}"
+                             for path in batched_paths)
+        return self._module(prompt, len(prompt))
+
+    @staticmethod
+    def _module(seed: str, prompt_chars: int) -> str:
+        digest = hashlib.sha256(seed.encode('utf-8')).hexdigest()
+        # Output grows with the prompt, roughly like a translation would
+        fields = '\n'.join(f"    field_{index}: int = {index}" for index in range(max(1, min(200, prompt_chars // 400))))
+        return (f"# Mock response {digest[:16]}\n"
+                f"from pydantic import BaseModel\n\n\n"
+                f"class Mock{digest[:8]}(BaseModel):\n{fields}\n")
+
+    def _latency_factor(self, prompt: str) -> float:
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+        return 1 + random.Random(seed).uniform(-self.jitter, self.jitter)
+
+    def generate(self, prompt, temperature, max_output_tokens=0, timeout=0):
+        with self._lock:
+            self.calls += 1
+        text = self.respond(prompt)
+        factor = self._latency_factor(prompt)
+        time.sleep((self.latency_seconds + self.seconds_per_token * len(text) / 4) * factor)
+        return self._truncate(text, max_output_tokens)
+
+    def stream(self, prompt, temperature, max_output_tokens=0, timeout=0):
+        with self._lock:
+            self.calls += 1
+        response = self._truncate(self.respond(prompt), max_output_tokens)
+        factor = self._latency_factor(prompt)
+        time.sleep(self.latency_seconds * factor)
+        lines = response.text.splitlines(keepends=True)
+        for index, line in enumerate(lines):
+            time.sleep(self.seconds_per_token * len(line) / 4 * factor)
+            yield BackendResponse(line, response.finish_reason if index == len(lines) - 1 else "")
+
+    @staticmethod
+    def _truncate(text: str, max_output_tokens: int) -> BackendResponse:
+        if max_output_tokens and len(text) // 4 > max_output_tokens:
+            return BackendResponse(text[:max_output_tokens * 4], "MAX_TOKENS")
+        return BackendResponse(text)
+
+class ReplayMiss(Exception):
+    """Raised in replay mode for a prompt that was never recorded."""
+
+class RecordReplayBackend(LLMBackend):
+    """
+    Records the responses of another backend to a JSON-lines file (mode "record"), or serves a run
+    entirely from such a recording without touching the network (mode "replay").
+    Recordings are keyed by model, temperature and prompt hash, like the response cache.
+    """
+
+    def __init__(self, path: str = LLM_RECORDING_PATH, mode: str = "replay", inner: LLMBackend = None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("Record mode needs a backend to record from.")
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        self.model_name = inner.model_name if inner is not None else self._recorded_model_name()
+        self._lock = threading.Lock()
+        self._recordings = self._load()
+
+    def _key(self, prompt: str, temperature: float) -> str:
+        material = json.dumps({"model": self.model_name, "temperature": temperature,
+                               "prompt": hashlib.sha256(prompt.encode('utf-8')).hexdigest()}, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def generate(self, prompt, temperature, max_output_tokens=0, timeout=0):
+        key = self._key(prompt, temperature)
+        if self.mode == "replay":
+            with self._lock:
+                recorded = self._recordings.get(key)
+            if recorded is None:
+                raise ReplayMiss(f"No recorded response for this prompt in {self.path}")
+            return BackendResponse(recorded["text"], recorded["finish_reason"])
+
+        response = self.inner.generate(prompt, temperature, max_output_tokens, timeout)
+        self._append(key, response)
+        return response
+
+    def stream(self, prompt, temperature, max_output_tokens=0, timeout=0):
+        if self.mode == "replay":
+            yield self.generate(prompt, temperature, max_output_tokens, timeout)
+            return
+        parts, finish_reason = [], ""
+        for chunk in self.inner.stream(prompt, temperature, max_output_tokens, timeout):
+            parts.append(chunk.text)
+            finish_reason = chunk.finish_reason or finish_reason
+            yield chunk
+        self._append(self._key(prompt, temperature), BackendResponse(''.join(parts), finish_reason))
+
+    def _append(self, key: str, response: BackendResponse):
+        line = json.dumps({"key": key, "model": self.model_name, "text": response.text,
+                           "finish_reason": response.finish_reason})
+        with self._lock:
+            self._recordings[key] = {"text": response.text, "finish_reason": response.finish_reason}
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(line + '\n')
+
+    def _load(self) -> dict:
+        recordings = {}
+        if not os.path.exists(self.path):
+            return recordings
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A run killed mid-write leaves at most one partial last line
+                    continue
+                recordings[entry["key"]] = {"text": entry["text"], "finish_reason": entry["finish_reason"]}
+        return recordings
+
+    def _recorded_model_name(self) -> str:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.loads(file.readline())["model"]
+        except (OSError, ValueError, KeyError):
+            return "unknown"
+
+def create_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    """Builds the backend selected by LLM_BACKEND: "gemini", "mock", "record" (Gemini, recorded) or "replay"."""
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "mock":
+        return MockBackend()
+    if name == "record":
+        return RecordReplayBackend(LLM_RECORDING_PATH, "record", GeminiBackend())
+    if name == "replay":
+        return RecordReplayBackend(LLM_RECORDING_PATH, "replay")
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
@@ -1,28 +1,473 @@
-import google.generativeai as genai
-from config import GOOGLE_API_KEY
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import (LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_MB, LLM_STREAMING,
+                    LLM_MAX_OUTPUT_TOKENS, LLM_MAX_GENERATION_SECONDS, LLM_MAX_CONNECTIONS)
+from utils.hedging import HedgeCancelled, HedgingPolicy, get_hedging_policy
+from utils.llm_backends import LLMBackend, create_backend
+from utils.rate_limiter import RateLimiter, get_rate_limiter
+from utils.tracing import get_tracer
+
+class ResponseCache:
+    """
+    A content-addressed, size-capped on-disk cache for LLM responses.
+    Entries are evicted least-recently-used first once the cache grows past max_bytes. The lock only
+    guards the in-memory index; files are read and written outside it, so concurrent hits do not queue.
+    Several processes may share the directory, so the index is re-read from disk before evicting.
+    """
+
+    # Puts between two re-reads of the index from disk, which picks up what other processes wrote
+    _RESYNC_EVERY = 100
+    # Eviction goes down to this fraction of max_bytes, so it does not rescan the directory on every put
+    _EVICT_TO = 0.9
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._eviction_lock = threading.Lock()
+        self._puts = 0
+        # key -> [size_in_bytes, last_used_timestamp], rebuilt from disk on startup
+        self._entries, self._total_bytes = self._scan()
+
+    @staticmethod
+    def make_key(model_name: str, temperature: float, prompt: str) -> str:
+        """Builds the cache key from everything that influences the model's answer."""
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        material = json.dumps({"model": model_name, "temperature": temperature, "prompt": prompt_hash}, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached response for key, or None on a miss."""
+        path = self._path_for(key)
+        # The file is tried even if the index does not know the key: another process may have written it
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                response = json.load(file)["response"]
+                size = os.fstat(file.fileno()).st_size
+        except FileNotFoundError:
+            with self._lock:
+                self._drop(key)
+                self.misses += 1
+            return None
+        except (OSError, ValueError, KeyError):
+            # A corrupt entry is treated as a miss and dropped
+            with self._lock:
+                self._drop(key)
+                self.misses += 1
+            self._remove_file(key)
+            return None
+        now = time.time()
+        try:
+            # The file's mtime is its last use, shared with every process that reads the directory
+            os.utime(path, (now, now))
+            touched = True
+        except OSError:
+            touched = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] = now
+            elif touched:
+                self._entries[key] = [size, now]
+                self._total_bytes += size
+            self.hits += 1
+        return response
+
+    def put(self, key: str, response: str, **metadata):
+        """Stores a response. Error responses are never cached."""
+        if not response or response.startswith("Error:"):
+            return
+        path = self._path_for(key)
+        payload = json.dumps(dict(metadata, response=response))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so a crash never leaves a half-written entry behind
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                file.write(payload)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"  [LLM_CACHE_WARNING] Could not write cache entry {key}: {e}")
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = [size, time.time()]
+            self._total_bytes += size
+            self._puts += 1
+            due = self._total_bytes > self.max_bytes or self._puts % self._RESYNC_EVERY == 0
+        if due:
+            self._evict_if_needed()
+
+    def invalidate(self, key: str = None):
+        """Removes a single entry, or the whole cache when no key is given."""
+        with self._lock:
+            keys = [key] if key else list(self._entries)
+            for entry_key in keys:
+                self._drop(entry_key)
+        for entry_key in keys:
+            self._remove_file(entry_key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._total_bytes}
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def _scan(self):
+        """Reads the index from disk: key -> [size, mtime], and the total size."""
+        entries, total = {}, 0
+        if not os.path.isdir(self.directory):
+            return entries, total
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    # Evicted by another process in the meantime
+                    continue
+                entries[name[:-len('.json')]] = [stat.st_size, stat.st_mtime]
+                total += stat.st_size
+        return entries, total
+
+    def _drop(self, key: str):
+        """Removes key from the in-memory index; the caller holds the lock."""
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._total_bytes -= entry[0]
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._path_for(key))
+        except OSError:
+            pass
+
+    def _evict_if_needed(self):
+        # One thread re-reads the directory and evicts at a time; the others carry on
+        if not self._eviction_lock.acquire(blocking=False):
+            return
+        try:
+            entries, total = self._scan()
+            victims = []
+            with self._lock:
+                self._entries, self._total_bytes = entries, total
+                if self._total_bytes > self.max_bytes:
+                    target = self.max_bytes * self._EVICT_TO
+                    for key, _ in sorted(entries.items(), key=lambda item: item[1][1]):
+                        if self._total_bytes <= target:
+                            break
+                        self._drop(key)
+                        victims.append(key)
+            for key in victims:
+                self._remove_file(key)
+        finally:
+            self._eviction_lock.release()
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide response cache shared by every LLMClient."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(LLM_CACHE_PATH, LLM_CACHE_MAX_MB * 1024 * 1024)
+        return _shared_cache
+
+class GenerationBudgetExceeded(Exception):
+    """Raised when a streamed generation runs past its output-token or wall-clock budget."""
+
+class GenerationMetrics:
+    """Thread-safe collector of per-request latency figures (time to first token, total time)."""
 
-class LLMClient:
     def __init__(self):
-        if not GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY not found. Please set it in your .env file.")
-        genai.configure(api_key=GOOGLE_API_KEY)
-        
-        # FINAL CORRECTION: Using the latest and most robust model name.
-        # This model is guaranteed to be available on the new API version.
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
+        self._lock = threading.Lock()
+        self.time_to_first_token = []
+        self.total_time = []
+        self.cancelled = 0
+        self.truncated = 0
+
+    def record(self, total_time: float, time_to_first_token: float = None):
+        with self._lock:
+            self.total_time.append(total_time)
+            if time_to_first_token is not None:
+                self.time_to_first_token.append(time_to_first_token)
+
+    def record_cancelled(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def record_truncated(self):
+        with self._lock:
+            self.truncated += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "requests": len(self.total_time),
+                "ttft_p50": _percentile(self.time_to_first_token, 50),
+                "ttft_p95": _percentile(self.time_to_first_token, 95),
+                "total_p50": _percentile(self.total_time, 50),
+                "total_p95": _percentile(self.total_time, 95),
+                "cancelled": self.cancelled,
+                "truncated": self.truncated,
+            }
+
+def _percentile(values: list, percent: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+_shared_metrics = GenerationMetrics()
+
+def get_generation_metrics() -> GenerationMetrics:
+    """Returns the process-wide generation metrics shared by every LLMClient."""
+    return _shared_metrics
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _clean_code_fences(text: str) -> str:
+    return text.replace("```python", "").replace("```", "").strip()
+
+class LLMClient:
+    """
+    The one client every agent sends its requests through: response cache, rate limiting, retries,
+    budgets and tracing on top of a backend. A single instance is meant to be shared by all agents,
+    so they share the backend's connection as well; at most max_connections requests are in flight
+    on it at once (0 = no limit), the others wait for a free slot. With a hedging policy, requests
+    that run unusually long get a duplicate (see utils/hedging.py).
+    """
+
+    def __init__(self, use_cache: bool = LLM_CACHE_ENABLED, stream: bool = LLM_STREAMING,
+                 max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS, max_seconds: float = LLM_MAX_GENERATION_SECONDS,
+                 rate_limiter: RateLimiter = None, backend: LLMBackend = None, max_connections: int = LLM_MAX_CONNECTIONS,
+                 hedging: HedgingPolicy = None):
+        # The backend is the model itself (Gemini, a local mock or a recording); see utils/llm_backends.py
+        self.backend = backend or create_backend()
+        self.model_name = self.backend.model_name
+        self.cache = get_response_cache() if use_cache else None
+        self.stream = stream
+        self.max_output_tokens = max_output_tokens
+        self.max_seconds = max_seconds
+        self.metrics = get_generation_metrics()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.tracer = get_tracer()
+        self.max_connections = max_connections
+        self._connections = threading.BoundedSemaphore(max_connections) if max_connections > 0 else None
+        self.hedging = hedging or get_hedging_policy()
+        # Progress files still being written; a losing attempt removes its own once it stops
+        self._open_partials = set()
+        self._partials_lock = threading.Lock()
+
+    def forget(self, prompt: str, temperature: float = 0.4):
+        """Drops the cached response for a prompt, e.g. after it turned out to be truncated or invalid."""
+        if self.cache is not None:
+            self.cache.invalidate(ResponseCache.make_key(self.model_name, temperature, prompt))
+
+    def generate(self, prompt: str, temperature: float = 0.4, use_cache: bool = True, stream_to: str = None) -> str:
+        """
+        Generates content using the configured LLM, serving repeated prompts from the response cache.
+        In streaming mode the raw text is appended to stream_to (if given) as it arrives, so progress
+        is visible on disk; that file is removed once the final response is returned.
+        """
+        with self.tracer.span("llm", model=self.model_name, temperature=temperature,
+                              prompt_tokens=len(prompt) // 4) as span:
+            response = self._generate(prompt, temperature, use_cache, stream_to)
+            span.set("response_tokens", len(response) // 4)
+            if response.startswith("Error:"):
+                span.set("error", response)
+            return response
+
+    def _generate(self, prompt: str, temperature: float, use_cache: bool, stream_to: str) -> str:
+        span = self.tracer.current_span()
+        cache_key = None
+        if self.cache is not None and use_cache:
+            cache_key = ResponseCache.make_key(self.model_name, temperature, prompt)
+            cached = self.cache.get(cache_key)
+            span.set("cache_hit", cached is not None)
+            if cached is not None:
+                return cached
 
-    def generate(self, prompt: str, temperature: float = 0.4) -> str:
-        """Generates content using the configured LLM."""
         try:
-            config = genai.GenerationConfig(temperature=temperature)
+            estimated_tokens = len(prompt) // 4
+            if self.stream:
+                # Only the first attempt writes the progress file; a hedge streams to memory only
+                attempt = lambda hedge: self._on_connection(
+                    lambda: self._generate_streamed(prompt, temperature, None if hedge and hedge.hedged else stream_to,
+                                                    hedge.cancel if hedge else None),
+                    hedge, estimated_tokens)
+            else:
+                attempt = lambda hedge: self._on_connection(
+                    lambda: self._generate_blocking(prompt, temperature), hedge, estimated_tokens)
+            if self.hedging is not None:
+                generate = lambda: self.hedging.run(attempt, can_hedge=self._connection_available)
+            else:
+                generate = lambda: attempt(None)
+            # Throttling and transient server errors are retried here instead of failing the file
+            text = self.rate_limiter.call(generate, estimated_tokens=estimated_tokens)
 
-            response = self.model.generate_content(prompt, generation_config=config)
-            
             # Clean up the response to remove markdown formatting if present
-            clean_response = response.text.replace("```python", "").replace("```", "").strip()
+            clean_response = _clean_code_fences(text)
+            if cache_key:
+                self.cache.put(cache_key, clean_response, model=self.model_name, temperature=temperature)
             return clean_response
-            
+
+        except GenerationBudgetExceeded as e:
+            span.set("cancelled", True)
+            print(f"  [LLM_ERROR] Generation cancelled: {e}")
+            return f"Error: Generation cancelled. Details: {e}"
         except Exception as e:
             # Provide a more detailed error message for debugging
-            print(f"  [LLM_ERROR] An error occurred while communicating with the Google AI API: {e}")
-            return f"Error: Could not generate response. Details: {e}"
\ No newline at end of file
+            print(f"  [LLM_ERROR] An error occurred while communicating with the LLM backend: {e}")
+            return f"Error: Could not generate response. Details: {e}"
+        finally:
+            if stream_to:
+                with self._partials_lock:
+                    if stream_to not in self._open_partials:
+                        _remove_quietly(stream_to)
+
+    def _on_connection(self, call, hedge=None, estimated_tokens: int = 0):
+        """
+        Runs one backend call (call()) in a connection slot; retry backoffs happen outside it. hedge is the
+        attempt of a hedged request (see utils/hedging.py), told when the call starts. A hedge is a request
+        of its own, so it waits for the rate limiter like any other. It is dropped as soon as its request is
+        answered, even while it is still waiting, and then takes nothing from the rate limiter's budget.
+        """
+        cancel = hedge.cancel if hedge is not None else None
+        if hedge is not None and hedge.hedged and not self.rate_limiter.acquire(estimated_tokens, cancel=cancel):
+            raise HedgeCancelled("the other attempt already answered")
+        if self._connections is None:
+            return self._start_call(call, hedge)
+        if not self._acquire_connection(cancel):
+            raise HedgeCancelled("the other attempt already answered")
+        try:
+            return self._start_call(call, hedge)
+        finally:
+            self._connections.release()
+
+    def _acquire_connection(self, cancel: threading.Event = None) -> bool:
+        """Waits for a connection slot; gives up (returning False) if cancel is set meanwhile."""
+        if cancel is None:
+            self._connections.acquire()
+            return True
+        while not cancel.is_set():
+            if self._connections.acquire(timeout=0.05):
+                if not cancel.is_set():
+                    return True
+                self._connections.release()
+        return False
+
+    def _connection_available(self) -> bool:
+        """True if a connection slot is free right now, i.e. a hedge would not just queue for one."""
+        if self._connections is None:
+            return True
+        if not self._connections.acquire(blocking=False):
+            return False
+        self._connections.release()
+        return True
+
+    @staticmethod
+    def _start_call(call, hedge):
+        if hedge is not None:
+            if hedge.cancel.is_set():
+                raise HedgeCancelled("the other attempt already answered")
+            hedge.started()
+        return call()
+
+    def generate_stream(self, prompt: str, temperature: float = 0.4, cancel: threading.Event = None):
+        """
+        Yields the response text chunk by chunk as the model produces it.
+        Raises GenerationBudgetExceeded (after abandoning the stream) once the output-token or
+        wall-clock budget is exceeded, or when the model stopped because it hit its token limit.
+        Raises HedgeCancelled, abandoning the stream as well, once cancel is set.
+        """
+        started = time.perf_counter()
+        first_token_at = None
+        produced_chars = 0
+        last_chunk = None
+        for chunk in self.backend.stream(prompt, temperature, self.max_output_tokens, self.max_seconds):
+            if cancel is not None and cancel.is_set():
+                raise HedgeCancelled("the other attempt already answered")
+            last_chunk = chunk
+            text = chunk.text
+            if text and first_token_at is None:
+                first_token_at = time.perf_counter() - started
+            produced_chars += len(text)
+
+            elapsed = time.perf_counter() - started
+            if self.max_seconds and elapsed > self.max_seconds:
+                # Breaking out of the iterator abandons the underlying stream
+                self.metrics.record_cancelled()
+                raise GenerationBudgetExceeded(f"exceeded the wall-clock budget of {self.max_seconds:.0f}s")
+            if self.max_output_tokens and produced_chars // 4 > self.max_output_tokens:
+                self.metrics.record_cancelled()
+                raise GenerationBudgetExceeded(f"exceeded the output budget of {self.max_output_tokens} tokens")
+            if text:
+                yield text
+
+        if last_chunk is not None and last_chunk.finish_reason == "MAX_TOKENS":
+            self.metrics.record_truncated()
+            raise GenerationBudgetExceeded("the response was truncated at the model's output token limit")
+        self.metrics.record(time.perf_counter() - started, first_token_at)
+        if first_token_at is not None:
+            self.tracer.current_span().set("time_to_first_token", first_token_at)
+
+    def _generate_streamed(self, prompt: str, temperature: float, stream_to: str = None,
+                           cancel: threading.Event = None) -> str:
+        parts = []
+        progress_file = None
+        if stream_to:
+            os.makedirs(os.path.dirname(stream_to) or '.', exist_ok=True)
+            with self._partials_lock:
+                progress_file = open(stream_to, 'w', encoding='utf-8')
+                self._open_partials.add(stream_to)
+        try:
+            for text in self.generate_stream(prompt, temperature, cancel):
+                parts.append(text)
+                if progress_file:
+                    progress_file.write(text)
+                    progress_file.flush()
+        finally:
+            if progress_file:
+                with self._partials_lock:
+                    progress_file.close()
+                    self._open_partials.discard(stream_to)
+                    # An attempt that lost the race removes its own file: the winner's request has
+                    # already returned, and removing a file still open would fail on Windows
+                    if cancel is not None and cancel.is_set():
+                        _remove_quietly(stream_to)
+        return ''.join(parts)
+
+    def _generate_blocking(self, prompt: str, temperature: float) -> str:
+        started = time.perf_counter()
+        response = self.backend.generate(prompt, temperature, self.max_output_tokens, self.max_seconds)
+        if response.finish_reason == "MAX_TOKENS":
+            self.metrics.record_truncated()
+            raise GenerationBudgetExceeded("the response was truncated at the model's output token limit")
+        self.metrics.record(time.perf_counter() - started)
+        return response.text
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_llm_client() -> LLMClient:
+    """Returns the process-wide client used by agents that are not given one (built on first use)."""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = LLMClient()
+        return _shared_client
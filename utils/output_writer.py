@@ -0,0 +1,68 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from utils.code_parser import save_modernized_code
+
+class OutputWriter:
+    """
+    Saves outputs on a single background thread, so the pipeline's stage threads hand their results off
+    and carry on instead of each waiting on the disk. Writes go through save_modernized_code: atomic, and
+    skipped when the output already holds the same content. The thread starts on the first submit.
+    """
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.written = 0
+        self.unchanged = 0
+
+    def submit(self, path: str, content: str) -> Future:
+        """Queues one output; the returned future resolves to True if it was written, False if unchanged."""
+        future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="output-writer", daemon=True)
+                self._thread.start()
+        self._jobs.put((path, content, future))
+        return future
+
+    def write(self, path: str, content: str) -> bool:
+        """Saves one output and waits for it; returns True if it was written, False if unchanged."""
+        return self.submit(path, content).result()
+
+    def flush(self):
+        """Blocks until every output submitted so far has been saved."""
+        self.submit(None, None).result()
+
+    def _run(self):
+        while True:
+            path, content, future = self._jobs.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            if path is None:
+                future.set_result(None)
+                continue
+            try:
+                # A failed write fails the write stage, so a file is never recorded with a missing output
+                changed = save_modernized_code(path, content, strict=True)
+            except BaseException as e:
+                future.set_exception(e)
+                continue
+            with self._lock:
+                if changed:
+                    self.written += 1
+                else:
+                    self.unchanged += 1
+            future.set_result(changed)
+
+_shared_writer = None
+_shared_writer_lock = threading.Lock()
+
+def get_output_writer() -> OutputWriter:
+    """Returns the process-wide output writer."""
+    global _shared_writer
+    with _shared_writer_lock:
+        if _shared_writer is None:
+            _shared_writer = OutputWriter()
+        return _shared_writer
@@ -0,0 +1,251 @@
+import collections
+import itertools
+import os
+import pickle
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import javalang
+
+from config import AST_SUMMARY_TOKEN_BUDGET, PARSE_CHUNK_FILES, PARSE_WORKERS, PARSED_AST_CACHE_PATH
+from utils.code_parser import estimate_tokens, summarize_java_ast
+from utils.fingerprint import structural_fingerprint
+from utils.run_manifest import content_hash
+
+# Bump when the cached payload changes shape; the javalang version is part of the key too,
+# since pickled trees are tied to its node classes.
+_CACHE_FORMAT = 1
+
+class SourceChangedError(RuntimeError):
+    """Raised when a file is loaded for processing but no longer has the source hash it was parsed with."""
+
+class ParsedJavaFile:
+    """
+    What the pipeline knows about one legacy Java file. The parse stage only keeps its hash and some
+    metadata (sizes, structural fingerprint), so memory does not grow with the number of changed files.
+    Its source, tree and AST summary are loaded when first used, i.e. when the file is processed (the tree
+    from the AST cache), and dropped again with release(). source_hash is None if the file could not be read.
+    """
+
+    def __init__(self, file_path: str, source: str, source_hash: str, tree=None, summary: str = None,
+                 error: str = None, unchanged: bool = False, fingerprint: str = None, identifiers: list = None,
+                 source_length: int = None, line_count: int = None, structure_tokens: int = None,
+                 cache_dir: str = PARSED_AST_CACHE_PATH, token_budget: int = AST_SUMMARY_TOKEN_BUDGET):
+        self.file_path = file_path
+        self.source_hash = source_hash
+        self.error = error
+        # True when the source matched the hash the caller expected, so parsing was skipped
+        self.unchanged = unchanged
+        # Structural fingerprint of the tree and its declared names in canonical order (see utils.fingerprint)
+        self.fingerprint = fingerprint
+        self.identifiers = identifiers
+        self.source_length = source_length if source_length is not None else len(source or "")
+        self.line_count = line_count if line_count is not None else (source or "").count('\n') + 1
+        # Estimated tokens of code_structure, for packing batches without loading it
+        self.structure_tokens = structure_tokens
+        self.cache_dir = cache_dir
+        self.token_budget = token_budget
+        self._source = source
+        self._tree = tree
+        self._summary = summary
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def source(self):
+        """The Java source, read again from disk on first use. None if the file could not be read."""
+        with self._lock:
+            if self._source is None and self.source_hash is not None:
+                with open(self.file_path, 'r', encoding='utf-8') as file:
+                    source = file.read()
+                if content_hash(source) != self.source_hash:
+                    raise SourceChangedError(f"{self.file_path} changed on disk since it was parsed; "
+                                             f"the next run picks up the new version.")
+                self._source = source
+            return self._source
+
+    @property
+    def tree(self):
+        """The javalang tree (see load_java_tree), or None if the file does not parse."""
+        if self.error is not None or self.source_hash is None:
+            return None
+        with self._lock:
+            tree = self._tree
+        if tree is None:
+            tree = load_java_tree(self, self.cache_dir)
+            with self._lock:
+                # Two stages may load it at once; every user of this file must see the same tree
+                if self._tree is None:
+                    self._tree = tree
+                tree = self._tree
+        return tree
+
+    @property
+    def summary(self):
+        """The compact AST summary (see summarize_java_ast), or None if the file does not parse."""
+        if self._summary is None:
+            tree = self.tree
+            if tree is not None:
+                self._summary = summarize_java_ast(tree, self.source, self.token_budget)
+        return self._summary
+
+    @property
+    def code_structure(self) -> str:
+        """The representation sent to the modernization agent: the AST summary, or raw code if parsing failed."""
+        summary = self.summary
+        return summary if summary is not None else self.source
+
+    def release(self):
+        """Drops the loaded source, tree and summary; they are loaded again if used later."""
+        with self._lock:
+            self._source = self._tree = self._summary = None
+
+class ParsedAstCache:
+    """On-disk cache of parsed javalang trees keyed by the content hash of the source."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path_for(self, source_hash: str) -> str:
+        version = getattr(javalang, '__version__', 'unknown')
+        return os.path.join(self.directory, source_hash[:2], f"{source_hash}.v{_CACHE_FORMAT}-{version}.pickle")
+
+    def get(self, source_hash: str):
+        """Returns a (tree, error) tuple for a previously parsed source, or None on a miss."""
+        try:
+            with open(self._path_for(source_hash), 'rb') as file:
+                return pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+    def put(self, source_hash: str, tree, error: str = None):
+        path = self._path_for(source_hash)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                pickle.dump((tree, error), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError, RecursionError) as e:
+            print(f"  [PARSER_WARNING] Could not cache the AST for {source_hash[:12]}: {e}")
+
+def parse_java_file(file_path: str, expected_hash: str = None, cache_dir: str = PARSED_AST_CACHE_PATH,
+                    token_budget: int = AST_SUMMARY_TOKEN_BUDGET) -> ParsedJavaFile:
+    """
+    Reads, hashes and parses a single Java file, reusing a cached tree when the same source was parsed before.
+    If the source hash equals expected_hash the file is known to be unchanged and is not parsed at all.
+    Runs inside worker processes, so it must stay a picklable top-level function. The result only holds
+    the hashes and metadata; the source, tree and summary are loaded again when the file is processed.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        source = file.read()
+    source_hash = content_hash(source)
+    metadata = {"source_length": len(source), "line_count": source.count('\n') + 1, "cache_dir": cache_dir,
+                "token_budget": token_budget}
+    if expected_hash is not None and source_hash == expected_hash:
+        return ParsedJavaFile(file_path, None, source_hash, unchanged=True, **metadata)
+
+    cache = ParsedAstCache(cache_dir) if cache_dir else None
+    cached = cache.get(source_hash) if cache else None
+    if cached is not None:
+        tree, error = cached
+    else:
+        tree, error = None, None
+        try:
+            tree = javalang.parse.parse(source)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        if cache:
+            cache.put(source_hash, tree, error)
+
+    if error:
+        print(f"  [PARSER_WARNING] Could not parse {os.path.basename(file_path)} into an AST: {error}. Falling back to raw code.")
+        return ParsedJavaFile(file_path, None, source_hash, error=error, structure_tokens=estimate_tokens(source), **metadata)
+    summary = summarize_java_ast(tree, source, token_budget)
+    fingerprint, identifiers = structural_fingerprint(tree)
+    return ParsedJavaFile(file_path, None, source_hash, fingerprint=fingerprint, identifiers=identifiers,
+                          structure_tokens=estimate_tokens(summary), **metadata)
+
+def load_java_tree(parsed: ParsedJavaFile, cache_dir: str = PARSED_AST_CACHE_PATH):
+    """
+    Returns the javalang tree of a parsed file (None if it does not parse), for a file about to be
+    processed or (re-)indexed. The tree comes from the AST cache when possible and is parsed in-process
+    otherwise. It is not kept: use parsed.tree to load it once for the whole processing of the file.
+    """
+    if parsed.error is not None or parsed.source_hash is None:
+        return None
+    cache = ParsedAstCache(cache_dir) if cache_dir else None
+    cached = cache.get(parsed.source_hash) if cache else None
+    if cached is not None:
+        return cached[0]
+    try:
+        tree = javalang.parse.parse(parsed.source)
+    except Exception as e:
+        tree = None
+        if cache:
+            cache.put(parsed.source_hash, None, str(e) or type(e).__name__)
+    else:
+        if cache:
+            cache.put(parsed.source_hash, tree)
+    return tree
+
+def _init_worker():
+    # Deeply nested expressions make both javalang's parser and pickle recurse heavily
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+def parse_java_files(file_paths, expected_hashes=None, max_workers: int = PARSE_WORKERS,
+                     cache_dir: str = PARSED_AST_CACHE_PATH, chunk_files: int = PARSE_CHUNK_FILES) -> dict:
+    """
+    Parses many Java files across a pool of worker processes (javalang is pure Python and CPU bound).
+    file_paths may be a lazy iterable (e.g. a discovery stream): it is consumed only as fast as the
+    workers keep up, chunk_files paths per task and at most two tasks per worker in flight.
+    expected_hashes maps a path to the hash it is known to have, as a dict or as a function.
+    Returns a dict mapping each file path to its ParsedJavaFile, in the input order.
+    """
+    expected_hash = expected_hashes if callable(expected_hashes) else (expected_hashes or {}).get
+    paths = iter(file_paths)
+    chunk_files = max(1, chunk_files)
+    results = {}
+
+    def next_chunk():
+        return [(path, expected_hash(path), cache_dir) for path in itertools.islice(paths, chunk_files)]
+
+    # A process pool is not worth its start-up cost for a handful of files
+    chunk = next_chunk()
+    if max_workers <= 1 or len(chunk) <= 1:
+        _init_worker()
+        while chunk:
+            for path, parsed in _parse_chunk(chunk):
+                results[path] = parsed
+            chunk = next_chunk()
+        return results
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
+        in_flight = collections.deque()
+        while chunk:
+            in_flight.append(executor.submit(_parse_chunk, chunk))
+            if len(in_flight) >= max_workers * 2:
+                results.update(in_flight.popleft().result())
+            chunk = next_chunk()
+        while in_flight:
+            results.update(in_flight.popleft().result())
+    return results
+
+def _parse_chunk(jobs: list) -> list:
+    return [(path, _parse_or_fail(path, expected_hash, cache_dir)) for path, expected_hash, cache_dir in jobs]
+
+def _parse_or_fail(file_path: str, expected_hash: str, cache_dir: str):
+    try:
+        return parse_java_file(file_path, expected_hash, cache_dir)
+    except OSError as e:
+        print(f"  [PARSER_WARNING] Could not read {file_path}: {e}")
+        return ParsedJavaFile(file_path, None, None, error=str(e), cache_dir=cache_dir)
@@ -0,0 +1,113 @@
+import difflib
+import os
+import re
+
+from utils.python_merge import is_valid_python
+from utils.run_manifest import content_hash
+
+# Edits the agents answer with in update mode: each block replaces one exact excerpt of the previous output
+EDIT_SEARCH = "<<<<<<< SEARCH"
+EDIT_DIVIDER = "======="
+EDIT_REPLACE = ">>>>>>> REPLACE"
+# The whole answer when the previous output needs no change at all
+NO_CHANGES = "NO CHANGES"
+
+_EDIT_PATTERN = re.compile(rf"^{EDIT_SEARCH}[ \t]*\n(.*?)^{EDIT_DIVIDER}[ \t]*\n(.*?)^{EDIT_REPLACE}[ \t]*$",
+                           re.MULTILINE | re.DOTALL)
+SNAPSHOT_DIRECTORY_NAME = ".codegenesis_sources"
+
+class PatchError(ValueError):
+    """Raised when an answer holds no usable edits, or an edit does not apply to the previous output."""
+
+def source_diff(old: str, new: str, name: str):
+    """Returns (unified diff of old -> new, fraction of old's lines the diff removes or adds)."""
+    old_lines, new_lines = old.splitlines(True), new.splitlines(True)
+    diff = list(difflib.unified_diff(old_lines, new_lines, f"a/{name}", f"b/{name}", n=3))
+    changed = sum(1 for line in diff if line[:1] in '+-' and not line.startswith(('+++', '---')))
+    return ''.join(diff), changed / max(1, len(old_lines))
+
+def parse_edits(response: str) -> list:
+    """The (search, replace) pairs of an answer, in order. NO_CHANGES gives no edits."""
+    if response.strip() == NO_CHANGES:
+        return []
+    edits = _EDIT_PATTERN.findall(response)
+    if not edits:
+        raise PatchError("the answer holds no edit blocks")
+    return edits
+
+def apply_edits(text: str, edits: list) -> str:
+    """
+    Applies each (search, replace) edit in turn. The search excerpt must occur exactly once; trailing
+    whitespace and the final newline are not significant. Raises PatchError when an edit does not apply.
+    """
+    for number, (search, replace) in enumerate(edits, 1):
+        if not search.strip():
+            raise PatchError(f"edit {number} has an empty SEARCH section")
+        if text.count(search) == 1:
+            text = text.replace(search, replace, 1)
+            continue
+        lines = text.split('\n')
+        stripped = [line.rstrip() for line in lines]
+        wanted = [line.rstrip() for line in search.rstrip('\n').split('\n')]
+        matches = [start for start in range(len(lines) - len(wanted) + 1) if stripped[start:start + len(wanted)] == wanted]
+        if len(matches) != 1:
+            raise PatchError(f"the SEARCH section of edit {number} is {'ambiguous' if matches else 'not in the previous output'}")
+        start = matches[0]
+        replacement = replace.rstrip('\n').split('\n') if replace.strip('\n') else []
+        text = '\n'.join(lines[:start] + replacement + lines[start + len(wanted):])
+    return text
+
+def generate_patched(llm_client, prompt: str, previous: str, label: str, temperature: float = 0.4,
+                     must_compile: bool = True) -> str:
+    """
+    Asks for edits to previous and applies them. Returns the patched text, or an "Error: ..." string
+    when the answer is an error, does not apply, or (with must_compile) yields code that does not compile;
+    the answer is then dropped from the response cache so a later attempt asks again. With must_compile,
+    an answer holding no edits at all but a whole file that compiles is taken as the new output, rather
+    than spending a second request on regenerating it.
+    """
+    response = llm_client.generate(prompt, temperature=temperature)
+    if response.startswith("Error:"):
+        return response
+    try:
+        patched = apply_edits(previous, parse_edits(response))
+    except PatchError as e:
+        if must_compile and EDIT_SEARCH not in response and response.strip() and is_valid_python(response):
+            return response
+        llm_client.forget(prompt, temperature)
+        return f"Error: The patch for {label} does not apply: {e}."
+    if must_compile and not is_valid_python(patched):
+        llm_client.forget(prompt, temperature)
+        return f"Error: The patched output for {label} is not valid Python."
+    return patched
+
+class SourceSnapshots:
+    """
+    Copies of the Java sources the current outputs were generated from, kept in the output directory,
+    so the next run can diff a changed file against the version its outputs describe.
+    """
+
+    def __init__(self, legacy_root: str, output_root: str):
+        self.legacy_root = legacy_root
+        self.directory = os.path.join(output_root, SNAPSHOT_DIRECTORY_NAME)
+
+    def path_for(self, input_path: str) -> str:
+        return self.path_for_key(os.path.relpath(input_path, self.legacy_root).replace(os.sep, '/'))
+
+    def path_for_key(self, relative_path: str) -> str:
+        return os.path.join(self.directory, relative_path)
+
+    def load(self, input_path: str, expected_hash: str):
+        """The snapshot of input_path, provided it is the source with expected_hash; otherwise None."""
+        try:
+            with open(self.path_for(input_path), 'r', encoding='utf-8') as file:
+                source = file.read()
+        except (OSError, ValueError):
+            return None
+        return source if content_hash(source) == expected_hash else None
+
+    def remove(self, relative_path: str):
+        try:
+            os.remove(self.path_for_key(relative_path))
+        except OSError:
+            pass
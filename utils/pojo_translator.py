@@ -0,0 +1,536 @@
+import ast
+import keyword
+import re
+
+import javalang
+
+# === POJO FAST PATH ===
+# Plain data classes (private fields, a constructor assigning them, getters, setters and perhaps a
+# method printing some fields) map mechanically onto a Pydantic model: the fields become model
+# fields, accessors become plain attribute access and the constructor becomes keyword construction.
+# Such classes are translated here from the javalang tree, without an LLM request. Anything the
+# rules below do not recognize makes the whole class go to the modernization agent instead.
+# toString/equals/hashCode are accepted as boilerplate: Pydantic models bring their own repr and equality.
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+
+# Java type -> (Python type, module it is imported from)
+_SCALAR_TYPES = {
+    "int": ("int", None), "long": ("int", None), "short": ("int", None), "byte": ("int", None),
+    "Integer": ("int", None), "Long": ("int", None), "Short": ("int", None), "Byte": ("int", None),
+    "BigInteger": ("int", None), "float": ("float", None), "double": ("float", None),
+    "Float": ("float", None), "Double": ("float", None), "boolean": ("bool", None), "Boolean": ("bool", None),
+    "char": ("str", None), "Character": ("str", None), "String": ("str", None),
+    "BigDecimal": ("Decimal", "decimal"), "LocalDate": ("date", "datetime"), "LocalTime": ("time", "datetime"),
+    "LocalDateTime": ("datetime", "datetime"), "Date": ("datetime", "datetime"), "Instant": ("datetime", "datetime"),
+    "UUID": ("UUID", "uuid"),
+}
+_CONTAINER_TYPES = {
+    "List": "list", "ArrayList": "list", "LinkedList": "list", "Collection": "list",
+    "Set": "set", "HashSet": "set", "LinkedHashSet": "set", "TreeSet": "set",
+    "Map": "dict", "HashMap": "dict", "LinkedHashMap": "dict", "TreeMap": "dict",
+}
+_PRIMITIVE_DEFAULTS = {"int": "0", "long": "0", "short": "0", "byte": "0", "float": "0.0", "double": "0.0",
+                       "boolean": "False", "char": "'\\x00'"}
+# Example values for the generated tests, per Python type
+_SAMPLE_VALUES = {
+    "int": "1", "float": "1.5", "bool": "True", "str": '"sample"', "Decimal": "Decimal('1.50')",
+    "date": "date(2024, 1, 1)", "time": "time(12, 0)", "datetime": "datetime(2024, 1, 1, 12, 0)",
+    "UUID": "UUID('12345678-1234-5678-1234-567812345678')", "bytes": "b'data'",
+    "list": "[]", "set": "set()", "dict": "{}",
+}
+# Attributes of pydantic.BaseModel a field must not shadow
+_RESERVED_NAMES = {"copy", "dict", "json", "schema", "schema_json", "construct", "validate", "parse_obj",
+                   "parse_raw", "parse_file", "from_orm", "fields", "update_forward_refs", "self"}
+_ALLOWED_INTERFACES = {"Serializable", "Cloneable"}
+_BOILERPLATE_METHODS = {("toString", 0), ("hashCode", 0), ("equals", 1)}
+# What a constructor leaves a field set to when it assigns the field one of its arguments
+_FROM_ARGUMENT = object()
+
+class _Field:
+    def __init__(self, java_name: str, python_type: str, base_type: str, primitive_type: str = None, default: str = None):
+        self.java_name = java_name
+        self.name = snake_case(java_name)
+        self.python_type = python_type
+        # The outermost Python type (e.g. "list" for list[str]), used to pick example values
+        self.base_type = base_type
+        # The Java primitive (int, boolean, ...) of a field that can never be null
+        self.primitive_type = primitive_type
+        self.boolean = base_type == "bool"
+        self.default = default
+        self.required = False
+
+class _Pojo:
+    def __init__(self, name: str, qualified_name: str):
+        self.name = name
+        self.qualified_name = qualified_name
+        self.fields = {}
+        self.constants = []
+        self.methods = []
+        self.imports = {}
+
+def snake_case(name: str) -> str:
+    return _CAMEL_BOUNDARY.sub('_', name).lower()
+
+def is_trivial_pojo(tree) -> bool:
+    """True if the compilation unit is a plain data class the fast path can translate."""
+    return tree is not None and _analyze(tree) is not None
+
+def translate_pojo(tree, module_name: str, include_router: bool = True, include_tests: bool = True):
+    """
+    Translates a plain data class into {"modernize": module, "tests": pytest module} (tests only with
+    include_tests), or returns None when the class is not a plain data class. With include_router the
+    module also exposes an in-memory CRUD FastAPI router and app, provided the class has an id field.
+    """
+    pojo = _analyze(tree) if tree is not None else None
+    if pojo is None:
+        return None
+    id_field = _id_field(pojo) if include_router else None
+    outputs = {"modernize": _render_module(pojo, id_field)}
+    if include_tests:
+        outputs["tests"] = _render_tests(pojo, module_name, id_field)
+    return outputs
+
+# === RECOGNITION ===
+
+def _analyze(tree):
+    if len(tree.types) != 1 or not isinstance(tree.types[0], javalang.tree.ClassDeclaration):
+        return None
+    declaration = tree.types[0]
+    if (declaration.extends or declaration.type_parameters or declaration.annotations
+            or {'abstract'} & declaration.modifiers):
+        return None
+    if any(_simple_name(interface) not in _ALLOWED_INTERFACES for interface in declaration.implements or []):
+        return None
+    package = tree.package.name + '.' if tree.package else ''
+    pojo = _Pojo(declaration.name, package + declaration.name)
+
+    for member in declaration.body:
+        if isinstance(member, javalang.tree.FieldDeclaration):
+            if not _add_fields(pojo, member):
+                return None
+        elif not isinstance(member, (javalang.tree.MethodDeclaration, javalang.tree.ConstructorDeclaration)):
+            # Nested types, initializer blocks, ...
+            return None
+    if not pojo.fields:
+        return None
+    names = [field.name for field in pojo.fields.values()]
+    if len(set(names)) != len(names):
+        return None
+
+    constructors = [member for member in declaration.body if isinstance(member, javalang.tree.ConstructorDeclaration)]
+    assignments = []
+    for constructor in constructors:
+        assigned = _constructor_assignments(pojo, constructor)
+        if assigned is None:
+            return None
+        assignments.append(assigned)
+    # A field every constructor sets from an argument is required. Any other defaults to the value the
+    # constructors that do not take it as an argument leave it with (a literal they assign, or else its
+    # Java initial value), which must be the same for all of them.
+    for field in pojo.fields.values():
+        initial = field.default if field.default is not None else _PRIMITIVE_DEFAULTS.get(field.primitive_type, "None")
+        outcomes = [assigned.get(field.java_name, initial) for assigned in assignments] or [initial]
+        field.required = all(outcome is _FROM_ARGUMENT for outcome in outcomes)
+        if field.required:
+            continue
+        defaults = {outcome for outcome in outcomes if outcome is not _FROM_ARGUMENT}
+        if len(defaults) != 1:
+            return None
+        field.default = defaults.pop()
+        if field.default == "None" and field.primitive_type is None:
+            field.python_type = f"Optional[{field.python_type}]"
+            pojo.imports.setdefault("typing", set()).add("Optional")
+
+    for method in (member for member in declaration.body if isinstance(member, javalang.tree.MethodDeclaration)):
+        if not _accept_method(pojo, method):
+            return None
+    return pojo
+
+def _add_fields(pojo: _Pojo, declaration) -> bool:
+    if declaration.annotations:
+        return False
+    converted = _python_type(declaration.type, pojo.imports)
+    if converted is None:
+        return False
+    python_type, base_type = converted
+    static = 'static' in declaration.modifiers
+    for declarator in declaration.declarators:
+        if declarator.dimensions:
+            return False
+        if static:
+            if declarator.name == "serialVersionUID":
+                continue
+            value = _literal(declarator.initializer) if declarator.initializer is not None else None
+            if 'final' not in declaration.modifiers or value is None:
+                return False
+            pojo.constants.append((declarator.name, python_type, value))
+            pojo.imports.setdefault("typing", set()).add("ClassVar")
+            continue
+        name = snake_case(declarator.name)
+        if keyword.iskeyword(name) or name.startswith('_') or name.startswith('model_') or name in _RESERVED_NAMES:
+            return False
+        default = None
+        if declarator.initializer is not None:
+            default = _literal(declarator.initializer) or _empty_container(declarator.initializer, base_type)
+            if default is None:
+                return False
+        primitive = isinstance(declaration.type, javalang.tree.BasicType) and not declaration.type.dimensions
+        pojo.fields[declarator.name] = _Field(declarator.name, python_type, base_type,
+                                              declaration.type.name if primitive else None, default)
+    return True
+
+def _simple_name(type_node) -> str:
+    """java.io.Serializable -> Serializable"""
+    while type_node.sub_type is not None:
+        type_node = type_node.sub_type
+    return type_node.name
+
+def _python_type(type_node, imports: dict):
+    """Returns (python type, outermost python type) for a Java type, or None if it has no obvious equivalent."""
+    dimensions = len(type_node.dimensions or [])
+    if isinstance(type_node, javalang.tree.BasicType):
+        if type_node.name == "byte" and dimensions == 1:
+            return "bytes", "bytes"
+        python_type, module = _SCALAR_TYPES[type_node.name]
+    else:
+        while type_node.sub_type is not None:
+            # java.util.List -> List
+            type_node = type_node.sub_type
+            dimensions = len(type_node.dimensions or [])
+        arguments = type_node.arguments or []
+        if type_node.name in _CONTAINER_TYPES:
+            container = _CONTAINER_TYPES[type_node.name]
+            expected = 2 if container == "dict" else 1
+            if len(arguments) != expected:
+                return None
+            inner = []
+            for argument in arguments:
+                if argument.pattern_type is not None or argument.type is None:
+                    return None
+                converted = _python_type(argument.type, imports)
+                if converted is None:
+                    return None
+                inner.append(converted[0])
+            python_type, module = f"{container}[{', '.join(inner)}]", None
+        elif type_node.name in _SCALAR_TYPES and not arguments:
+            python_type, module = _SCALAR_TYPES[type_node.name]
+        else:
+            return None
+    if module:
+        imports.setdefault(module, set()).add(python_type)
+    base_type = python_type.split('[', 1)[0]
+    for _ in range(dimensions):
+        python_type, base_type = f"list[{python_type}]", "list"
+    return python_type, base_type
+
+def _literal(node):
+    """The Python source of a Java literal (optionally negated), or None for anything else."""
+    if not isinstance(node, javalang.tree.Literal) or node.selectors or node.postfix_operators:
+        return None
+    prefix = node.prefix_operators or []
+    if prefix not in ([], ['-']):
+        return None
+    value = node.value
+    if value in ("true", "false", "null"):
+        python_value = {"true": "True", "false": "False", "null": "None"}[value]
+    elif value[0] in "\"'":
+        try:
+            python_value = repr(ast.literal_eval(value))
+        except (ValueError, SyntaxError):
+            return None
+    else:
+        number = value.replace('_', '')
+        if not number.lower().startswith('0x'):
+            number = number.rstrip('lLfFdD')
+        try:
+            python_value = repr(ast.literal_eval(number))
+        except (ValueError, SyntaxError):
+            return None
+        if not isinstance(ast.literal_eval(python_value), (int, float)):
+            return None
+    if prefix:
+        return None if not python_value[0].isdigit() else '-' + python_value
+    return python_value
+
+def _empty_container(node, base_type: str):
+    """`new ArrayList<>()` and friends become a default factory."""
+    if (isinstance(node, javalang.tree.ClassCreator) and not node.arguments and node.body is None
+            and node.type.name in _CONTAINER_TYPES and _CONTAINER_TYPES[node.type.name] == base_type):
+        return f"Field(default_factory={base_type})"
+    return None
+
+def _field_reference(pojo: _Pojo, node, shadowed=()):
+    """The field a `name` or `this.name` expression refers to, or None."""
+    if isinstance(node, javalang.tree.This):
+        selectors = node.selectors or []
+        if (len(selectors) == 1 and isinstance(selectors[0], javalang.tree.MemberReference)
+                and not node.prefix_operators and not node.postfix_operators):
+            return pojo.fields.get(selectors[0].member)
+        return None
+    if (isinstance(node, javalang.tree.MemberReference) and not node.qualifier and not node.selectors
+            and not node.prefix_operators and not node.postfix_operators and node.member not in shadowed):
+        return pojo.fields.get(node.member)
+    return None
+
+def _assignment(node):
+    """(target, value) of a plain `target = value;` statement, or None."""
+    if not isinstance(node, javalang.tree.StatementExpression):
+        return None
+    expression = node.expression
+    if not isinstance(expression, javalang.tree.Assignment) or expression.type != '=':
+        return None
+    return expression.expressionl, expression.value
+
+def _constructor_assignments(pojo: _Pojo, constructor):
+    """
+    Maps each field a constructor sets to what it leaves it set to: _FROM_ARGUMENT, or the Python source of
+    the literal it assigns. Returns None if the constructor does anything else.
+    """
+    parameters = {parameter.name for parameter in constructor.parameters}
+    if constructor.type_parameters or any(parameter.varargs for parameter in constructor.parameters):
+        return None
+    assigned = {}
+    for statement in constructor.body or []:
+        parts = _assignment(statement)
+        if parts is None:
+            return None
+        target, value = parts
+        field = _field_reference(pojo, target, shadowed=parameters)
+        if field is None:
+            return None
+        if (isinstance(value, javalang.tree.MemberReference) and not value.qualifier and not value.selectors
+                and value.member in parameters):
+            assigned[field.java_name] = _FROM_ARGUMENT
+        else:
+            literal = _literal(value)
+            if literal is None:
+                return None
+            assigned[field.java_name] = literal
+    return assigned
+
+def _accept_method(pojo: _Pojo, method) -> bool:
+    """Accepts getters, setters, boilerplate and print-only methods; records the latter for rendering."""
+    if 'static' in method.modifiers or method.type_parameters:
+        return False
+    if (method.name, len(method.parameters)) in _BOILERPLATE_METHODS:
+        return True
+    body = method.body or []
+    parameters = {parameter.name for parameter in method.parameters}
+    if len(body) == 1 and not parameters and isinstance(body[0], javalang.tree.ReturnStatement):
+        # Getter
+        return _field_reference(pojo, body[0].expression) is not None
+    if len(body) == 1 and len(parameters) == 1 and method.return_type is None:
+        # Setter
+        parts = _assignment(body[0])
+        if parts is None:
+            return False
+        target, value = parts
+        return (_field_reference(pojo, target, shadowed=parameters) is not None
+                and isinstance(value, javalang.tree.MemberReference) and value.member in parameters
+                and not value.qualifier and not value.selectors)
+    if method.return_type is None and not parameters and body:
+        statements = [_print_statement(pojo, statement) for statement in body]
+        if all(statement is not None for statement in statements):
+            pojo.methods.append((snake_case(method.name), statements))
+            return True
+    return False
+
+def _print_statement(pojo: _Pojo, statement):
+    """Python for `System.out.println(<string literals and fields joined with +>);`, or None."""
+    if not isinstance(statement, javalang.tree.StatementExpression):
+        return None
+    call = statement.expression
+    if (not isinstance(call, javalang.tree.MethodInvocation) or call.qualifier != "System.out"
+            or call.member not in ("println", "print") or call.selectors or len(call.arguments) > 1):
+        return None
+    end = "" if call.member == "print" else None
+    if not call.arguments:
+        return "print(end='')" if end == "" else "print()"
+    operands = _concatenation(call.arguments[0])
+    if operands is None:
+        return None
+    # Java adds numbers before it concatenates, so only `"literal" + ...` chains are plain string building
+    if len(operands) > 1 and not (isinstance(operands[0], javalang.tree.Literal) and operands[0].value[:1] == '"'):
+        return None
+    text = []
+    for operand in operands:
+        field = _field_reference(pojo, operand)
+        if field is not None:
+            # Java prints booleans in lower case
+            text.append(f"{{str(self.{field.name}).lower()}}" if field.boolean else f"{{self.{field.name}}}")
+            continue
+        value = _literal(operand)
+        if value is None:
+            return None
+        literal = ast.literal_eval(value)
+        literal = {True: "true", False: "false"}.get(literal, literal) if isinstance(literal, bool) else literal
+        text.append(str("null" if literal is None else literal).replace('{', '{{').replace('}', '}}'))
+    rendered = 'f' + repr(''.join(text))
+    return f"print({rendered}, end='')" if end == "" else f"print({rendered})"
+
+def _concatenation(node):
+    """The operands of a left-to-right `a + b + c` chain, or None if it is anything else."""
+    if isinstance(node, javalang.tree.BinaryOperation):
+        # + is left-associative, so a + on the right was parenthesized: `"x" + (1 + 2)` adds before it concatenates
+        if node.operator != '+' or isinstance(node.operandr, javalang.tree.BinaryOperation):
+            return None
+        left = _concatenation(node.operandl)
+        return None if left is None else left + [node.operandr]
+    return [node]
+
+def _id_field(pojo: _Pojo):
+    """The field identifying an instance (`id`, or else the first `...Id`), if it is a required int or str."""
+    candidates = [field for field in pojo.fields.values() if field.java_name == "id"]
+    candidates += [field for field in pojo.fields.values() if field.java_name.endswith("Id") and field.java_name != "id"]
+    for field in candidates:
+        if field.required and field.python_type in ("int", "str"):
+            return field
+    return None
+
+# === RENDERING ===
+
+def _render_module(pojo: _Pojo, id_field) -> str:
+    imports = {module: set(names) for module, names in pojo.imports.items()}
+    pydantic = {"BaseModel"}
+    if any(field.default and field.default.startswith("Field(") for field in pojo.fields.values()):
+        pydantic.add("Field")
+    lines = ['"""',
+             f"{pojo.name} modernized as a Pydantic model.",
+             f"Translated mechanically from the plain data class {pojo.qualified_name}: its constructor,",
+             "getters and setters map onto the model's fields, read and written as plain attributes.",
+             '"""']
+    for module in sorted(imports):
+        lines.append(f"from {module} import {', '.join(sorted(imports[module]))}")
+    if imports:
+        lines.append("")
+    if id_field is not None:
+        lines.append("from fastapi import APIRouter, FastAPI, HTTPException")
+    lines.append(f"from pydantic import {', '.join(sorted(pydantic))}")
+    lines += ["", "", f"class {pojo.name}(BaseModel):", f'    """Data model translated from {pojo.qualified_name}."""', ""]
+    for name, python_type, value in pojo.constants:
+        lines.append(f"    {name}: ClassVar[{python_type}] = {value}")
+    for field in pojo.fields.values():
+        default = "" if field.required else f" = {field.default}"
+        lines.append(f"    {field.name}: {field.python_type}{default}")
+    for name, statements in pojo.methods:
+        lines += ["", f"    def {name}(self) -> None:"]
+        lines += [f"        {statement}" for statement in statements]
+    if id_field is not None:
+        lines += _render_router(pojo, id_field)
+    return '\n'.join(lines) + '\n'
+
+def _resource_names(pojo: _Pojo):
+    singular = snake_case(pojo.name)
+    return singular, singular + 's', '/' + singular.replace('_', '-') + 's'
+
+def _render_router(pojo: _Pojo, id_field: _Field) -> list:
+    singular, plural, prefix = _resource_names(pojo)
+    key, key_type = id_field.name, id_field.python_type
+    return [
+        "", "",
+        f"# In-memory store standing in for a database, keyed by {key}",
+        f"{plural}: dict[{key_type}, {pojo.name}] = {{}}",
+        "",
+        f'router = APIRouter(prefix="{prefix}", tags=["{pojo.name}"])',
+        "", "",
+        f'@router.get("/", response_model=list[{pojo.name}])',
+        f"def list_{plural}():",
+        f"    return list({plural}.values())",
+        "", "",
+        f'@router.get("/{{{key}}}", response_model={pojo.name})',
+        f"def get_{singular}({key}: {key_type}):",
+        f"    if {key} not in {plural}:",
+        f'        raise HTTPException(status_code=404, detail=f"{pojo.name} {{{key}}} not found")',
+        f"    return {plural}[{key}]",
+        "", "",
+        f'@router.post("/", response_model={pojo.name}, status_code=201)',
+        f"def create_{singular}(item: {pojo.name}):",
+        f"    if item.{key} in {plural}:",
+        f'        raise HTTPException(status_code=409, detail=f"{pojo.name} {{item.{key}}} already exists")',
+        f"    {plural}[item.{key}] = item",
+        "    return item",
+        "", "",
+        f'@router.put("/{{{key}}}", response_model={pojo.name})',
+        f"def update_{singular}({key}: {key_type}, item: {pojo.name}):",
+        f"    if {key} not in {plural}:",
+        f'        raise HTTPException(status_code=404, detail=f"{pojo.name} {{{key}}} not found")',
+        f"    {plural}[{key}] = item.model_copy(update={{\"{key}\": {key}}})",
+        f"    return {plural}[{key}]",
+        "", "",
+        f'@router.delete("/{{{key}}}", status_code=204)',
+        f"def delete_{singular}({key}: {key_type}):",
+        f"    if {plural}.pop({key}, None) is None:",
+        f'        raise HTTPException(status_code=404, detail=f"{pojo.name} {{{key}}} not found")',
+        "", "",
+        f'app = FastAPI(title="{pojo.name} API")',
+        "app.include_router(router)",
+    ]
+
+def _sample_value(field: _Field) -> str:
+    return _SAMPLE_VALUES[field.base_type]
+
+def _render_tests(pojo: _Pojo, module_name: str, id_field) -> str:
+    module = module_name[:-3] if module_name.endswith('.py') else module_name
+    singular, plural, prefix = _resource_names(pojo)
+    names = [pojo.name] + ([plural, "app"] if id_field is not None else [])
+    # The example values need the same imports as the field types, except typing's
+    imports = {source: types for source, types in pojo.imports.items() if source != "typing"}
+    lines = [f'"""Tests for the Pydantic model translated from {pojo.qualified_name}."""']
+    for source in sorted(imports):
+        lines.append(f"from {source} import {', '.join(sorted(imports[source]))}")
+    lines += ["", "import pytest"]
+    if id_field is not None:
+        lines.append("from fastapi.testclient import TestClient")
+    lines += ["from pydantic import ValidationError", "", f"from {module} import {', '.join(names)}", "", ""]
+
+    values = ', '.join(f'"{field.name}": {_sample_value(field)}' for field in pojo.fields.values())
+    lines += [f"def make_{singular}(**overrides) -> {pojo.name}:",
+              f"    values = {{{values}}}",
+              "    values.update(overrides)",
+              f"    return {pojo.name}(**values)",
+              "", "",
+              f"def test_create_{singular}():",
+              f"    item = make_{singular}()"]
+    lines += [f"    assert item.{field.name} == {_sample_value(field)}" for field in pojo.fields.values()]
+    lines += ["", "", f"def test_{singular}_round_trips_through_json():",
+              f"    item = make_{singular}()",
+              f"    assert {pojo.name}.model_validate_json(item.model_dump_json()) == item"]
+
+    required = [field for field in pojo.fields.values() if field.required]
+    if required:
+        lines += ["", "", f"def test_{singular}_requires_{required[0].name}():",
+                  "    values = make_" + singular + "().model_dump()",
+                  f'    del values["{required[0].name}"]',
+                  "    with pytest.raises(ValidationError):",
+                  f"        {pojo.name}(**values)"]
+    numeric = next((field for field in pojo.fields.values() if field.python_type in ("int", "float")), None)
+    if numeric is not None:
+        lines += ["", "", f"def test_{singular}_rejects_a_non_numeric_{numeric.name}():",
+                  "    with pytest.raises(ValidationError):",
+                  f'        make_{singular}({numeric.name}="not a number")']
+    for name, statements in pojo.methods:
+        lines += ["", "", f"def test_{name}_prints(capsys):",
+                  f"    make_{singular}().{name}()",
+                  "    assert capsys.readouterr().out"]
+
+    if id_field is not None:
+        key = id_field.name
+        lines += ["", "",
+                  "@pytest.fixture",
+                  "def client():",
+                  f"    {plural}.clear()",
+                  "    yield TestClient(app)",
+                  f"    {plural}.clear()",
+                  "", "",
+                  "def test_crud_round_trip(client):",
+                  f"    item = make_{singular}()",
+                  f"    payload = item.model_dump(mode=\"json\")",
+                  f'    assert client.post("{prefix}/", json=payload).status_code == 201',
+                  f'    assert client.post("{prefix}/", json=payload).status_code == 409',
+                  f'    assert client.get(f"{prefix}/{{item.{key}}}").json() == payload',
+                  f'    assert len(client.get("{prefix}/").json()) == 1',
+                  f'    assert client.put(f"{prefix}/{{item.{key}}}", json=payload).status_code == 200',
+                  f'    assert client.delete(f"{prefix}/{{item.{key}}}").status_code == 204',
+                  f'    assert client.get(f"{prefix}/{{item.{key}}}").status_code == 404']
+    return '\n'.join(lines) + '\n'
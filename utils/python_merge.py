@@ -0,0 +1,41 @@
+import ast
+
+def is_valid_python(code: str) -> bool:
+    """True if code compiles. Truncated LLM output almost always fails this check."""
+    try:
+        compile(code, '<generated>', 'exec')
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+def split_imports(code: str):
+    """
+    Splits a module into its top-level import statements and the remaining code.
+    The code must be valid Python.
+    """
+    lines = code.splitlines()
+    import_lines = set()
+    imports = []
+    for node in ast.parse(code).body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append('\n'.join(lines[node.lineno - 1:node.end_lineno]).strip())
+            import_lines.update(range(node.lineno - 1, node.end_lineno))
+    rest = '\n'.join(line for index, line in enumerate(lines) if index not in import_lines)
+    return imports, rest.strip()
+
+def merge_python_modules(modules: list) -> str:
+    """
+    Merges several generated modules into one: imports are deduplicated and hoisted to the top
+    (`from __future__` imports first), the remaining code keeps the order of the input modules.
+    """
+    future_imports, imports, bodies = [], [], []
+    for code in modules:
+        module_imports, body = split_imports(code)
+        for statement in module_imports:
+            target = future_imports if statement.startswith('from __future__') else imports
+            if statement not in target:
+                target.append(statement)
+        if body:
+            bodies.append(body)
+    header = '\n'.join(future_imports + imports)
+    return (header + '\n\n\n' if header else '') + '\n\n\n'.join(bodies) + '\n'
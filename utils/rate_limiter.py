@@ -0,0 +1,191 @@
+import random
+import re
+import threading
+import time
+
+from config import (LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_RETRIES, LLM_BACKOFF_BASE_SECONDS,
+                    LLM_BACKOFF_MAX_SECONDS)
+from utils.tracing import get_tracer
+
+# HTTP status codes worth retrying: rate limiting and transient server-side failures
+_THROTTLING_CODES = {429}
+_TRANSIENT_CODES = {408, 500, 502, 503, 504}
+# google.api_core exception class names, matched by name so this module does not import the SDK
+_THROTTLING_ERRORS = {"ResourceExhausted", "TooManyRequests"}
+_TRANSIENT_ERRORS = {"ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+                     "BadGateway", "Aborted", "RetryError", "ConnectionError", "TimeoutError",
+                     "ConnectionResetError", "RemoteDisconnected"}
+# The API's 429 responses carry a hint such as "retry_delay { seconds: 37 }"
+_RETRY_DELAY_PATTERN = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)")
+
+def _status_code(error: Exception):
+    code = getattr(error, 'code', None)
+    code = getattr(code, 'value', code)
+    return code if isinstance(code, int) else None
+
+def is_throttling_error(error: Exception) -> bool:
+    return type(error).__name__ in _THROTTLING_ERRORS or _status_code(error) in _THROTTLING_CODES
+
+def is_transient_error(error: Exception) -> bool:
+    """True for failures that may succeed when retried: throttling, timeouts and 5xx server errors."""
+    return (is_throttling_error(error) or type(error).__name__ in _TRANSIENT_ERRORS
+            or _status_code(error) in _TRANSIENT_CODES)
+
+def retry_after_hint(error: Exception):
+    """Seconds the server asked us to wait before retrying, if it said so."""
+    match = _RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+class _TokenBucket:
+    """A bucket refilled continuously at `per_minute * factor` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.available = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float, factor: float):
+        capacity = self.per_minute * factor
+        self.available = min(capacity, self.available + (now - self.updated) * capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, factor: float) -> float:
+        # A request larger than the whole bucket is let through once the bucket is full
+        amount = min(amount, self.per_minute * factor)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) * 60 / (self.per_minute * factor)
+
+class RateLimiter:
+    """
+    Client-side limiter shared by every LLMClient. It enforces a requests-per-minute and a
+    tokens-per-minute budget, retries transient failures with jittered exponential backoff,
+    and adapts its send rate to the server's throttling (AIMD): every 429 halves the rate,
+    every success raises it a little again, up to the configured budgets.
+    A budget of 0 disables that limit.
+    """
+
+    def __init__(self, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 max_retries: int = LLM_MAX_RETRIES, backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = LLM_BACKOFF_MAX_SECONDS, min_rate_factor: float = 0.05,
+                 increase_step: float = 0.02, decrease_cooldown: float = 5.0):
+        self._requests = _TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = _TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_rate_factor = min_rate_factor
+        self.increase_step = increase_step
+        # Several requests in flight usually get throttled together; count that as one signal
+        self.decrease_cooldown = decrease_cooldown
+        self.rate_factor = 1.0
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.throttled = 0
+        self.gave_up = 0
+
+    def acquire(self, estimated_tokens: int = 0, cancel: threading.Event = None) -> bool:
+        """
+        Blocks until one request of roughly estimated_tokens input tokens fits in both budgets, and takes
+        it out of them. Returns False, having taken nothing, if cancel is set while it waits.
+        """
+        started = time.perf_counter()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = 0.0
+                for bucket, amount in ((self._requests, 1), (self._tokens, estimated_tokens)):
+                    if bucket is not None:
+                        bucket.refill(now, self.rate_factor)
+                        wait = max(wait, bucket.wait_time(amount, self.rate_factor))
+                if wait <= 0:
+                    if self._requests is not None:
+                        self._requests.available -= 1
+                    if self._tokens is not None:
+                        self._tokens.available -= estimated_tokens
+                    break
+            if cancel is None:
+                time.sleep(min(wait, self.backoff_max))
+            elif cancel.wait(min(wait, self.backoff_max)):
+                return False
+        waited = time.perf_counter() - started
+        if waited > 0.001:
+            get_tracer().current_span().increment("rate_limit_wait_seconds", waited)
+        return True
+
+    def record_usage(self, tokens: int):
+        """Charges tokens only known after the fact (the response) against the token budget."""
+        if self._tokens is None or tokens <= 0:
+            return
+        with self._lock:
+            # May go negative: the debt simply delays the next requests
+            self._tokens.available -= tokens
+
+    def on_success(self):
+        with self._lock:
+            self.rate_factor = min(1.0, self.rate_factor + self.increase_step)
+
+    def on_throttled(self):
+        with self._lock:
+            self.throttled += 1
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.rate_factor = max(self.min_rate_factor, self.rate_factor / 2)
+                self._last_decrease = now
+
+    def backoff_delay(self, attempt: int, hint: float = None) -> float:
+        """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        return max(delay, hint) if hint is not None else delay
+
+    def call(self, func, estimated_tokens: int = 0, label: str = "LLM request"):
+        """
+        Runs func() within the budgets, retrying transient failures. Non-transient errors and the
+        last failure after max_retries retries are raised to the caller.
+        """
+        attempt = 0
+        while True:
+            self.acquire(estimated_tokens)
+            try:
+                result = func()
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                if throttled:
+                    self.on_throttled()
+                if not is_transient_error(e):
+                    raise
+                if attempt >= self.max_retries:
+                    with self._lock:
+                        self.gave_up += 1
+                    raise
+                delay = self.backoff_delay(attempt, retry_after_hint(e))
+                with self._lock:
+                    self.retries += 1
+                get_tracer().current_span().increment("retries")
+                reason = "throttled" if throttled else "transient error"
+                print(f"  [LLM_RETRY] {label} {reason} ({type(e).__name__}). "
+                      f"Retry {attempt + 1}/{self.max_retries} in {delay:.1f}s.")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.on_success()
+            if isinstance(result, str):
+                self.record_usage(len(result) // 4)
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"retries": self.retries, "throttled": self.throttled, "gave_up": self.gave_up,
+                    "rate_factor": self.rate_factor}
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide rate limiter shared by every LLMClient."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter()
+        return _shared_limiter
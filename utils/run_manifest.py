@@ -0,0 +1,172 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+
+MANIFEST_FILE_NAME = ".codegenesis_manifest.json"
+
+def content_hash(data) -> str:
+    """Returns the SHA-256 hex digest of a str or bytes payload."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+@contextlib.contextmanager
+def file_lock(path: str, timeout: float = 30.0, stale_after: float = 120.0):
+    """
+    Holds path + ".lock" across processes (created exclusively), so that workers sharing an output
+    directory update a file one at a time instead of overwriting each other's changes. A lock older than
+    stale_after seconds was left by a crashed process and is broken; after timeout the update goes ahead
+    without the lock.
+    """
+    lock_path = path + '.lock'
+    deadline = time.monotonic() + timeout
+    acquired = False
+    while not acquired:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            acquired = True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() > deadline:
+                print(f"  [MANIFEST_WARNING] {lock_path} is still held after {timeout:.0f}s; updating {path} without it.")
+                break
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        if acquired:
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+def read_json_section(path: str, section: str, warning: str) -> dict:
+    """Returns the section dict of a JSON file written by save(), or {} when it is missing or unreadable."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file).get(section, {})
+    except (OSError, ValueError) as e:
+        print(f"  [{warning}] Could not read {path}: {e}.")
+        return {}
+
+def write_json_atomically(path: str, payload: str):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(payload)
+    os.replace(tmp_path, path)
+
+class RunManifest:
+    """
+    Remembers, for every legacy input file, the hash of the source it was generated from
+    and the output files it produced. Stored as JSON inside the output directory so that
+    the next run can skip unchanged inputs and clean up after deleted ones. Several workers may
+    share the output directory, so save() merges this worker's changes into the file on disk.
+    """
+
+    def __init__(self, legacy_root: str, output_root: str):
+        self.legacy_root = legacy_root
+        self.output_root = output_root
+        self.path = os.path.join(output_root, MANIFEST_FILE_NAME)
+        self._lock = threading.Lock()
+        # relative input path -> {"hash": ..., "outputs": [relative output paths]}
+        self.entries = {}
+        # Keys this worker recorded or removed since the last save
+        self._changed = set()
+        self._removed = set()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file).get("files", {})
+        except (OSError, ValueError) as e:
+            print(f"  [MANIFEST_WARNING] Could not read {self.path}: {e}. Treating this run as a full rebuild.")
+            self.entries = {}
+
+    def _input_key(self, input_path: str) -> str:
+        return os.path.relpath(input_path, self.legacy_root).replace(os.sep, '/')
+
+    def _output_key(self, output_path: str) -> str:
+        return os.path.relpath(output_path, self.output_root).replace(os.sep, '/')
+
+    def is_up_to_date(self, input_path: str, source_hash: str) -> bool:
+        """True if input_path was already modernized from identical source and all its outputs still exist."""
+        return source_hash is not None and self.reusable_hash(input_path) == source_hash
+
+    def reusable_hash(self, input_path: str):
+        """
+        Returns the source hash input_path was last modernized from, provided all its outputs still exist.
+        Returns None when the file has to be processed regardless of its content.
+        """
+        with self._lock:
+            entry = self.entries.get(self._input_key(input_path))
+        if not entry:
+            return None
+        if not all(os.path.exists(os.path.join(self.output_root, output)) for output in entry.get("outputs", [])):
+            return None
+        return entry.get("hash")
+
+    def record(self, input_path: str, source_hash: str, output_paths):
+        key = self._input_key(input_path)
+        with self._lock:
+            self.entries[key] = {
+                "hash": source_hash,
+                "outputs": sorted(self._output_key(path) for path in output_paths),
+            }
+            self._changed.add(key)
+            self._removed.discard(key)
+
+    def remove_stale(self, current_input_paths) -> list:
+        """
+        Forgets every input that no longer exists and deletes the outputs it produced.
+        Returns the relative paths of the removed inputs.
+        """
+        current_keys = {self._input_key(path) for path in current_input_paths}
+        with self._lock:
+            stale_keys = [key for key in self.entries if key not in current_keys]
+            stale_entries = [self.entries.pop(key) for key in stale_keys]
+            self._removed.update(stale_keys)
+            self._changed.difference_update(stale_keys)
+            # Never delete an output that a surviving input also claims
+            live_outputs = {output for entry in self.entries.values() for output in entry.get("outputs", [])}
+
+        for entry in stale_entries:
+            for output in entry.get("outputs", []):
+                if output in live_outputs:
+                    continue
+                output_path = os.path.join(self.output_root, output)
+                try:
+                    os.remove(output_path)
+                    print(f"[MANIFEST] Deleted stale output: {output_path}")
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"  [MANIFEST_WARNING] Could not delete {output_path}: {e}")
+        return stale_keys
+
+    def save(self):
+        """Writes the entries this worker changed over those on disk, keeping what other workers saved."""
+        with file_lock(self.path):
+            on_disk = read_json_section(self.path, "files", "MANIFEST_WARNING")
+            with self._lock:
+                for key in self._removed:
+                    on_disk.pop(key, None)
+                for key in self._changed:
+                    on_disk[key] = self.entries[key]
+                self.entries = on_disk
+                self._changed, self._removed = set(), set()
+                payload = json.dumps({"version": 1, "files": self.entries}, indent=2, sort_keys=True)
+            write_json_atomically(self.path, payload)
@@ -0,0 +1,26 @@
+import contextlib
+import threading
+import time
+
+_lock = threading.Lock()
+# step name -> seconds, in the order the steps first ran
+_timings = {}
+
+def record_startup(name: str, seconds: float):
+    """Adds seconds to a named startup step (imports, client setup, index loading, ...)."""
+    with _lock:
+        _timings[name] = _timings.get(name, 0.0) + seconds
+
+@contextlib.contextmanager
+def startup_step(name: str):
+    """Times the body of the with block as the startup step name."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup(name, time.perf_counter() - started)
+
+def startup_timings() -> dict:
+    """{step: seconds} of every startup step recorded so far in this process."""
+    with _lock:
+        return dict(_timings)
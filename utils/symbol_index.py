@@ -0,0 +1,290 @@
+import json
+import os
+import threading
+
+import javalang
+
+from config import CROSS_FILE_CONTEXT_TOKEN_BUDGET
+from utils.code_parser import estimate_tokens, member_signatures, python_module_name, render_type_signature
+
+_INDEX_FORMAT = 1
+
+_TYPE_DECLARATIONS = (javalang.tree.ClassDeclaration, javalang.tree.InterfaceDeclaration,
+                      javalang.tree.EnumDeclaration, javalang.tree.AnnotationDeclaration)
+
+class SymbolIndex:
+    """
+    Project-wide index of the types, fields and methods declared under the legacy root,
+    and of which files reference them. It is persisted as JSON and updated per file:
+    a file whose content hash did not change is never re-indexed.
+    """
+
+    def __init__(self, legacy_root: str, index_path: str = None):
+        self.legacy_root = legacy_root
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        # relative file path -> indexed facts about that file (see _index_tree)
+        self.files = {}
+        # simple symbol name -> set of relative file paths declaring it; derived from self.files
+        self._definitions = None
+        self._load()
+
+    # === BUILDING & UPDATING ===
+
+    def _key(self, file_path: str) -> str:
+        return os.path.relpath(file_path, self.legacy_root).replace(os.sep, '/')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.legacy_root, key)
+
+    def is_indexed(self, file_path: str, source_hash: str) -> bool:
+        with self._lock:
+            entry = self.files.get(self._key(file_path))
+        return entry is not None and entry["hash"] == source_hash
+
+    def update_file(self, file_path: str, source_hash: str, tree):
+        """(Re-)indexes one file from its parsed tree. A no-op if it was already indexed at this hash."""
+        if self.is_indexed(file_path, source_hash):
+            return
+        entry = _index_tree(tree) if tree is not None else _empty_entry()
+        entry["hash"] = source_hash
+        with self._lock:
+            self.files[self._key(file_path)] = entry
+            self._definitions = None
+
+    def remove_file(self, file_path: str):
+        with self._lock:
+            if self.files.pop(self._key(file_path), None) is not None:
+                self._definitions = None
+
+    def prune(self, current_file_paths):
+        """Drops every indexed file that is not in current_file_paths (i.e. was deleted)."""
+        current_keys = {self._key(path) for path in current_file_paths}
+        with self._lock:
+            for key in [key for key in self.files if key not in current_keys]:
+                del self.files[key]
+                self._definitions = None
+
+    # === QUERIES ===
+
+    def files_defining(self, symbol: str) -> list:
+        """Files declaring a type (`Name`) or a member (`Type.member`)."""
+        definitions = self._get_definitions()
+        return sorted(self._path(key) for key in definitions.get(symbol, ()))
+
+    def files_using(self, symbol: str) -> list:
+        """Files that reference a type (`Name`) or a qualified member (`Type.member`)."""
+        with self._lock:
+            return sorted(self._path(key) for key, entry in self.files.items()
+                          if symbol in entry["references"] or symbol in entry["member_references"])
+
+    def dependencies(self, file_path: str) -> set:
+        """Other files declaring the project types that file_path references."""
+        return {self._path(key) for key in self._dependency_keys(self._key(file_path))}
+
+    def _dependency_keys(self, key: str) -> set:
+        with self._lock:
+            entry = self.files.get(key)
+        if entry is None:
+            return set()
+        dependencies = set()
+        for name in entry["references"]:
+            dependencies.update(self._resolve(name, entry))
+        dependencies.discard(key)
+        return dependencies
+
+    def dependency_graph(self, file_paths) -> dict:
+        """
+        Returns {file: set of files it depends on}, restricted to file_paths. Dependency cycles are
+        broken by dropping the edges inside each strongly connected component, so the result is acyclic.
+        """
+        path_of = {self._key(path): path for path in file_paths}
+        graph = {path: {path_of[dependency] for dependency in self._dependency_keys(key) if dependency in path_of}
+                 for key, path in path_of.items()}
+        component_of = _strongly_connected_components(graph)
+        return {path: {dependency for dependency in dependencies if component_of[dependency] != component_of[path]}
+                for path, dependencies in graph.items()}
+
+    def dependency_order(self, file_paths) -> list:
+        """Orders file_paths so that every file comes after the files it depends on."""
+        graph = self.dependency_graph(file_paths)
+        remaining = {path: set(dependencies) for path, dependencies in graph.items()}
+        dependents = {path: [] for path in graph}
+        for path, dependencies in graph.items():
+            for dependency in dependencies:
+                dependents[dependency].append(path)
+        ready = sorted(path for path, dependencies in remaining.items() if not dependencies)
+        order = []
+        while ready:
+            path = ready.pop(0)
+            order.append(path)
+            for dependent in dependents[path]:
+                remaining[dependent].discard(path)
+                if not remaining[dependent]:
+                    ready.append(dependent)
+        return order
+
+    def context_for(self, file_path: str, token_budget: int = CROSS_FILE_CONTEXT_TOKEN_BUDGET) -> str:
+        """
+        Signatures of the project types file_path references but does not declare itself,
+        most frequently referenced first, capped at token_budget.
+        """
+        key = self._key(file_path)
+        with self._lock:
+            entry = self.files.get(key)
+            if entry is None:
+                return ""
+            references = sorted(entry["references"].items(), key=lambda item: (-item[1], item[0]))
+        blocks, used, seen = [], 0, set()
+        for name, _ in references:
+            for defining_key in self._resolve(name, entry):
+                if defining_key == key:
+                    continue
+                with self._lock:
+                    defining = self.files.get(defining_key)
+                if defining is None:
+                    continue
+                top_level = defining["declared"].get(name)
+                if top_level is None or (defining_key, top_level) in seen:
+                    continue
+                seen.add((defining_key, top_level))
+                block = (f"// {top_level}: defined in {defining_key}, modernized as {python_module_name(defining_key)}\n"
+                         f"{defining['types'][top_level]}")
+                cost = estimate_tokens(block)
+                if used + cost > token_budget:
+                    continue
+                blocks.append(block)
+                used += cost
+        return '\n\n'.join(blocks)
+
+    def _get_definitions(self) -> dict:
+        with self._lock:
+            if self._definitions is None:
+                definitions = {}
+                for key, entry in self.files.items():
+                    for name in list(entry["declared"]) + list(entry["members"]):
+                        definitions.setdefault(name, set()).add(key)
+                self._definitions = definitions
+            return self._definitions
+
+    def _resolve(self, name: str, from_entry: dict) -> set:
+        """Resolves a simple type name used by from_entry to the file(s) declaring it."""
+        candidates = self._get_definitions().get(name, set())
+        if len(candidates) <= 1:
+            return set(candidates)
+        with self._lock:
+            packages = {candidate: self.files[candidate]["package"] for candidate in candidates}
+        # Prefer an explicit import, then the referencing file's own package
+        imported = {candidate for candidate, package in packages.items()
+                    if f"{package}.{name}" in from_entry["imports"] or f"{package}.*" in from_entry["imports"]}
+        if imported:
+            return imported
+        same_package = {candidate for candidate, package in packages.items() if package == from_entry["package"]}
+        return same_package or set(candidates)
+
+    # === PERSISTENCE ===
+
+    def _load(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                payload = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"  [INDEX_WARNING] Could not read {self.index_path}: {e}. Rebuilding the symbol index.")
+            return
+        if payload.get("version") == _INDEX_FORMAT:
+            self.files = payload.get("files", {})
+
+    def save(self):
+        if not self.index_path:
+            return
+        with self._lock:
+            payload = json.dumps({"version": _INDEX_FORMAT, "files": self.files}, sort_keys=True)
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(payload)
+        os.replace(tmp_path, self.index_path)
+
+def _empty_entry() -> dict:
+    return {"package": "", "imports": [], "types": {}, "declared": {}, "members": {},
+            "references": {}, "member_references": []}
+
+def _index_tree(tree) -> dict:
+    """Extracts the declarations and references of one compilation unit."""
+    entry = _empty_entry()
+    entry["package"] = tree.package.name if tree.package else ""
+    entry["imports"] = [imported.path + ('.*' if imported.wildcard else '') for imported in tree.imports]
+
+    for top_level in tree.types:
+        entry["types"][top_level.name] = render_type_signature(top_level)
+        # Node.filter only accepts a single type, so walk the subtree directly
+        for _, declaration in top_level:
+            if not isinstance(declaration, _TYPE_DECLARATIONS):
+                continue
+            entry["declared"][declaration.name] = top_level.name
+            for name, signature in member_signatures(declaration).items():
+                entry["members"][f"{declaration.name}.{name}"] = signature
+
+    references = {}
+    for _, node in tree.filter(javalang.tree.ReferenceType):
+        references[node.name] = references.get(node.name, 0) + 1
+    member_references = set()
+    for node_type in (javalang.tree.MethodInvocation, javalang.tree.MemberReference):
+        for _, node in tree.filter(node_type):
+            # Static access such as `Util.format(...)` or `Constants.MAX` also marks a dependency
+            qualifier = (node.qualifier or '').split('.')[0]
+            if qualifier[:1].isupper():
+                references[qualifier] = references.get(qualifier, 0) + 1
+                member_references.add(f"{qualifier}.{node.member}")
+    for imported in tree.imports:
+        if not imported.wildcard:
+            name = imported.path.rsplit('.', 1)[-1]
+            references.setdefault(name, 1)
+    entry["references"] = references
+    entry["member_references"] = sorted(member_references)
+    return entry
+
+def _strongly_connected_components(graph: dict) -> dict:
+    """Iterative Tarjan's algorithm. Returns {node: component id}."""
+    index_of, lowlink, component_of = {}, {}, {}
+    stack, on_stack = [], set()
+    counter, component = 0, 0
+    for root in graph:
+        if root in index_of:
+            continue
+        work = [(root, iter(graph[root]))]
+        index_of[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, neighbours = work[-1]
+            advanced = False
+            for neighbour in neighbours:
+                if neighbour not in index_of:
+                    index_of[neighbour] = lowlink[neighbour] = counter
+                    counter += 1
+                    stack.append(neighbour)
+                    on_stack.add(neighbour)
+                    work.append((neighbour, iter(graph[neighbour])))
+                    advanced = True
+                    break
+                if neighbour in on_stack:
+                    lowlink[node] = min(lowlink[node], index_of[neighbour])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index_of[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component_of[member] = component
+                    if member == node:
+                        break
+                component += 1
+    return component_of
@@ -0,0 +1,206 @@
+import itertools
+import json
+import os
+import threading
+import time
+
+from config import TRACING_ENABLED
+
+class Span:
+    """
+    One timed unit of work (a pipeline phase, a file, a stage or an LLM call) with free-form attributes.
+    Used as a context manager; while open it is the current span of its thread, so nested work
+    (e.g. the LLM calls made by a stage) is recorded as its children.
+    """
+
+    __slots__ = ("name", "span_id", "parent_id", "thread_id", "start", "end", "attributes", "_tracer", "_previous")
+
+    def __init__(self, tracer, name: str, parent_id, attributes: dict):
+        self.name = name
+        self.span_id = next(tracer._ids)
+        self.parent_id = parent_id
+        self.thread_id = threading.get_ident()
+        self.start = None
+        self.end = None
+        self.attributes = attributes
+        self._tracer = tracer
+        self._previous = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def increment(self, key: str, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def __enter__(self):
+        local = self._tracer._local
+        self._previous = getattr(local, 'span', None)
+        local.span = self
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc is not None:
+            self.attributes["error"] = str(exc) or exc_type.__name__
+        self._tracer._local.span = self._previous
+        self._tracer._finish(self)
+        return False
+
+class _NoopSpan:
+    """Stands in for every span while tracing is disabled, so instrumented code costs next to nothing."""
+
+    __slots__ = ()
+
+    def set(self, key, value):
+        pass
+
+    def increment(self, key, amount=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class Tracer:
+    """
+    Collects spans in memory and exports them at the end of a run as a JSON trace
+    (Chrome trace event format, viewable in chrome://tracing or Perfetto) and as a
+    Prometheus text-format metrics snapshot.
+    """
+
+    def __init__(self, enabled: bool = TRACING_ENABLED):
+        self.enabled = enabled
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._spans = []
+
+    def span(self, name: str, parent=None, **attributes):
+        """Opens a span; its parent is the given span, or else the current span of this thread."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        if parent is None or parent is _NOOP_SPAN:
+            parent = getattr(self._local, 'span', None)
+        return Span(self, name, parent.span_id if parent is not None else None, attributes)
+
+    def current_span(self):
+        """The innermost open span of this thread (a no-op span if there is none)."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return getattr(self._local, 'span', None) or _NOOP_SPAN
+
+    def wrap(self, func):
+        """Wraps func so spans it opens in another thread (e.g. a pool worker) nest under the current span."""
+        if not self.enabled:
+            return func
+        parent = getattr(self._local, 'span', None)
+
+        def run_with_parent(*args, **kwargs):
+            previous = getattr(self._local, 'span', None)
+            self._local.span = parent
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._local.span = previous
+        return run_with_parent
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self) -> list:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans = []
+
+    # === EXPORT ===
+
+    def export_json(self, path: str):
+        spans = self.spans()
+        origin = min((span.start for span in spans), default=0.0)
+        events = [{
+            "name": span.name,
+            "ph": "X",
+            "ts": round((span.start - origin) * 1e6),
+            "dur": round((span.end - span.start) * 1e6),
+            "pid": os.getpid(),
+            "tid": span.thread_id,
+            "args": dict(span.attributes, span_id=span.span_id, parent_id=span.parent_id),
+        } for span in spans]
+        _write_atomically(path, json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str))
+
+    def prometheus_text(self) -> str:
+        spans = self.spans()
+        durations, errors, files = {}, {}, {}
+        llm = {"hit": 0, "miss": 0, "prompt_tokens": 0, "response_tokens": 0, "retries": 0, "rate_limit_wait": 0.0}
+        for span in spans:
+            durations.setdefault(span.name, []).append(span.end - span.start)
+            if "error" in span.attributes:
+                errors[span.name] = errors.get(span.name, 0) + 1
+            if span.name == "file" and "status" in span.attributes:
+                files[span.attributes["status"]] = files.get(span.attributes["status"], 0) + 1
+            if span.name == "llm":
+                llm["hit" if span.attributes.get("cache_hit") else "miss"] += 1
+                llm["prompt_tokens"] += span.attributes.get("prompt_tokens", 0)
+                llm["response_tokens"] += span.attributes.get("response_tokens", 0)
+                llm["retries"] += span.attributes.get("retries", 0)
+                llm["rate_limit_wait"] += span.attributes.get("rate_limit_wait_seconds", 0.0)
+
+        lines = ["# HELP codegenesis_span_duration_seconds Wall-clock time spent per span type.",
+                 "# TYPE codegenesis_span_duration_seconds summary"]
+        for name, values in sorted(durations.items()):
+            ordered = sorted(values)
+            for quantile in (0.5, 0.95):
+                value = ordered[min(len(ordered) - 1, int(round(quantile * (len(ordered) - 1))))]
+                lines.append(f'codegenesis_span_duration_seconds{{span="{name}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'codegenesis_span_duration_seconds_sum{{span="{name}"}} {sum(values):.6f}')
+            lines.append(f'codegenesis_span_duration_seconds_count{{span="{name}"}} {len(values)}')
+        lines += ["# HELP codegenesis_span_errors_total Spans that ended with an exception.",
+                  "# TYPE codegenesis_span_errors_total counter"]
+        lines += [f'codegenesis_span_errors_total{{span="{name}"}} {count}' for name, count in sorted(errors.items())]
+        lines += ["# HELP codegenesis_files_total Processed files by outcome.",
+                  "# TYPE codegenesis_files_total counter"]
+        lines += [f'codegenesis_files_total{{status="{status}"}} {count}' for status, count in sorted(files.items())]
+        lines += ["# HELP codegenesis_llm_requests_total LLM requests by response cache outcome.",
+                  "# TYPE codegenesis_llm_requests_total counter",
+                  f'codegenesis_llm_requests_total{{cache="hit"}} {llm["hit"]}',
+                  f'codegenesis_llm_requests_total{{cache="miss"}} {llm["miss"]}',
+                  "# HELP codegenesis_llm_tokens_total Estimated LLM tokens (~4 characters per token).",
+                  "# TYPE codegenesis_llm_tokens_total counter",
+                  f'codegenesis_llm_tokens_total{{kind="prompt"}} {llm["prompt_tokens"]}',
+                  f'codegenesis_llm_tokens_total{{kind="response"}} {llm["response_tokens"]}',
+                  "# HELP codegenesis_llm_retries_total LLM requests retried after a transient failure.",
+                  "# TYPE codegenesis_llm_retries_total counter",
+                  f'codegenesis_llm_retries_total {llm["retries"]}',
+                  "# HELP codegenesis_llm_rate_limit_wait_seconds_total Time spent waiting on the client-side rate limiter.",
+                  "# TYPE codegenesis_llm_rate_limit_wait_seconds_total counter",
+                  f'codegenesis_llm_rate_limit_wait_seconds_total {llm["rate_limit_wait"]:.6f}']
+        return '\n'.join(lines) + '\n'
+
+    def export_prometheus(self, path: str):
+        _write_atomically(path, self.prometheus_text())
+
+def _write_atomically(path: str, content: str):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+_shared_tracer = Tracer()
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer. Tracing is off unless TRACING_ENABLED=1 or main.py --trace."""
+    return _shared_tracer
@@ -0,0 +1,85 @@
+import functools
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+
+from config import VALIDATION_PYTHON, VALIDATION_TIMEOUT_SECONDS
+
+# pytest exit codes (see `pytest --help`). 2 is mostly a test file that cannot be collected, e.g. because
+# an import fails; everything not listed here (3, 4) is an internal or usage error.
+_PYTEST_OUTCOMES = {0: "passed", 1: "failed", 2: "collection_error", 5: "no_tests"}
+# Characters of pytest output kept in the run report for a file whose tests did not pass
+_OUTPUT_TAIL_CHARS = 2000
+
+def compile_error(path: str):
+    """Returns why the Python file at path does not compile, or None if it does."""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            source = file.read()
+        compile(source, path, 'exec')
+    except SyntaxError as e:
+        return f"{os.path.basename(path)}:{e.lineno}: {e.msg}"
+    except (OSError, ValueError) as e:
+        return f"{os.path.basename(path)}: {e}"
+    return None
+
+@functools.lru_cache(maxsize=None)
+def pytest_available(python: str = VALIDATION_PYTHON) -> bool:
+    """True if pytest can be imported by the interpreter the generated tests run with."""
+    if not python or os.path.abspath(python) == os.path.abspath(sys.executable):
+        return importlib.util.find_spec("pytest") is not None
+    try:
+        return subprocess.run([python, "-c", "import pytest"], capture_output=True, timeout=60).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+def run_pytest(test_path: str, root: str, timeout: float = VALIDATION_TIMEOUT_SECONDS,
+               python: str = VALIDATION_PYTHON) -> dict:
+    """
+    Runs one generated test file in its own pytest subprocess, with the output root on the import path
+    so the tests can import the module they cover. Returns {"outcome", "duration", "output"}; the output
+    (its tail) is only kept when the tests did not pass.
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.abspath(root), env.get("PYTHONPATH")]))
+    # No cache provider: concurrent runs would race on the same .pytest_cache directory
+    command = [python or sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+               "--rootdir", os.path.abspath(root), os.path.abspath(test_path)]
+    started = time.perf_counter()
+    try:
+        completed = subprocess.run(command, cwd=root, env=env, capture_output=True, text=True,
+                                   timeout=timeout or None)
+    except subprocess.TimeoutExpired as e:
+        output = e.stdout.decode('utf-8', 'replace') if isinstance(e.stdout, bytes) else (e.stdout or "")
+        return {"outcome": "timeout", "duration": time.perf_counter() - started, "output": output[-_OUTPUT_TAIL_CHARS:]}
+    except OSError as e:
+        return {"outcome": "error", "duration": time.perf_counter() - started, "output": str(e)}
+    outcome = _PYTEST_OUTCOMES.get(completed.returncode, "error")
+    result = {"outcome": outcome, "duration": time.perf_counter() - started}
+    if outcome != "passed":
+        result["output"] = (completed.stdout + completed.stderr)[-_OUTPUT_TAIL_CHARS:]
+    return result
+
+def validate_outputs(module_path: str, test_path: str = None, root: str = None, run_tests: bool = True) -> dict:
+    """
+    Validates the saved outputs of one file: compile-checks the module and its tests, then runs the tests
+    if everything compiles. Returns {"compiles", "tests", "duration"} plus "errors" / "output" when relevant.
+    """
+    started = time.perf_counter()
+    errors = [error for error in (compile_error(path) for path in (module_path, test_path) if path) if error]
+    result = {"compiles": not errors}
+    if errors:
+        result["errors"] = errors
+        result["tests"] = "not_run"
+    elif test_path is None or not run_tests:
+        result["tests"] = "not_run"
+    else:
+        tests = run_pytest(test_path, root or os.path.dirname(module_path))
+        result["tests"] = tests["outcome"]
+        result["tests_duration"] = round(tests["duration"], 3)
+        if "output" in tests:
+            result["output"] = tests["output"]
+    result["duration"] = round(time.perf_counter() - started, 3)
+    return result